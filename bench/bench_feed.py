@@ -0,0 +1,166 @@
+"""
+Load test for the live-count feed: simulated stations publish entries at a fixed rate, an aggregator
+process (src/feed.py aggregate) follows all of them, and a subscriber on the aggregator measures what
+arrives and how late. Everything runs on localhost.
+
+    python bench/bench_feed.py --stations 20 --rate 250 --seconds 10
+    python bench/bench_feed.py --stations 50 --rate 100 --slow-subscriber --out feed.json
+
+Reports entries published and delivered per second, delivery latency (p50/p99, from the station
+publishing an entry to the subscriber reading it from the aggregator), events dropped for lagging
+subscribers, and whether the aggregator's final counts match the stations'. With --slow-subscriber, a
+second subscriber reads the aggregator's feed far too slowly; it must not hold anything else up.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+from feed import HOST, StationHub, fetch_counts
+
+KEYS = "jjjjkkyydfb"
+# Stations publish in ticks of this many seconds, as many entries as their rate calls for.
+TICK_S = 0.01
+
+
+def free_port():
+    import socket
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))], 3) if values else None
+
+
+async def run_station(hub, rate, seconds, seed):
+    rng = random.Random(seed)
+    start = time.monotonic()
+    sent = 0
+    ms = 0
+    while time.monotonic() - start < seconds:
+        due = int((time.monotonic() - start) * rate)
+        while sent < due:
+            ms += rng.randrange(1, 2000)
+            hub.entry('+', ms, rng.choice(KEYS), time.time())
+            sent += 1
+        await asyncio.sleep(TICK_S)
+    return sent
+
+
+async def subscribe(port, latencies, counts, delay=0.0):
+    """
+    Read the aggregator's event stream, recording the latency of each entry (or, with delay, reading one
+    line per delay seconds, like a client on a congested link).
+    """
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(HOST, port)
+            break
+        except OSError:
+            await asyncio.sleep(0.05)
+    writer.write(b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await reader.readuntil(b'\r\n\r\n')
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            event = json.loads(line)
+            counts[event['type']] = counts.get(event['type'], 0) + 1
+            if event['type'] == 'entry' and latencies is not None:
+                latencies.append((time.time() - event['t']) * 1000.0)
+            if delay:
+                await asyncio.sleep(delay)
+    finally:
+        writer.close()
+
+
+async def load_test(stations, rate, seconds, slow_subscriber):
+    hubs = [StationHub(f"station{i}") for i in range(stations)]
+    ports = [await hub.serve(0) for hub in hubs]
+    for hub in hubs:
+        hub.reset(f"clip{hub.name}.mp4", {})
+    aggregator_port = free_port()
+    aggregator = subprocess.Popen([sys.executable, os.path.join(SRC, 'feed.py'), 'aggregate',
+                                   '--port', str(aggregator_port), *map(str, ports)])
+    try:
+        latencies = []
+        counts = {}
+        slow_counts = {}
+        readers = [asyncio.ensure_future(subscribe(aggregator_port, latencies, counts))]
+        if slow_subscriber:
+            readers.append(asyncio.ensure_future(subscribe(aggregator_port, None, slow_counts, delay=0.01)))
+        # Let the aggregator connect to every station before publishing.
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                snapshot = await fetch_counts(aggregator_port)
+                if sum(s['connected'] for s in snapshot['stations'].values()) == stations:
+                    break
+            except (OSError, asyncio.IncompleteReadError, ValueError, KeyError):
+                pass
+            await asyncio.sleep(0.1)
+        start = time.monotonic()
+        sent = sum(await asyncio.gather(*(run_station(hub, rate, seconds, i) for i, hub in enumerate(hubs))))
+        elapsed = time.monotonic() - start
+        # Let the last events through.
+        settle = time.monotonic() + 10
+        final = None
+        while time.monotonic() < settle:
+            final = await fetch_counts(aggregator_port)
+            if final['total'] == sent and counts.get('entry', 0) >= sent:
+                break
+            await asyncio.sleep(0.2)
+        for reader in readers:
+            reader.cancel()
+        expected = sum(hub.total for hub in hubs)
+        return {
+            'stations': stations,
+            'rate_per_station': rate,
+            'published': sent,
+            'published_per_s': round(sent / elapsed, 1),
+            'delivered': counts.get('entry', 0),
+            'delivered_per_s': round(counts.get('entry', 0) / elapsed, 1),
+            'latency_p50_ms': percentile(latencies, 0.5),
+            'latency_p99_ms': percentile(latencies, 0.99),
+            'station_drops': sum(hub.dropped for hub in hubs),
+            'slow_subscriber': slow_counts if slow_subscriber else None,
+            'aggregator_total': final['total'] if final else None,
+            'counts_match': bool(final) and final['total'] == expected,
+        }
+    finally:
+        aggregator.terminate()
+        aggregator.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the live-count feed with simulated stations.")
+    parser.add_argument('--stations', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=250, help="entries per second per station")
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--slow-subscriber', action='store_true',
+                        help="also attach a subscriber that reads the merged feed far too slowly")
+    parser.add_argument('--out', help="write results to this JSON file")
+    args = parser.parse_args(argv)
+    result = asyncio.run(load_test(args.stations, args.rate, args.seconds, args.slow_subscriber))
+    for name, value in result.items():
+        print(f"{name:<20}{value}")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=1)
+    if not result['counts_match']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
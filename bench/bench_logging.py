@@ -0,0 +1,274 @@
+"""
+Benchmarks for the logging hot paths: stamping and logging a key, compaction, undo/restore/redo,
+search and refreshing the log pane, against synthetic sessions of increasing size.
+
+VLC is replaced by fake_player.FakePlayer and the log pane's Text widget by fake_player.FakeText
+(or a real, withdrawn Tk Text with --tk, which needs a display, e.g. under xvfb-run).
+
+    python bench/bench_logging.py --sizes 1000 10000 100000 1000000 --out results.json
+    python bench/bench_logging.py --baseline results.json
+
+Each operation reports p50/p99 latency (ms) and the bytes read/written per call (from /proc/self/io,
+which counts the journal writer thread too). With --baseline, operations whose p50 or p99 got slower
+than the threshold are listed and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from csv_logger import CSVLogger
+from fake_player import FakePlayer, FakeScrollbar, FakeText
+from input_pipeline import KeyQueue
+from log_view import LogView
+from playback_clock import PlaybackClock
+from sqlite_logger import SQLiteLogger
+from timecodes import format_line
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+# Synthetic sessions span a 6 hour recording.
+SESSION_MS = 6 * 3600 * 1000
+SESSION_KEYS = "jjjjkkyydfb"
+SEARCHES = ["k", "j,k", "/[dfb]/", "02:00-02:15", "00:1"]
+# A result is a regression when it is this many times slower than the baseline...
+DEFAULT_THRESHOLD = 1.25
+# ...and slower by at least this much, so sub-microsecond noise is ignored.
+MIN_REGRESSION_MS = 0.05
+
+
+def io_counters():
+    """
+    Return (bytes read, bytes written) by this process so far, at the syscall level (rchar/wchar), so
+    page-cache and tmpfs I/O counts too. Zeros where /proc/self/io is not available.
+    """
+    try:
+        with open('/proc/self/io') as f:
+            fields = dict(line.split(': ') for line in f.read().splitlines())
+        return int(fields['rchar']), int(fields['wchar'])
+    except Exception:
+        return 0, 0
+
+
+def write_session(path, entries, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.writelines(format_line(rng.randrange(SESSION_MS), ord(rng.choice(SESSION_KEYS))) + '\n'
+                     for _ in range(entries))
+
+
+class HeadlessGUI:
+    """
+    The parts of CarCounterGUI the logger and log pane talk to, wired the same way as in main_gui.py.
+    """
+    def __init__(self, logger, text, scrollbar):
+        self.logger = logger
+        self.paused = True
+        self.log_view = LogView(text, scrollbar)
+        self.log_view.set_source(logger)
+        self.player = FakePlayer(length_ms=SESSION_MS)
+        self.clock = PlaybackClock(self.player)
+        self.idle = []
+        self.key_queue = KeyQueue(self.idle.append, self.apply_key_batch)
+
+    def update_log_display(self, highlight_line=None, highlight_lines=None):
+        if highlight_lines:
+            self.log_view.highlight([line - 1 for line in highlight_lines])
+        elif highlight_line is not None:
+            self.log_view.highlight([highlight_line - 1])
+        else:
+            self.log_view.highlighted = set()
+            self.log_view.render()
+
+    def log_key_event(self, key, event_time):
+        t = self.clock.event_instant(event_time)
+        ms = self.clock.now_ms(event_time)
+        self.key_queue.put(key, max(0, ms), t)
+
+    def apply_key_batch(self, batch):
+        rows = []
+        for key, ms, _ in batch:
+            row = self.logger.log_entry(key, ms)
+            if row is not None:
+                rows = [r + 1 if r >= row else r for r in rows] + [row]
+        if len(rows) == 1:
+            self.log_view.insert_row(rows[0])
+        elif rows:
+            self.log_view.insert_rows(rows)
+        if rows:
+            self.log_view.highlight(rows)
+
+    def run_idle(self):
+        while self.idle:
+            self.idle.pop(0)()
+
+
+def measure(results, name, reps, setup, operation):
+    """
+    Time reps calls of operation() (each after an untimed setup()) and store the stats under name.
+    """
+    times = []
+    read0, written0 = io_counters()
+    for i in range(reps):
+        setup(i)
+        start = time.perf_counter()
+        operation(i)
+        times.append((time.perf_counter() - start) * 1000.0)
+    read1, written1 = io_counters()
+    times.sort()
+    results[name] = {
+        'n': reps,
+        'p50_ms': round(times[len(times) // 2], 4),
+        'p99_ms': round(times[min(len(times) - 1, int(len(times) * 0.99))], 4),
+        'mean_ms': round(sum(times) / len(times), 4),
+        'read_bytes': (read1 - read0) // reps,
+        'write_bytes': (written1 - written0) // reps,
+    }
+
+
+BACKENDS = {'csv': CSVLogger, 'sqlite': SQLiteLogger}
+
+
+def bench_size(entries, workdir, make_widgets, reps=200, seed=0, logger_class=CSVLogger):
+    path = os.path.join(workdir, f'session_{entries}.csv')
+    write_session(path, entries, seed)
+    rng = random.Random(seed)
+    results = {}
+    nothing = lambda i: None
+    # Expensive whole-log operations get fewer repetitions on big logs.
+    heavy_reps = max(3, min(reps, 2000000 // max(entries, 1)))
+
+    measure(results, 'load', min(heavy_reps, 5), nothing, lambda i: logger_class(path).close(wait=True))
+
+    logger = logger_class(path)
+    gui = HeadlessGUI(logger, *make_widgets())
+    gui.player.play()
+    # Tk event times are ms on the system clock; the keys here are pressed just as they are handled.
+    event_time = lambda: int(time.monotonic() * 1000) % 2 ** 32
+
+    def press(i):
+        gui.player.set_time(rng.randrange(SESSION_MS))
+        gui.clock.resync()
+        gui.log_key_event(rng.choice(SESSION_KEYS), event_time())
+        gui.run_idle()
+
+    measure(results, 'log_key_event', reps, nothing, press)
+
+    def burst(i):
+        for _ in range(10):
+            gui.log_key_event(rng.choice(SESSION_KEYS), event_time())
+        gui.run_idle()
+
+    measure(results, 'log_key_burst10', max(3, reps // 10), nothing, burst)
+
+    def scroll_to_random(i):
+        gui.log_view.top = rng.randrange(max(1, len(logger) - gui.log_view.height))
+
+    measure(results, 'update_log_display', reps, scroll_to_random,
+            lambda i: gui.update_log_display(highlight_line=gui.log_view.top + 1))
+
+    def select_random(i):
+        gui.log_view.highlight([rng.randrange(len(logger))])
+
+    measure(results, 'undo', reps, select_random, lambda i: logger.undo(gui))
+    measure(results, 'restore_last_undo', reps, nothing, lambda i: logger.restore_last_undo(gui))
+    measure(results, 'redo', reps, nothing, lambda i: logger.redo(gui))
+
+    for text in SEARCHES:
+        measure(results, f'search_entries[{text}]', max(3, reps // 10), nothing,
+                lambda i, text=text: logger.search_entries(text, gui))
+
+    def make_dirty(i):
+        gui.log_key_event(rng.choice(SESSION_KEYS), event_time())
+        gui.run_idle()
+        logger.writer.flush()
+
+    # sort_log_file is the part that runs on the Tk thread; compaction includes the background rewrite.
+    measure(results, 'sort_log_file', heavy_reps, make_dirty, lambda i: logger.sort_log_file())
+    measure(results, 'compaction', heavy_reps, make_dirty,
+            lambda i: (logger.sort_log_file(), logger.writer.flush()))
+    logger.close(wait=True)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Return (size, operation, metric, baseline ms, current ms) for every result slower than baseline.
+    """
+    regressions = []
+    for size, ops in results['results'].items():
+        for op, stats in ops.items():
+            base = baseline.get('results', {}).get(size, {}).get(op)
+            if not base:
+                continue
+            for metric in ('p50_ms', 'p99_ms'):
+                if stats[metric] > base[metric] * threshold and stats[metric] - base[metric] >= MIN_REGRESSION_MS:
+                    regressions.append((size, op, metric, base[metric], stats[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the logging hot paths on synthetic sessions.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="session sizes (entries)")
+    parser.add_argument('--reps', type=int, default=200, help="repetitions of the cheap operations")
+    parser.add_argument('--out', help="write results to this JSON file")
+    parser.add_argument('--baseline', help="compare against results saved with --out")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"slowdown factor that counts as a regression (default {DEFAULT_THRESHOLD})")
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='csv', help="log storage backend")
+    parser.add_argument('--tk', action='store_true', help="draw into real Tk widgets (needs a display)")
+    args = parser.parse_args(argv)
+
+    if args.tk:
+        from tkinter import Scrollbar, Text, Tk
+        root = Tk()
+        root.withdraw()
+        make_widgets = lambda: (Text(root, width=20, height=25, state='disabled'), Scrollbar(root))
+    else:
+        make_widgets = lambda: (FakeText(), FakeScrollbar())
+
+    workdir = tempfile.mkdtemp(prefix='bench_logging_')
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'widgets': 'tk' if args.tk else 'stub',
+            'backend': args.backend,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': {},
+    }
+    try:
+        for size in args.sizes:
+            ops = bench_size(size, workdir, make_widgets, args.reps, logger_class=BACKENDS[args.backend])
+            results['results'][str(size)] = ops
+            print(f"\n{size} entries")
+            print(f"  {'operation':<28}{'p50 ms':>10}{'p99 ms':>10}{'read B':>12}{'write B':>12}")
+            for op, stats in ops.items():
+                print(f"  {op:<28}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+                      f"{stats['read_bytes']:>12}{stats['write_bytes']:>12}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for size, op, metric, before, after in regressions:
+            print(f"REGRESSION {size} {op} {metric}: {before:.3f} -> {after:.3f} ms")
+        if regressions:
+            raise SystemExit(1)
+        print("\nno regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Startup benchmark: how long a fresh interpreter takes to import the GUI module and its heavy
+dependencies, and to paint the main window for the first time.
+
+    python bench/bench_startup.py --runs 10 --out startup.json
+    python bench/bench_startup.py --baseline startup.json
+
+Every measurement runs in a new process, so nothing is served from an already-warm interpreter (the OS
+file cache still is; reboot or drop caches for a truly cold start). First paint needs a display (e.g.
+under xvfb-run) and is skipped without one. With --baseline, measurements that got slower than the
+threshold are listed and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+
+# Heavy third-party modules the application uses somewhere; none should be on the first-paint path.
+HEAVY_MODULES = ['vlc', 'PIL.ImageTk', 'numpy', 'sqlite3']
+DEFAULT_THRESHOLD = 1.25
+# Ignore differences smaller than this (ms); process startup is noisy.
+MIN_REGRESSION_MS = 5.0
+
+IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import {module}
+print(round((time.perf_counter() - start) * 1000, 3))
+print(int(any(m in sys.modules for m in {heavy!r})))
+"""
+
+# Prints the time from interpreter start to the first completed paint of the main window.
+PAINT_SNIPPET = """
+import time
+start = time.perf_counter()
+from tkinter import Tk
+import main_gui
+root = Tk()
+app = main_gui.CarCounterGUI(root)
+root.update()
+print(round((time.perf_counter() - start) * 1000, 3))
+root.destroy()
+"""
+
+
+def run_child(snippet):
+    """
+    Run a snippet in a fresh interpreter from src/. Returns (stdout lines, wall ms from spawn to exit).
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', snippet], cwd=SRC, capture_output=True, text=True)
+    wall = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'failed')
+    return result.stdout.split(), wall
+
+
+def median(values):
+    values = sorted(values)
+    return round(values[len(values) // 2], 3)
+
+
+def measure_import(module, runs):
+    """
+    Median import time (ms) of a module in a fresh interpreter, and whether importing it pulled in any
+    of the heavy modules. None if it cannot be imported here.
+    """
+    times = []
+    pulls_heavy = False
+    for _ in range(runs):
+        try:
+            out, _ = run_child(IMPORT_SNIPPET.format(module=module, heavy=[m for m in HEAVY_MODULES if m != module]))
+        except RuntimeError as e:
+            return {'error': str(e)}
+        times.append(float(out[0]))
+        pulls_heavy = pulls_heavy or out[1] == '1'
+    return {'import_ms': median(times), 'pulls_heavy_modules': pulls_heavy}
+
+
+def measure_paint(runs):
+    """
+    Median time to the first paint, both inside the process (import + window build + update) and as
+    seen from outside (spawn to exit, including interpreter startup and teardown).
+    """
+    inside = []
+    wall = []
+    for _ in range(runs):
+        try:
+            out, elapsed = run_child(PAINT_SNIPPET)
+        except RuntimeError as e:
+            return {'error': str(e)}
+        inside.append(float(out[0]))
+        wall.append(elapsed)
+    return {'first_paint_ms': median(inside), 'process_ms': median(wall)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure import and first-paint time of the GUI.")
+    parser.add_argument('--runs', type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument('--out', help="write results to this JSON file")
+    parser.add_argument('--baseline', help="compare against results saved with --out")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"slowdown factor that counts as a regression (default {DEFAULT_THRESHOLD})")
+    args = parser.parse_args(argv)
+
+    interpreter = [run_child('pass')[1] for _ in range(args.runs)]
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': {
+            'interpreter': {'process_ms': median(interpreter)},
+            'import main_gui': measure_import('main_gui', args.runs),
+            'first paint': measure_paint(args.runs),
+        },
+    }
+    for module in HEAVY_MODULES:
+        results['results'][f'import {module}'] = measure_import(module, args.runs)
+
+    for name, stats in results['results'].items():
+        print(f"{name:<22}" + "  ".join(f"{k} {v}" for k, v in stats.items()))
+    if results['results']['import main_gui'].get('pulls_heavy_modules'):
+        print("warning: importing main_gui loads a heavy module before the window paints")
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = []
+        for name, stats in results['results'].items():
+            for metric, value in stats.items():
+                before = baseline.get(name, {}).get(metric)
+                if isinstance(value, float) and isinstance(before, (int, float)):
+                    if value > before * args.threshold and value - before >= MIN_REGRESSION_MS:
+                        regressions.append((name, metric, before, value))
+        for name, metric, before, after in regressions:
+            print(f"REGRESSION {name} {metric}: {before:.1f} -> {after:.1f} ms")
+        if regressions:
+            raise SystemExit(1)
+        print("no regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
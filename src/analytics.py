@@ -0,0 +1,164 @@
+from array import array
+
+import numpy as np
+
+from archive import Archive, is_archive
+from csv_logger import iter_entries
+
+# Keys from the notes legend in main_gui.py
+VEHICLE_KEYS = "jk"
+TPRS_KEY = "y"
+FLAG_KEYS = "dfb"
+
+# Sessions are packed above the timestamp in combined sort keys: session << SESSION_SHIFT | ms.
+SESSION_SHIFT = 40
+
+
+def key_codes(keys):
+    return np.frombuffer(keys.encode('latin-1'), dtype=np.uint8)
+
+
+class Sessions:
+    """
+    One or many session logs as columnar arrays, sorted by (session, ms):
+      ms:      int64 timestamps
+      code:    uint8 key codes
+      session: int32 index into paths
+    """
+    def __init__(self, ms, code, session, paths, archives=()):
+        keys = (session.astype(np.int64) << SESSION_SHIFT) | ms
+        if len(keys) > 1 and not np.all(keys[1:] >= keys[:-1]):
+            order = np.lexsort((ms, session))
+            ms, code, session = ms[order], code[order], session[order]
+        self.ms = np.ascontiguousarray(ms, dtype=np.int64)
+        self.code = np.ascontiguousarray(code, dtype=np.uint8)
+        self.session = np.ascontiguousarray(session, dtype=np.int32)
+        self.paths = list(paths)
+        # Open archives whose mappings back the columns (when one archive was loaded as is).
+        self.archives = list(archives)
+
+    @classmethod
+    def load(cls, paths):
+        """
+        Load log files into columns. CSV logs are streamed straight into typed buffers; archives (.cca)
+        are memory-mapped and used without parsing. The columns are joined once, and not sorted at all
+        when the sessions come in order (as archives of a recording normally do).
+        """
+        ms_parts, code_parts, session_parts = [], [], []
+        archives = []
+        paths = list(paths)
+        for i, path in enumerate(paths):
+            if is_archive(path):
+                archive = Archive(path)
+                archives.append(archive)
+                ms, code = archive.as_numpy()
+            else:
+                ms = array('q')
+                code = array('B')
+                for entry_ms, entry_code in iter_entries(path):
+                    ms.append(entry_ms)
+                    code.append(entry_code)
+                ms, code = np.frombuffer(ms, dtype=np.int64), np.frombuffer(code, dtype=np.uint8)
+            ms_parts.append(ms)
+            code_parts.append(code)
+            session_parts.append(np.full(len(ms), i, dtype=np.int32))
+        if not paths:
+            return cls(np.empty(0, np.int64), np.empty(0, np.uint8), np.empty(0, np.int32), paths)
+        if len(paths) == 1:
+            return cls(ms_parts[0], code_parts[0], session_parts[0], paths, archives)
+        sessions = cls(np.concatenate(ms_parts), np.concatenate(code_parts), np.concatenate(session_parts), paths)
+        # The columns are copies now; unmap the archives.
+        del ms_parts, code_parts, ms, code
+        for archive in archives:
+            archive.close()
+        return sessions
+
+    def __len__(self):
+        return len(self.ms)
+
+    def mask(self, keys):
+        return np.isin(self.code, key_codes(keys))
+
+    def combined(self, mask=None):
+        """
+        Return (session << SESSION_SHIFT | ms) for the selected events: one sorted int64 array that
+        keeps sessions apart, so a single searchsorted works across every session at once.
+        """
+        ms, session = (self.ms, self.session) if mask is None else (self.ms[mask], self.session[mask])
+        return (session.astype(np.int64) << SESSION_SHIFT) | ms
+
+
+def gaps(sessions, keys):
+    """
+    Return (gap_ms, session) for consecutive events of the given keys within each session.
+    """
+    mask = sessions.mask(keys)
+    ms, session = sessions.ms[mask], sessions.session[mask]
+    same = session[1:] == session[:-1]
+    return np.diff(ms)[same], session[1:][same]
+
+
+def headways(sessions, keys=VEHICLE_KEYS):
+    """
+    Headway (ms) between consecutive vehicles in each session.
+    """
+    return gaps(sessions, keys)[0]
+
+
+def interval_histogram(sessions, keys=VEHICLE_KEYS, bin_ms=1000, max_ms=60000):
+    """
+    Histogram of intervals between consecutive events of the given keys. Intervals of max_ms or more
+    fall in the last bin. Returns (counts, bin_edges).
+    """
+    intervals = np.minimum(headways(sessions, keys), max_ms)
+    edges = np.arange(0, max_ms + bin_ms, bin_ms)
+    edges[-1] = max_ms + 1
+    counts, edges = np.histogram(intervals, bins=edges)
+    return counts, edges
+
+
+def flag_cooccurrence(sessions, window_ms=5000, trigger=TPRS_KEY, flags=FLAG_KEYS):
+    """
+    For every trigger event (a TPRS movement by default), count each flag logged in the same session
+    within (t, t + window_ms]. Returns {flag: {'counts', 'with_flag', 'triggers', 'rate'}} where counts
+    is the per-trigger number of flags.
+    """
+    triggers = sessions.combined(sessions.mask(trigger))
+    result = {}
+    for flag in flags:
+        flag_keys = sessions.combined(sessions.mask(flag))
+        lo = np.searchsorted(flag_keys, triggers, side='right')
+        hi = np.searchsorted(flag_keys, triggers + window_ms, side='right')
+        counts = hi - lo
+        with_flag = int(np.count_nonzero(counts))
+        result[flag] = {
+            'counts': counts,
+            'with_flag': with_flag,
+            'triggers': len(triggers),
+            'rate': with_flag / len(triggers) if len(triggers) else 0.0,
+        }
+    return result
+
+
+def rolling_rates(sessions, keys=VEHICLE_KEYS, window_ms=900000, step_ms=60000):
+    """
+    Events per hour of the given keys in a sliding window, evaluated every step_ms across each session's
+    span. Returns (session, window_start_ms, rate_per_hour) arrays of equal length.
+    """
+    events = sessions.combined(sessions.mask(keys))
+    n_sessions = len(sessions.paths)
+    if not len(sessions):
+        return np.empty(0, np.int32), np.empty(0, np.int64), np.empty(0)
+    # Session spans from the (sorted) full event list
+    bounds = np.searchsorted(sessions.session, np.arange(n_sessions + 1))
+    has_events = bounds[1:] > bounds[:-1]
+    ids = np.arange(n_sessions)[has_events]
+    first = sessions.ms[bounds[:-1][has_events]]
+    last = sessions.ms[bounds[1:][has_events] - 1]
+    steps = (last - first) // step_ms + 1
+    session = np.repeat(ids, steps).astype(np.int32)
+    offsets = np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)
+    start = np.repeat(first, steps) + offsets * step_ms
+    start_keys = (session.astype(np.int64) << SESSION_SHIFT) | start
+    counts = np.searchsorted(events, start_keys + window_ms, side='left') - np.searchsorted(events, start_keys, side='left')
+    return session, start, counts * (3600000.0 / window_ms)
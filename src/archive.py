@@ -0,0 +1,279 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import journal
+from timecodes import format_line, parse_line
+
+# File layout: MAGIC, a little-endian uint32 header length, the JSON header (padded with spaces so the
+# columns start on an 8-byte boundary), then count int64 timestamps (ms) and count uint8 key codes, both
+# little-endian, in the CSV's line order. Lines are written back with '\n' endings.
+MAGIC = b"CCARCH1\n"
+VERSION = 1
+EXTENSION = ".cca"
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def archive_path(csv_path):
+    return os.path.splitext(csv_path)[0] + EXTENSION
+
+
+def is_archive(path):
+    return path.lower().endswith(EXTENSION)
+
+
+def find_video(csv_path):
+    """
+    Return the video a log belongs to (same name, next to it), or "" if there is none.
+    """
+    base = os.path.splitext(csv_path)[0]
+    for ext in VIDEO_EXTENSIONS:
+        for candidate in (base + ext, base + ext.upper()):
+            if os.path.exists(candidate):
+                return candidate
+    return ""
+
+
+def video_fps(video_path):
+    """
+    The video's true frame rate from its cached frame index, or None if it has not been indexed.
+    """
+    if not video_path:
+        return None
+    try:
+        from frame_index import FrameIndex, cache_path, video_stamp
+        index = FrameIndex.load(cache_path(video_path), video_stamp(video_path))
+    except Exception:
+        return None
+    return index.fps if index is not None else None
+
+
+def video_offset_ms(video_path):
+    """
+    The video's start offset (ms) from a saved project that includes it, or 0.
+    """
+    if not video_path:
+        return 0
+    from project import saved_start_ms
+    return saved_start_ms(video_path) or 0
+
+
+def write_archive(path, ms, codes, video="", offset_ms=0, fps=None, extras=(), verbatim=(), final_newline=True):
+    """
+    Write an archive from parallel ms (array 'q') and code (array 'B') columns. extras are the CSV's
+    non-entry lines as (number of entries before the line, line), and verbatim its entry lines not written
+    the way format_line writes them, as (entry number, line), kept so the CSV converts back as it was.
+    """
+    header = {
+        'version': VERSION,
+        'video': video,
+        'offset_ms': offset_ms,
+        'fps': fps,
+        'count': len(ms),
+        'sorted': all(ms[i] <= ms[i + 1] for i in range(len(ms) - 1)),
+        'extras': [list(extra) for extra in extras],
+        'verbatim': [list(line) for line in verbatim],
+        'final_newline': final_newline,
+    }
+    data = json.dumps(header).encode()
+    data += b' ' * (-(len(MAGIC) + 4 + len(data)) % 8)
+    if sys.byteorder != 'little':
+        ms, codes = array('q', ms), array('B', codes)
+        ms.byteswap()
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(data)) + data)
+        ms.tofile(f)
+        codes.tofile(f)
+    os.replace(tmp, path)
+
+
+def csv_to_archive(csv_path, out_path=None, video=None, offset_ms=None, fps=None):
+    """
+    Convert a CSV log to an archive (next to it by default), streaming it line by line. The video defaults
+    to the one next to the log, offset_ms to its start in a saved project and fps to its frame index's.
+    A log whose session did not close cleanly is archived with its journal replayed, as the logger would
+    compact it (entries in time order, then the other lines). Returns the archive's path.
+    """
+    out_path = out_path or archive_path(csv_path)
+    video = find_video(csv_path) if video is None else video
+    offset_ms = video_offset_ms(video) if offset_ms is None else offset_ms
+    fps = video_fps(video) if fps is None else fps
+    ms = array('q')
+    codes = array('B')
+    extras = []
+    verbatim = []
+    final_newline = True
+    pending = journal.pending_entries(csv_path)
+    if pending is not None:
+        for entry_ms, code in sorted(pending, key=lambda entry: entry[0]):
+            ms.append(entry_ms)
+            codes.append(code)
+        base_path, _, _ = journal.recover(csv_path)
+        with open(base_path, 'r') as f:
+            extras = [(len(ms), line.rstrip('\n')) for line in f if parse_line(line) is None]
+    else:
+        with open(csv_path, 'r') as f:
+            for line in f:
+                final_newline = line.endswith('\n')
+                line = line.rstrip('\n')
+                entry = parse_line(line)
+                if entry is None:
+                    extras.append((len(ms), line))
+                    continue
+                if format_line(*entry) != line:
+                    verbatim.append((len(ms), line))
+                ms.append(entry[0])
+                codes.append(entry[1])
+    write_archive(out_path, ms, codes, video, offset_ms, fps, extras, verbatim, final_newline)
+    return out_path
+
+
+class Archive:
+    """
+    Read-only, memory-mapped archive. ms and codes are zero-copy views of the mapped columns
+    (memoryviews of 'q' and 'B'); as_numpy() gives the same as NumPy arrays. Nothing is parsed or copied,
+    so a scan costs only the pages it touches.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file; mmap cannot map zero bytes.
+            self.file.close()
+            raise ValueError(f"{path} is not an archive")
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not an archive")
+        (length,) = struct.unpack_from('<I', self.map, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header = json.loads(self.map[start:start + length])
+        count = self.header['count']
+        self.ms_offset = start + length
+        self.codes_offset = self.ms_offset + 8 * count
+        if len(self.map) < self.codes_offset + count:
+            self.close()
+            raise ValueError(f"{path} is truncated")
+        view = memoryview(self.map)
+        self.ms = view[self.ms_offset:self.codes_offset].cast('q')
+        self.codes = view[self.codes_offset:self.codes_offset + count]
+        if sys.byteorder != 'little':
+            swapped = array('q', self.ms)
+            swapped.byteswap()
+            self.ms.release()
+            self.ms = memoryview(swapped)
+
+    def __len__(self):
+        return self.header['count']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def video(self):
+        return self.header.get('video', "")
+
+    @property
+    def offset_ms(self):
+        return self.header.get('offset_ms', 0)
+
+    @property
+    def fps(self):
+        return self.header.get('fps')
+
+    def as_numpy(self):
+        """
+        Return (ms int64, codes uint8) NumPy arrays backed by the mapping. Keep the archive open while
+        they are in use.
+        """
+        import numpy as np
+        return (np.frombuffer(self.ms, dtype=np.int64), np.frombuffer(self.codes, dtype=np.uint8))
+
+    def iter_entries(self):
+        """
+        Yield (ms, key_code) pairs in the CSV's line order, like csv_logger.iter_entries.
+        """
+        return zip(self.ms, self.codes)
+
+    def iter_lines(self):
+        """
+        Yield the CSV's lines (without newlines), extras in their original places.
+        """
+        extras = self.header.get('extras', [])
+        verbatim = dict(self.header.get('verbatim', []))
+        e = 0
+        for i, (ms, code) in enumerate(zip(self.ms, self.codes)):
+            while e < len(extras) and extras[e][0] <= i:
+                yield extras[e][1]
+                e += 1
+            yield verbatim[i] if i in verbatim else format_line(ms, code)
+        for _, line in extras[e:]:
+            yield line
+
+    def close(self):
+        try:
+            for view in ('ms', 'codes'):
+                if isinstance(getattr(self, view, None), memoryview):
+                    getattr(self, view).release()
+            if getattr(self, 'map', None) is not None:
+                self.map.close()
+        except BufferError:
+            # NumPy arrays from as_numpy() still use the mapping; it is unmapped when they are freed.
+            pass
+        self.file.close()
+
+
+def archive_to_csv(path, out_path=None):
+    """
+    Convert an archive back to a CSV log (next to it by default). Returns the CSV's path.
+    """
+    out_path = out_path or os.path.splitext(path)[0] + ".csv"
+    tmp = out_path + '.tmp'
+    with Archive(path) as archive, open(tmp, 'w') as f:
+        lines = archive.iter_lines()
+        if archive.header.get('final_newline', True):
+            f.writelines(line + '\n' for line in lines)
+        else:
+            f.write('\n'.join(lines))
+    os.replace(tmp, out_path)
+    return out_path
+
+
+def iter_entries(path):
+    """
+    Stream (ms, key_code) pairs from a CSV log or an archive, in file order.
+    """
+    if is_archive(path):
+        with Archive(path) as archive:
+            yield from archive.iter_entries()
+    else:
+        from csv_logger import iter_entries as iter_csv_entries
+        yield from iter_csv_entries(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert session logs between CSV and the binary archive format.")
+    parser.add_argument('paths', nargs='+', help="logs (.csv) to archive, or archives (.cca) to convert back")
+    parser.add_argument('--offset-ms', type=int,
+                        help="video start offset to record (ms; default: the video's start in a saved project, else 0)")
+    parser.add_argument('--fps', type=float, help="frame rate to record (default: from the video's frame index)")
+    parser.add_argument('--video', help="video path to record (default: the video next to the log)")
+    args = parser.parse_args(argv)
+    for path in args.paths:
+        if is_archive(path):
+            print(f"{path} -> {archive_to_csv(path)}")
+        else:
+            print(f"{path} -> {csv_to_archive(path, video=args.video, offset_ms=args.offset_ms, fps=args.fps)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+# Only the parsing side of the logger is used here; nothing in this module imports Tk or VLC.
+import journal
+from archive import Archive, archive_path, is_archive
+from csv_logger import iter_entries
+from motion import is_proposals
+from timecodes import format_ms, key_char
+
+# Classifications and flags from the notes legend in main_gui.py
+DEFAULT_KEYS = "jkydfb"
+DEFAULT_BIN_MINUTES = 15
+
+
+def log_mtime(csv_path):
+    """
+    When a log last changed: its CSV, or its journal if entries were logged since the last compaction.
+    """
+    mtime = os.path.getmtime(csv_path)
+    try:
+        return max(mtime, os.path.getmtime(journal.journal_path(csv_path)))
+    except OSError:
+        return mtime
+
+
+def find_logs(paths):
+    """
+    Yield every log (.csv, except motion proposals) and archive (.cca) under the given files/directories,
+    in a stable order. A log archived next to itself is read once: from the archive if it is at least as
+    new as the CSV and its journal, else from the CSV.
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for name in sorted(filenames):
+                full = os.path.join(dirpath, name)
+                if is_archive(name):
+                    csv_path = os.path.splitext(full)[0] + '.csv'
+                    if os.path.exists(csv_path) and log_mtime(csv_path) > os.path.getmtime(full):
+                        continue
+                elif name.lower().endswith('.csv') and not is_proposals(name):
+                    archive = archive_path(full)
+                    if os.path.exists(archive) and os.path.getmtime(archive) >= log_mtime(full):
+                        continue
+                else:
+                    continue
+                yield full
+
+
+def summarize_file(path, bin_ms):
+    """
+    Reduce one log to per-bin key counts. Runs in a worker process, streaming the file; a log whose
+    session did not close cleanly is replayed with its journal first, as the logger would load it.
+    Returns a dict with the file summary and {bin_index: Counter} of counts.
+    """
+    if is_archive(path):
+        return summarize_archive(path, bin_ms)
+    bins = defaultdict(Counter)
+    totals = Counter()
+    first = last = None
+    entries = 0
+    try:
+        pending = journal.pending_entries(path)
+        for ms, code in iter_entries(path) if pending is None else pending:
+            key = key_char(code)
+            bins[ms // bin_ms][key] += 1
+            totals[key] += 1
+            first = ms if first is None else min(first, ms)
+            last = ms if last is None else max(last, ms)
+            entries += 1
+        error = None
+    except Exception as e:
+        error = str(e)
+    return {
+        'file': path,
+        'entries': entries,
+        'first_ms': first,
+        'last_ms': last,
+        'totals': dict(totals),
+        'bins': {b: dict(c) for b, c in bins.items()},
+        'error': error,
+    }
+
+
+def summarize_archive(path, bin_ms):
+    """
+    summarize_file for an archive: the mapped columns are reduced with NumPy, never parsed line by line.
+    """
+    import numpy as np
+    bins = defaultdict(dict)
+    totals = {}
+    first = last = None
+    entries = 0
+    try:
+        with Archive(path) as archive:
+            ms, codes = archive.as_numpy()
+            entries = len(ms)
+            if entries:
+                first, last = int(ms.min()), int(ms.max())
+                # One (bin, key) cell per distinct value of bin << 8 | code
+                cells, counts = np.unique((ms // bin_ms << 8) | codes, return_counts=True)
+                for cell, count in zip(cells.tolist(), counts.tolist()):
+                    bins[cell >> 8][key_char(cell & 0xFF)] = count
+                for code, count in enumerate(np.bincount(codes, minlength=256).tolist()):
+                    if count:
+                        totals[key_char(code)] = count
+            del ms, codes
+        error = None
+    except Exception as e:
+        error = str(e)
+    return {
+        'file': path,
+        'entries': entries,
+        'first_ms': first,
+        'last_ms': last,
+        'totals': totals,
+        'bins': dict(bins),
+        'error': error,
+    }
+
+
+def _summarize(args):
+    return summarize_file(*args)
+
+
+def run(paths, bin_minutes=DEFAULT_BIN_MINUTES, workers=None):
+    """
+    Summarize every log under paths in a process pool. Returns (results, stats).
+    """
+    bin_ms = int(bin_minutes * 60000)
+    files = list(find_logs(paths))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_summarize, ((f, bin_ms) for f in files), chunksize=16))
+    elapsed = time.perf_counter() - start
+    entries = sum(r['entries'] for r in results)
+    stats = {
+        'files': len(files),
+        'entries': entries,
+        'seconds': round(elapsed, 3),
+        'files_per_second': round(len(files) / elapsed, 1) if elapsed else None,
+        'entries_per_second': round(entries / elapsed, 1) if elapsed else None,
+        'bin_minutes': bin_minutes,
+    }
+    return results, stats
+
+
+def bin_rows(results, keys, bin_minutes):
+    """
+    Build the binned-count table: one row per file and bin, plus combined rows (file "*") that add
+    up every file by clock time. Rates are per hour.
+    """
+    bin_ms = int(bin_minutes * 60000)
+    per_hour = 3600000 / bin_ms
+    combined = defaultdict(Counter)
+    rows = []
+
+    def make_row(name, b, counts):
+        row = {'file': name, 'bin_start': format_ms(b * bin_ms), 'bin_end': format_ms((b + 1) * bin_ms)}
+        for key in keys:
+            row[key] = counts.get(key, 0)
+        for key in keys:
+            row[f'{key}_per_hour'] = round(counts.get(key, 0) * per_hour, 2)
+        row['total'] = sum(counts.values())
+        return row
+
+    for result in results:
+        for b in sorted(result['bins']):
+            counts = result['bins'][b]
+            combined[b].update(counts)
+            rows.append(make_row(result['file'], b, counts))
+    for b in sorted(combined):
+        rows.append(make_row('*', b, combined[b]))
+    return rows
+
+
+def summary_rows(results, keys):
+    """
+    Build the per-file summary table: entry counts per key, time span and hourly rates.
+    """
+    rows = []
+    for result in results:
+        span_ms = (result['last_ms'] - result['first_ms']) if result['entries'] else 0
+        row = {
+            'file': result['file'],
+            'entries': result['entries'],
+            'first': format_ms(result['first_ms']) if result['entries'] else '',
+            'last': format_ms(result['last_ms']) if result['entries'] else '',
+        }
+        for key in keys:
+            row[key] = result['totals'].get(key, 0)
+        for key in keys:
+            row[f'{key}_per_hour'] = round(result['totals'].get(key, 0) * 3600000 / span_ms, 2) if span_ms else ''
+        row['error'] = result['error'] or ''
+        rows.append(row)
+    return rows
+
+
+def write_csv(path, rows):
+    if not rows:
+        open(path, 'w').close()
+        return
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Aggregate session logs into per-class/per-flag counts in time bins, without opening the GUI.")
+    parser.add_argument('paths', nargs='+', help="log files or directories to scan for .csv logs and .cca archives")
+    parser.add_argument('--bin-minutes', type=float, default=DEFAULT_BIN_MINUTES, help="bin width (default 15)")
+    parser.add_argument('--keys', default=DEFAULT_KEYS, help=f"keys to report (default {DEFAULT_KEYS})")
+    parser.add_argument('--bins', help="write binned counts to this CSV")
+    parser.add_argument('--summary', help="write per-file summaries to this CSV")
+    parser.add_argument('--json', help="write everything to this JSON file")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    keys = list(args.keys)
+    results, stats = run(args.paths, args.bin_minutes, args.workers)
+    bins = bin_rows(results, keys, args.bin_minutes)
+    summaries = summary_rows(results, keys)
+    if args.bins:
+        write_csv(args.bins, bins)
+    if args.summary:
+        write_csv(args.summary, summaries)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'stats': stats, 'files': summaries, 'bins': bins}, f, indent=1)
+    if not (args.bins or args.summary or args.json):
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(summaries[0]) if summaries else ['file'])
+        writer.writeheader()
+        writer.writerows(summaries)
+    print(f"{stats['files']} files, {stats['entries']} entries in {stats['seconds']}s "
+          f"({stats['files_per_second']} files/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,301 @@
+import bisect
+import os
+from array import array
+from collections import deque
+
+import journal
+from instrumentation import STATS
+from search_index import Matches, Query, SearchIndex
+from timecodes import format_line, key_char, key_code, key_ms, key_id, parse_line, sort_key
+
+
+# Maximum number of undo steps kept in memory.
+HISTORY_DEPTH = 1000
+
+
+class Lines:
+    """
+    Read-only sequence of a logger's entries as text lines, formatted on demand.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+
+    def __len__(self):
+        return len(self.logger.keys)
+
+    def __getitem__(self, row):
+        keys, codes = self.logger.keys, self.logger.codes
+        if isinstance(row, slice):
+            return [format_line(key_ms(k), c) for k, c in zip(keys[row], codes[row])]
+        return format_line(key_ms(keys[row]), codes[row])
+
+    def __iter__(self):
+        return iter_lines(self.logger.keys, self.logger.codes)
+
+
+def iter_lines(keys, codes, extras=()):
+    for k, c in zip(keys, codes):
+        yield format_line(key_ms(k), c)
+    yield from extras
+
+
+def iter_entries(path):
+    """
+    Stream (ms, key_code) pairs from a log file in file order, skipping lines that are not entries.
+    Used by the headless tools; reads one line at a time so memory stays constant.
+    """
+    with open(path, 'r') as f:
+        for line in f:
+            entry = parse_line(line)
+            if entry is not None:
+                yield entry
+
+
 class CSVLogger:
-    def __init__(self, filename):
+    def __init__(self, filename, history_depth=HISTORY_DEPTH):
         self.filename = filename
+        # Sorted in-memory log. keys[i] packs the timestamp (ms) and stable id of row i into one integer
+        # (timecodes.sort_key) and codes[i] is its key code, about 9 bytes per entry. Sorting and
+        # searching only ever compare these integers.
+        self.keys = array('q')
+        self.codes = array('B')
+        # Lines that do not parse as entries are kept as-is and written after the entries on compaction.
+        self.extras = []
+        self.lines = Lines(self)
+        self.next_id = 0
+        self.index = SearchIndex()
+        # Undo/redo operation logs. Each op is (entry_id, ms, code) for an entry that was deleted.
+        self.history = deque(maxlen=history_depth)
+        self.redo_ops = deque(maxlen=history_depth)
+        # True when the CSV on disk is behind the in-memory log (journal records pending or out of order).
+        self.dirty = False
+        # Objects told about every change to the in-memory log (on_insert(ms, code), on_delete(ms, code),
+        # on_clear()), e.g. the GUI's timeline. Attached after loading.
+        self.observers = []
+        generation = self.load()
+        # All disk writes go through the writer thread.
+        self.writer = self.open_writer(generation)
+        if self.dirty:
+            self.write_log_file()
+
+    def load(self):
+        """
+        Read the log file (if any) into the sorted in-memory index, replaying any journal left behind
+        by a session that did not shut down cleanly. Returns the journal generation.
+        """
+        base_path, records, generation = journal.recover(self.filename)
+        entries = []
+        extras = []
+        in_order = True
+        try:
+            with open(base_path, 'r') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = parse_line(line)
+                    if entry is None:
+                        extras.append(line.rstrip('\n'))
+                    else:
+                        in_order = in_order and not extras and (not entries or entries[-1][0] <= entry[0])
+                        entries.append(entry)
+        except Exception:
+            pass
+        entries.sort(key=lambda entry: entry[0])
+        # Ids follow sorted file order, so the journal (which refers to them) replays the same way every time.
+        self.keys = array('q', (sort_key(ms, i) for i, (ms, _) in enumerate(entries)))
+        self.codes = array('B', (code for _, code in entries))
+        self.extras = extras
+        self.next_id = len(entries)
+        self.rebuild_index()
+        self.dirty = not in_order or base_path != self.filename
+        for record in records:
+            self.replay(record)
+            self.dirty = True
+        return generation
+
+    def open_writer(self, generation):
+        """
+        Start the background writer that persists this log (the CSV journal and compactions).
+        """
+        return journal.JournalWriter(self.filename, generation)
+
+    def replay(self, record):
+        """
+        Apply one journal record: "+<id> <line>" inserts, "-<id> <line>" deletes, "!clear" empties the log.
+        """
+        parsed = journal.parse_record(record)
+        if parsed is None:
+            return
+        op, entry_id, entry = parsed
+        if op == '!clear':
+            self.clear()
+        elif op == '+':
+            # A record retried after a failed write can appear twice.
+            if self.find_row(entry_id, entry[0]) is None:
+                self.insert(entry[0], entry[1], entry_id)
+        else:
+            row = self.find_row(entry_id, entry[0])
+            if row is not None:
+                self.delete_row(row)
+
+    def __len__(self):
+        return len(self.keys)
 
-    def log_entry(self, key, timestamp):
+    def __bool__(self):
+        # An open logger is truthy even with no entries yet; the GUI checks `if self.logger` for "a log is open".
+        return True
+
+    def clear(self):
+        self.keys = array('q')
+        self.codes = array('B')
+        self.extras = []
+        self.index.clear()
+        for observer in self.observers:
+            observer.on_clear()
+
+    def rebuild_index(self):
+        """
+        Rebuild the search index from the in-memory log in one sorted pass.
+        """
+        self.index.rebuild(self.keys, self.codes)
+
+    def ms_at(self, row):
+        return key_ms(self.keys[row])
+
+    def id_at(self, row):
+        return key_id(self.keys[row])
+
+    def key_at(self, row):
+        return key_char(self.codes[row])
+
+    def position(self, ms, entry_id):
         """
-        Append a new log entry with the given key and timestamp to the CSV file.
+        Return the row at which an entry with the given timestamp and id sits (or would be inserted).
         """
-        with open(self.filename, 'a') as file:
-            file.write(f"{timestamp}, {key}\n")
+        return bisect.bisect_left(self.keys, sort_key(ms, entry_id))
 
+    def find_row(self, entry_id, ms):
+        """
+        Return the row of the entry with the given id and timestamp, or None if it is not in the log.
+        """
+        row = self.position(ms, entry_id)
+        if row < len(self.keys) and self.keys[row] == sort_key(ms, entry_id):
+            return row
+        return None
+
+    def step_row(self, pivot, direction, key=None):
+        """
+        Return the row of the first entry after the sort key pivot (direction 1) or the last one before it
+        (direction -1), optionally only among entries logged with the given key; None past either end.
+        Bisects the sorted keys, or the key's sorted entries in the search index.
+        """
+        keys = self.keys if key is None else self.index.by_key.get(key)
+        if not keys:
+            return None
+        i = bisect.bisect_right(keys, pivot) if direction > 0 else bisect.bisect_left(keys, pivot) - 1
+        if not 0 <= i < len(keys):
+            return None
+        return i if key is None else bisect.bisect_left(self.keys, keys[i])
+
+    def insert(self, ms, code, entry_id=None):
+        """
+        Insert an entry into the in-memory index at its sorted position and return its row (0-based).
+        New entries get a fresh id, so entries with equal timestamps keep their insertion order.
+        """
+        if entry_id is None:
+            entry_id = self.next_id
+        self.next_id = max(self.next_id, entry_id + 1)
+        k = sort_key(ms, entry_id)
+        row = bisect.bisect_left(self.keys, k)
+        self.keys.insert(row, k)
+        self.codes.insert(row, code)
+        self.index.add(k, key_char(code))
+        for observer in self.observers:
+            observer.on_insert(ms, code)
+        return row
+
+    def delete_row(self, row):
+        """
+        Remove the entry at the given row (0-based) from the in-memory index and return (id, ms, code).
+        """
+        k = self.keys.pop(row)
+        code = self.codes.pop(row)
+        self.index.remove(k, key_char(code))
+        for observer in self.observers:
+            observer.on_delete(key_ms(k), code)
+        return key_id(k), key_ms(k), code
+
+    def log_entry(self, key, ms):
+        """
+        Log a new entry with the given key at the given timestamp (integer ms).
+        Returns the row (0-based) of the new entry in sorted order, or None if the key cannot be stored.
+        """
+        code = key_code(key)
+        if code is None:
+            return None
+        row = self.insert(ms, code)
+        self.append_journal(f"+{self.id_at(row)} {format_line(ms, code)}")
+        return row
+
+    def append_journal(self, record):
+        """
+        Queue a record for the background journal writer. Never blocks on disk.
+        """
+        self.writer.append(record)
+        self.dirty = True
+
+    @STATS.timed('sort')
     def sort_log_file(self):
         """
-        Sort the log file entries by timestamp in ascending order.
+        Compact the log file: atomically rewrite it in sorted order if it is behind the in-memory log.
         """
-        import re
-        try:
-            with open(self.filename, 'r') as f:
-                lines = [line for line in f if line.strip()]
-            def parse_ts(line):
-                if ',' in line:
-                    ts = line.split(',')[0].strip()
-                elif ':' in line:
-                    ts = line.split(':', 1)[1].strip()
-                else:
-                    return float('inf')
-                parts = re.split(r'[:]', ts)
-                try:
-                    h, m, s = int(parts[0]), int(parts[1]), int(parts[2])
-                    ms = int(parts[3]) if len(parts) > 3 else 0
-                    return h * 3600 + m * 60 + s + ms / 1000.0
-                except Exception:
-                    return float('inf')
-            lines.sort(key=parse_ts)
-            with open(self.filename, 'w') as f:
-                f.writelines(lines)
-        except Exception:
-            pass
+        if self.dirty:
+            self.write_log_file()
+
+    def write_log_file(self):
+        """
+        Queue an atomic rewrite of the log file with the sorted in-memory entries. Only a copy of the
+        arrays is made here; the writer thread formats the lines, and maps entry ids to the rewritten
+        file's numbering for the journal records that follow (see JournalWriter.file_record), so the ids
+        of entries in the log never change. Entries held only by the undo history get new ids after
+        all of those, as the writer requires.
+        """
+        next_id = self.next_id
+        for i, (_, ms, code) in enumerate(self.history):
+            self.history[i] = (self.next_id, ms, code)
+            self.next_id += 1
+        self.writer.compact(self.keys[:], self.codes[:], list(self.extras), next_id)
+        self.dirty = False
+
+    def close(self, wait=False):
+        """
+        Compact the log file and stop the journal writer once everything queued has been written.
+        """
+        self.sort_log_file()
+        self.writer.close(wait)
+
+    def write_error(self):
+        """
+        Return the writer's last failure if it has not been reported yet, else None. Failed writes stay
+        queued and are retried, so this is a warning rather than data already lost.
+        """
+        error = self.writer.error
+        if error is not None:
+            self.writer.error = None
+        return error
+
+    def delete_entry(self, row):
+        """
+        Delete the entry at the given row, recording it in the journal. Returns the deleted op.
+        """
+        op = self.delete_row(row)
+        self.append_journal(f"-{op[0]} {format_line(op[1], op[2])}")
+        return op
 
     def export_log(self, gui):
         """
         Export the current log file to a user-selected location using a file dialog.
         """
-        import os
         from tkinter import filedialog
         if not self.filename:
             return
@@ -57,10 +311,14 @@ class CSVLogger:
         )
         if export_path:
             try:
-                with open(self.filename, 'r') as src, open(export_path, 'w') as dst:
-                    dst.write(src.read())
-            except Exception:
-                pass
+                self.write_export(export_path)
+            except Exception as e:
+                from tkinter import messagebox
+                messagebox.showerror("Export Log", f"Could not export the log to {export_path}: {e}")
+
+    def write_export(self, export_path):
+        with open(export_path, 'w') as dst:
+            dst.writelines(line + "\n" for line in iter_lines(self.keys, self.codes, self.extras))
 
     def clear_log(self, gui):
         """
@@ -72,49 +330,34 @@ class CSVLogger:
         confirm = messagebox.askyesno("Clear Log", "Are you sure you want to clear the log? This cannot be undone.")
         if confirm:
             try:
-                with open(self.filename, 'w') as f:
-                    f.write("")
+                self.clear()
+                self.history.clear()
+                self.redo_ops.clear()
+                self.append_journal('!clear')
                 gui.update_log_display()
             except Exception:
                 pass
 
     def undo(self, gui):
         """
-        Undo the last log entry (or highlighted entry) in the GUI, supporting undo/redo stacks.
+        Delete the highlighted entry in the GUI (or the last entry), recording it in the undo history.
         """
         highlight_next = None
         try:
-            ranges = gui.log_text.tag_ranges('highlight')
-            if ranges:
-                start = ranges[0]
-                line_number = int(str(start).split('.')[0])
-                with open(self.filename, 'r') as f:
-                    lines = [line for line in f if line.strip()]
-                if 1 <= line_number <= len(lines):
-                    removed_entry = lines[line_number - 1]
-                    removed_index = line_number - 1
-                    gui.undo_stack.append((removed_entry, removed_index))
-                    gui.redo_stack.clear()
-                    del lines[line_number - 1]
-                    with open(self.filename, 'w') as f:
-                        f.writelines(lines)
-                    self.sort_log_file()
-                    if line_number > 1:
-                        highlight_next = line_number - 1
-                    elif lines:
-                        highlight_next = 1
-                    else:
-                        highlight_next = None
-            else:
-                with open(self.filename, 'r') as f:
-                    lines = [line for line in f if line.strip()]
-                if lines:
-                    removed_entry = lines[-1]
-                    removed_index = len(lines) - 1
-                    gui.undo_stack.append((removed_entry, removed_index))
-                    gui.redo_stack.clear()
-                self.undo_last_entry()
-                self.sort_log_file()
+            selected = gui.log_view.highlighted
+            if selected:
+                row = min(selected)
+                if row < len(self.lines):
+                    self.history.append(self.delete_entry(row))
+                    self.redo_ops.clear()
+                    gui.log_view.delete_row(row)
+                    if self.lines:
+                        highlight_next = max(row, 1)
+            elif self.lines:
+                row = len(self.lines) - 1
+                self.history.append(self.delete_entry(row))
+                self.redo_ops.clear()
+                gui.log_view.delete_row(row)
         except Exception:
             pass
         gui.paused = True
@@ -122,64 +365,55 @@ class CSVLogger:
 
     def restore_last_undo(self, gui):
         """
-        Restore the last undone log entry from the undo stack and update the GUI log display.
+        Restore the last deleted log entry (with its original id) and update the GUI log display.
         """
-        if gui.undo_stack:
+        if self.history:
             try:
-                entry, index = gui.undo_stack.pop()
-                with open(self.filename, 'r') as f:
-                    lines = [line for line in f if line.strip()]
-                insert_at = min(index, len(lines))
-                lines.insert(insert_at, entry)
-                with open(self.filename, 'w') as f:
-                    f.writelines(lines)
-                self.sort_log_file()
-                with open(self.filename, 'r') as f:
-                    sorted_lines = [line for line in f if line.strip()]
-                highlight_line = None
-                for idx, line in enumerate(sorted_lines, 1):
-                    if line.strip() == entry.strip():
-                        highlight_line = idx
-                        break
-                gui.redo_stack.append((entry, index))
-                gui.update_log_display(highlight_line=highlight_line)
+                entry_id, ms, code = self.history.pop()
+                row = self.insert(ms, code, entry_id)
+                self.append_journal(f"+{entry_id} {format_line(ms, code)}")
+                self.redo_ops.append((entry_id, ms, code))
+                gui.log_view.insert_row(row)
+                gui.update_log_display(highlight_line=row + 1)
             except Exception:
                 pass
 
     def redo(self, gui):
         """
-        Redo the last undone log entry from the redo stack and update the GUI log display.
+        Delete again the entry restored by the last undo and update the GUI log display.
         """
-        if gui.redo_stack:
+        if self.redo_ops:
             try:
-                entry, index = gui.redo_stack.pop()
-                with open(self.filename, 'r') as f:
-                    lines = [line for line in f if line.strip()]
-                for i, line in enumerate(lines):
-                    if line.strip() == entry.strip():
-                        del lines[i]
-                        break
-                with open(self.filename, 'w') as f:
-                    f.writelines(lines)
-                self.sort_log_file()
-                gui.undo_stack.append((entry, index))
-                highlight_line = index if index > 0 else 1
+                entry_id, ms, code = self.redo_ops.pop()
+                row = self.find_row(entry_id, ms)
+                if row is not None:
+                    self.history.append(self.delete_entry(row))
+                    gui.log_view.delete_row(row)
+                highlight_line = max(row or 0, 1) if self.lines else None
                 gui.update_log_display(highlight_line=highlight_line)
             except Exception:
                 pass
 
+    def search(self, text):
+        """
+        Return the entries matching a search string (see search_index.Query.parse for the syntax) as a
+        search_index.Matches. Key, regex and time-range terms are answered from the index; plain text is
+        only compared with the lines that are shown, stepped to or counted.
+        """
+        query = Query.parse(text)
+        if query.keys is None and query.pattern is None and query.start is None and not query.text:
+            return Matches()
+        return self.index.find(query)
+
     def search_entries(self, search_term, gui):
         """
-        Highlight all log entries containing the search_term (case-insensitive) in the GUI log display.
+        Highlight all log entries matching search_term in the GUI log display.
         """
-        if not os.path.exists(self.filename):
+        if not self.lines and not os.path.exists(self.filename):
             print("No log file found.")
             return
-        highlight_lines = []
-        with open(self.filename, 'r') as f:
-            for idx, line in enumerate(f, 1):
-                if search_term.lower() in line.lower():
-                    highlight_lines.append(idx)
-        gui.update_log_display(highlight_lines=highlight_lines)
-        if not highlight_lines:
-            print(f"No entries found containing: {search_term}")
\ No newline at end of file
+        matches = self.search(search_term)
+        first = matches.step(-1, 1)
+        gui.log_view.highlight_matches(matches, None if first is None else bisect.bisect_left(self.keys, first))
+        if first is None:
+            print(f"No entries found containing: {search_term}")
@@ -0,0 +1,155 @@
+import random
+import time
+
+
+class FakeClock:
+    """
+    Manually advanced stand-in for time.monotonic, so simulations run instantly and repeatably.
+    """
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakePlayer:
+    """
+    Stand-in for vlc.MediaPlayer with no video output. Playback position advances with the clock at the
+    current rate, but get_time() only updates every `update_interval` seconds (plus jitter), the way
+    libVLC's reported time moves in coarse steps, and reports the position at the update, not at the poll.
+    """
+    def __init__(self, length_ms=6 * 3600 * 1000, fps=30.0, clock=time.monotonic, update_interval=0.25,
+                 jitter=0.05, seed=0):
+        self.length_ms = length_ms
+        self.fps = fps
+        self.clock = clock
+        self.update_interval = update_interval
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.rate = 1.0
+        self.playing = False
+        self.base_ms = 0.0
+        self.base_t = clock()
+        self.reported_ms = 0
+        self.next_update = self.base_t
+        self.calls = 0
+
+    def true_ms(self, t=None):
+        """
+        Exact playback position at clock time t (now by default).
+        """
+        t = self.clock() if t is None else t
+        ms = self.base_ms + ((t - self.base_t) * 1000.0 * self.rate if self.playing else 0.0)
+        return min(max(ms, 0.0), self.length_ms)
+
+    def rebase(self):
+        now = self.clock()
+        self.base_ms = self.true_ms(now)
+        self.base_t = now
+
+    # --- vlc.MediaPlayer surface ---
+
+    def get_time(self):
+        self.calls += 1
+        now = self.clock()
+        if now >= self.next_update:
+            # libVLC moved its time at next_update, on its own thread; a poll only sees it afterwards.
+            self.reported_ms = int(self.true_ms(max(self.next_update, self.base_t)))
+            self.next_update += self.update_interval + self.random.uniform(-self.jitter, self.jitter)
+            if self.next_update <= now:
+                self.next_update = now + self.update_interval
+        return self.reported_ms
+
+    def set_time(self, ms):
+        self.calls += 1
+        self.base_ms = float(min(max(ms, 0), self.length_ms))
+        self.base_t = self.clock()
+        self.reported_ms = int(self.base_ms)
+
+    def play(self):
+        self.calls += 1
+        self.rebase()
+        self.playing = True
+        return 0
+
+    def pause(self):
+        self.calls += 1
+        self.rebase()
+        self.playing = not self.playing
+
+    def set_pause(self, paused):
+        self.calls += 1
+        self.rebase()
+        self.playing = not paused
+
+    def stop(self):
+        self.calls += 1
+        self.playing = False
+
+    def is_playing(self):
+        return int(self.playing)
+
+    def get_rate(self):
+        return self.rate
+
+    def set_rate(self, rate):
+        self.calls += 1
+        self.rebase()
+        self.rate = rate
+        return 0
+
+    def next_frame(self):
+        self.calls += 1
+        self.playing = False
+        self.set_time(self.base_ms + 1000.0 / self.fps)
+
+    def get_length(self):
+        return self.length_ms
+
+    def get_fps(self):
+        return self.fps
+
+    def set_media(self, media):
+        pass
+
+    def set_hwnd(self, handle):
+        pass
+
+    def set_xwindow(self, handle):
+        pass
+
+
+class FakeText:
+    """
+    Stand-in for the tkinter Text widget LogView draws into, for running the log pane headless.
+    Keeps no content; it only accepts the calls LogView makes.
+    """
+    def __init__(self, height=25):
+        self.height = height
+        self.calls = 0
+
+    def cget(self, option):
+        return self.height if option == 'height' else ''
+
+    def index(self, index):
+        return '1.0'
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+
+    config = configure = insert = delete = tag_add = tag_remove = tag_configure = bind = _call
+
+
+class FakeScrollbar:
+    def __init__(self):
+        self.position = (0.0, 1.0)
+
+    def set(self, first, last):
+        self.position = (first, last)
+
+    def config(self, **kwargs):
+        pass
@@ -0,0 +1,336 @@
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+from collections import Counter
+
+from timecodes import key_char
+
+# The feed only ever listens on loopback: stations and the supervisor's aggregator share one machine (or
+# reach it over an SSH tunnel), and nothing is exposed to the network.
+HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_AGGREGATOR_PORT = 8800
+# Events buffered per /events subscriber. A subscriber that falls further behind stops getting events
+# and is sent a fresh snapshot once it has caught up, so publishing never waits on a slow client.
+SUBSCRIBER_QUEUE = 1024
+# Events buffered in the aggregator between the station readers and the merge. Readers wait while it is
+# full, which stops them reading their sockets and so pushes back on the stations through TCP.
+AGGREGATOR_QUEUE = 4096
+# Delay before the aggregator reconnects to a station that went away.
+RECONNECT_S = 1.0
+# Longest request head a client may send.
+MAX_REQUEST = 8192
+
+
+def encode(event):
+    return (json.dumps(event, separators=(',', ':')) + '\n').encode()
+
+
+def http_head(status, content_type, length=None):
+    head = f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nCache-Control: no-cache\r\nConnection: close\r\n"
+    if length is not None:
+        head += f"Content-Length: {length}\r\n"
+    return (head + "\r\n").encode()
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(SUBSCRIBER_QUEUE)
+        self.lagged = False
+
+
+class Hub:
+    """
+    Running counts plus a fan-out of events, served over HTTP on localhost:
+      GET /counts   the current snapshot as JSON
+      GET /events   newline-delimited JSON: a snapshot, then one line per event as it happens
+    Lives on one asyncio event loop; subclasses define snapshot().
+    """
+    def __init__(self, name):
+        self.name = name
+        self.seq = 0
+        self.subscribers = set()
+        self.server = None
+        self.port = None
+        # Events not delivered to a lagging subscriber (each such subscriber got a snapshot instead)
+        self.dropped = 0
+
+    def snapshot(self):
+        raise NotImplementedError
+
+    def publish(self, event):
+        """
+        Number an event and queue it for every subscriber, encoding it once.
+        """
+        self.seq += 1
+        event['seq'] = self.seq
+        line = encode(event)
+        for subscriber in self.subscribers:
+            if subscriber.lagged:
+                self.dropped += 1
+                continue
+            try:
+                subscriber.queue.put_nowait(line)
+            except asyncio.QueueFull:
+                subscriber.lagged = True
+                self.dropped += 1
+
+    async def serve(self, port):
+        self.server = await asyncio.start_server(self.handle, HOST, port, limit=MAX_REQUEST)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            parts = head.split(b' ', 2)
+            path = parts[1].split(b'?')[0] if len(parts) > 2 else b''
+            if parts[0] != b'GET':
+                writer.write(http_head("405 Method Not Allowed", "text/plain", 0))
+            elif path == b'/counts':
+                body = encode(self.snapshot())
+                writer.write(http_head("200 OK", "application/json", len(body)) + body)
+            elif path == b'/events':
+                await self.stream(writer)
+            else:
+                writer.write(http_head("404 Not Found", "text/plain", 0))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # The loop is shutting down with this client still subscribed; the connection just closes.
+            pass
+        finally:
+            writer.close()
+
+    async def stream(self, writer):
+        """
+        Send a snapshot and then every event to one subscriber until it disconnects. Whatever is queued
+        is written in one go before waiting for the socket to drain.
+        """
+        subscriber = Subscriber()
+        self.subscribers.add(subscriber)
+        try:
+            writer.write(http_head("200 OK", "application/x-ndjson") + encode(self.snapshot()))
+            await writer.drain()
+            while True:
+                if subscriber.lagged and subscriber.queue.empty():
+                    subscriber.lagged = False
+                    writer.write(encode(self.snapshot()))
+                writer.write(await subscriber.queue.get())
+                while not subscriber.queue.empty():
+                    writer.write(subscriber.queue.get_nowait())
+                await writer.drain()
+        finally:
+            self.subscribers.discard(subscriber)
+
+
+class StationHub(Hub):
+    """
+    One annotation station's feed: the open video's per-key counts and each entry logged or removed.
+    """
+    def __init__(self, name):
+        super().__init__(name)
+        self.video = ""
+        self.counts = Counter()
+        self.total = 0
+
+    def snapshot(self):
+        return {'type': 'snapshot', 'station': self.name, 'video': self.video, 'counts': dict(self.counts),
+                'total': self.total, 'seq': self.seq}
+
+    def reset(self, video, counts):
+        """
+        Start over for a newly shown log (counts is {key: entries}), and tell subscribers.
+        """
+        self.video = video
+        self.counts = Counter(counts)
+        self.total = sum(self.counts.values())
+        self.publish(self.snapshot())
+
+    def entry(self, op, ms, key, t):
+        """
+        Publish an entry added (op '+') or removed ('-') at log time ms; t is the wall time it happened.
+        """
+        delta = 1 if op == '+' else -1
+        self.counts[key] += delta
+        if self.counts[key] <= 0:
+            del self.counts[key]
+        self.total += delta
+        self.publish({'type': 'entry', 'station': self.name, 'op': op, 'ms': ms, 'key': key,
+                      'counts': dict(self.counts), 'total': self.total, 't': t})
+
+
+class FeedServer:
+    """
+    A station's feed inside the GUI: a StationHub on its own thread and event loop, fed from the Tk thread
+    as an observer of the open logger. Nothing here ever waits on the network.
+    """
+    def __init__(self, port=DEFAULT_PORT, name=None):
+        self.hub = StationHub(name or f"{socket.gethostname()}:{port}")
+        self.loop = asyncio.new_event_loop()
+        self.port = port
+        self.video = ""
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="feed", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.hub.serve(self.port))
+        except OSError as e:
+            self.error = e
+            return
+        self.loop.run_forever()
+
+    def call(self, fn, *args):
+        try:
+            self.loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            pass
+
+    def set_source(self, logger, video):
+        self.video = video
+        counts = {key: len(entries) for key, entries in logger.index.by_key.items()} if logger else {}
+        self.call(self.hub.reset, video, counts)
+
+    def on_insert(self, ms, code):
+        self.call(self.hub.entry, '+', ms, key_char(code), time.time())
+
+    def on_delete(self, ms, code):
+        self.call(self.hub.entry, '-', ms, key_char(code), time.time())
+
+    def on_clear(self):
+        self.call(self.hub.reset, self.video, {})
+
+    def close(self):
+        self.call(self.loop.stop)
+
+
+class Aggregator(Hub):
+    """
+    Merges the feeds of many stations into one: follows each station's /events, keeps every station's
+    latest counts, and republishes their events (and combined counts at /counts) to its own subscribers.
+    Station lines go through one bounded queue to a single merge task; see AGGREGATOR_QUEUE.
+    """
+    def __init__(self, ports, name="aggregator"):
+        super().__init__(name)
+        self.ports = list(ports)
+        self.stations = {}
+        self.queue = None
+        self.received = 0
+
+    def snapshot(self):
+        combined = Counter()
+        for station in self.stations.values():
+            combined.update(station['counts'])
+        return {'type': 'snapshot', 'station': self.name, 'counts': dict(combined),
+                'total': sum(station['total'] for station in self.stations.values()),
+                'stations': self.stations, 'seq': self.seq}
+
+    async def follow(self, port):
+        """
+        Read one station's event stream into the merge queue, reconnecting whenever it drops.
+        """
+        while True:
+            writer = None
+            try:
+                reader, writer = await asyncio.open_connection(HOST, port)
+                writer.write(b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                await reader.readuntil(b'\r\n\r\n')
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    await self.queue.put((port, line))
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                pass
+            finally:
+                if writer is not None:
+                    writer.close()
+            for station in self.stations.values():
+                if station['port'] == port:
+                    station['connected'] = False
+            await asyncio.sleep(RECONNECT_S)
+
+    async def merge(self):
+        while True:
+            port, line = await self.queue.get()
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            self.received += 1
+            station = self.stations.setdefault(event['station'], {'port': port, 'video': "", 'counts': {},
+                                                                  'total': 0, 'connected': True})
+            station.update(port=port, counts=event['counts'], total=event['total'], connected=True)
+            if 'video' in event:
+                station['video'] = event['video']
+            event['station_seq'] = event.pop('seq', None)
+            if event['type'] == 'snapshot':
+                event['type'] = 'station'
+            self.publish(event)
+
+    async def run(self, port):
+        self.queue = asyncio.Queue(AGGREGATOR_QUEUE)
+        await self.serve(port)
+        await asyncio.gather(self.merge(), *(self.follow(p) for p in self.ports))
+
+
+async def fetch_counts(port):
+    """
+    Return the snapshot served at /counts by a station or aggregator on localhost.
+    """
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        writer.write(b"GET /counts HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await reader.readuntil(b'\r\n\r\n')
+        return json.loads(await reader.read())
+    finally:
+        writer.close()
+
+
+async def watch(port, interval=1.0):
+    """
+    Print the counts of a feed (station or aggregator) every interval seconds.
+    """
+    while True:
+        try:
+            snapshot = await fetch_counts(port)
+            stations = snapshot.get('stations')
+            print(f"{time.strftime('%H:%M:%S')}  "
+                  + (f"{sum(s['connected'] for s in stations.values())}/{len(stations)} stations  " if stations else "")
+                  + f"total {snapshot['total']}  "
+                  + "  ".join(f"{k} {v}" for k, v in sorted(snapshot['counts'].items())), flush=True)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            print(f"{time.strftime('%H:%M:%S')}  no feed on port {port}: {e}", flush=True)
+        await asyncio.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local live-count feed: aggregate stations or watch a feed.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    aggregate = sub.add_parser('aggregate', help="merge the feeds of several stations")
+    aggregate.add_argument('stations', nargs='+', type=int, help="station feed ports (on localhost)")
+    aggregate.add_argument('--port', type=int, default=DEFAULT_AGGREGATOR_PORT,
+                           help=f"port to serve the merged feed on (default {DEFAULT_AGGREGATOR_PORT})")
+    watcher = sub.add_parser('watch', help="print the counts of a station or aggregator feed")
+    watcher.add_argument('port', type=int)
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'aggregate':
+            aggregator = Aggregator(args.stations)
+            asyncio.run(aggregator.run(args.port))
+        else:
+            asyncio.run(watch(args.port))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
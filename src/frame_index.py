@@ -0,0 +1,173 @@
+import bisect
+import json
+import os
+import shutil
+import subprocess
+import threading
+from array import array
+from fractions import Fraction
+
+# Bump when the cache layout changes so stale caches are rebuilt.
+# 2: times are relative to the stream's start, like VLC's playback time.
+CACHE_VERSION = 2
+
+
+def cache_path(video_path):
+    return os.path.splitext(video_path)[0] + ".frames"
+
+
+def video_stamp(video_path):
+    """
+    Identify a video file by size and mtime, to tell whether a cached index still matches it.
+    """
+    st = os.stat(video_path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+class FrameIndex:
+    """
+    Per-video frame table: presentation time (ms) of every frame in display order, which frames are
+    keyframes, and the stream's true fps and duration. Times are measured from the stream's start, the
+    same zero as VLC's get_time/set_time, whatever the container's first timestamp. Built once with
+    ffprobe and cached next to the video, so frame stepping can target exact frame times instead of
+    guessing from a typed-in fps.
+    """
+    def __init__(self, pts_ms, keyframes, fps, duration_ms):
+        self.pts_ms = pts_ms
+        self.keyframes = keyframes
+        self.fps = fps
+        self.duration_ms = duration_ms
+
+    def __len__(self):
+        return len(self.pts_ms)
+
+    def frame_at(self, ms):
+        """
+        Return the number of the frame on screen at playback time ms.
+        """
+        return max(0, bisect.bisect_right(self.pts_ms, ms) - 1)
+
+    def frame_time(self, frame):
+        """
+        Return the presentation time (ms) of a frame, clamped to the first/last frame.
+        """
+        return self.pts_ms[min(max(frame, 0), len(self.pts_ms) - 1)]
+
+    @classmethod
+    def build(cls, video_path, ffprobe='ffprobe'):
+        """
+        Scan a video's packets with ffprobe (no decoding) and return its FrameIndex.
+        """
+        info = subprocess.run(
+            [ffprobe, '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'stream=avg_frame_rate,r_frame_rate,duration,start_time', '-of', 'json', video_path],
+            capture_output=True, text=True, check=True)
+        stream = json.loads(info.stdout)['streams'][0]
+        rate = stream.get('avg_frame_rate') or stream.get('r_frame_rate') or '0/1'
+        fps = float(Fraction(rate)) if rate != '0/0' else 0.0
+        frames = []
+        proc = subprocess.Popen(
+            [ffprobe, '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path],
+            stdout=subprocess.PIPE, text=True)
+        for line in proc.stdout:
+            pts_time, _, flags = line.strip().partition(',')
+            if not pts_time or pts_time == 'N/A':
+                continue
+            frames.append((round(float(pts_time) * 1000), 'K' in flags))
+        if proc.wait() != 0:
+            raise subprocess.CalledProcessError(proc.returncode, ffprobe)
+        # Packets come in decode order; sort into display order.
+        frames.sort()
+        # Stream timestamps need not start at 0 (B-frame delay, MPEG-TS clocks); playback time does.
+        # Frames before the start (dropped by an edit list) are never shown.
+        try:
+            origin = round(float(stream['start_time']) * 1000)
+        except (KeyError, ValueError):
+            origin = frames[0][0] if frames else 0
+        frames = [(pts - origin, key) for pts, key in frames if pts >= origin]
+        pts_ms = array('q', (pts for pts, _ in frames))
+        keyframes = array('B', (key for _, key in frames))
+        if not fps and len(pts_ms) > 1:
+            fps = (len(pts_ms) - 1) * 1000.0 / (pts_ms[-1] - pts_ms[0])
+        try:
+            duration_ms = round(float(stream['duration']) * 1000)
+        except (KeyError, ValueError):
+            duration_ms = pts_ms[-1] + round(1000 / fps) if len(pts_ms) and fps else 0
+        return cls(pts_ms, keyframes, fps, duration_ms)
+
+    def save(self, path, stamp):
+        """
+        Write the index as one JSON header line followed by the raw pts and keyframe arrays.
+        """
+        header = dict(stamp, version=CACHE_VERSION, fps=self.fps, duration_ms=self.duration_ms, count=len(self))
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(json.dumps(header).encode() + b'\n')
+            self.pts_ms.tofile(f)
+            self.keyframes.tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, stamp):
+        """
+        Read a cached index, or return None if it is missing or was built for a different file.
+        """
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != CACHE_VERSION or any(header.get(k) != v for k, v in stamp.items()):
+                    return None
+                pts_ms = array('q')
+                pts_ms.fromfile(f, header['count'])
+                keyframes = array('B')
+                keyframes.fromfile(f, header['count'])
+        except Exception:
+            return None
+        return cls(pts_ms, keyframes, header['fps'], header['duration_ms'])
+
+    @classmethod
+    def for_video(cls, video_path):
+        """
+        Return the cached index for a video, building (and caching) it if needed. Returns None if
+        ffprobe is not available or cannot read the file.
+        """
+        stamp = video_stamp(video_path)
+        path = cache_path(video_path)
+        index = cls.load(path, stamp)
+        if index is not None:
+            return index
+        if shutil.which('ffprobe') is None:
+            return None
+        try:
+            index = cls.build(video_path)
+        except Exception:
+            return None
+        if not len(index):
+            return None
+        try:
+            index.save(path, stamp)
+        except Exception:
+            pass
+        return index
+
+
+def load_in_background(video_path, callback):
+    """
+    Load or build a video's FrameIndex on a worker thread and call callback(index) when done
+    (index may be None). The callback runs on the worker thread.
+    """
+    thread = threading.Thread(target=lambda: callback(FrameIndex.for_video(video_path)), daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) != 2:
+        raise SystemExit("usage: python frame_index.py VIDEO")
+    index = FrameIndex.for_video(sys.argv[1])
+    if index is None:
+        raise SystemExit("Could not index video (is ffprobe installed?)")
+    print(f"{len(index)} frames, {index.fps:.3f} fps, {index.duration_ms} ms, "
+          f"{sum(index.keyframes)} keyframes")
@@ -0,0 +1,74 @@
+import time
+from collections import deque
+from queue import Empty, SimpleQueue
+
+from instrumentation import STATS
+
+# Number of recent key-to-screen latencies kept for stats.
+LATENCY_SAMPLES = 2000
+# Target key-to-screen latency: one frame at 60 Hz.
+LATENCY_BUDGET_MS = 16.0
+
+
+class KeyQueue:
+    """
+    Keystrokes waiting to be logged. Key handlers only stamp the entry and put it on the queue; the
+    queued entries are applied in one batch from a single idle callback, so a burst of keys costs one
+    log-pane refresh instead of one per key and the event loop never backs up behind the log.
+
+    schedule is Tk's after_idle (or anything that runs a callback later on the same thread), and
+    apply_batch(entries) logs a list of (key, ms, t) and refreshes the display. t is the instant the key
+    went down on the monotonic clock; the time from t until apply_batch returns is recorded as the
+    key-to-screen latency.
+    """
+    def __init__(self, schedule, apply_batch, clock=time.monotonic, samples=LATENCY_SAMPLES):
+        self.schedule = schedule
+        self.apply_batch = apply_batch
+        self.clock = clock
+        self.queue = SimpleQueue()
+        self.scheduled = False
+        self.latencies = deque(maxlen=samples)
+        self.batches = 0
+        self.keys = 0
+
+    def put(self, key, ms, t=None):
+        self.queue.put((key, ms, self.clock() if t is None else t))
+        if not self.scheduled:
+            self.scheduled = True
+            self.schedule(self.drain)
+
+    def drain(self):
+        """
+        Apply everything queued so far as one batch.
+        """
+        self.scheduled = False
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        if not batch:
+            return
+        self.apply_batch(batch)
+        done = self.clock()
+        for _, _, t in batch:
+            self.latencies.append((done - t) * 1000.0)
+            STATS.record('key_to_screen', (done - t) * 1000.0)
+        self.batches += 1
+        self.keys += len(batch)
+
+    def stats(self):
+        """
+        Return {'keys', 'batches', 'p50_ms', 'p99_ms', 'max_ms'} over the recent latencies.
+        """
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {'keys': self.keys, 'batches': self.batches, 'p50_ms': None, 'p99_ms': None, 'max_ms': None}
+        return {
+            'keys': self.keys,
+            'batches': self.batches,
+            'p50_ms': round(latencies[len(latencies) // 2], 3),
+            'p99_ms': round(latencies[int(len(latencies) * 0.99)], 3),
+            'max_ms': round(latencies[-1], 3),
+        }
@@ -0,0 +1,170 @@
+import functools
+import json
+import math
+import os
+import platform
+import threading
+import time
+from collections import Counter
+
+# Set CARCOUNTER_STATS=1 to record from startup; otherwise recording starts when the stats panel is opened.
+ENV_VAR = 'CARCOUNTER_STATS'
+# Histogram resolution: buckets per doubling of latency (about 19% wide each).
+BUCKETS_PER_OCTAVE = 4
+# Smallest latency the histograms resolve; anything faster lands in the first bucket.
+MIN_MS = 0.001
+
+
+class Histogram:
+    """
+    Latency histogram with logarithmic buckets: constant memory however many samples are recorded,
+    and percentiles accurate to a bucket width.
+    """
+    def __init__(self):
+        self.buckets = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        bucket = int(math.log2(ms / MIN_MS) * BUCKETS_PER_OCTAVE) if ms > MIN_MS else 0
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        """
+        Return the upper edge (ms) of the bucket holding the p-th percentile, or None with no samples.
+        """
+        if not self.count:
+            return None
+        rank = p / 100.0 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max, MIN_MS * 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE))
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total / self.count, 4) if self.count else None,
+            'p50_ms': round(self.percentile(50), 4) if self.count else None,
+            'p99_ms': round(self.percentile(99), 4) if self.count else None,
+            'max_ms': round(self.max, 4),
+        }
+
+
+class Stats:
+    """
+    Opt-in latency histograms and counters. While disabled, timers and counters cost one attribute
+    check. Safe to record from the journal writer and other worker threads.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = Counter()
+        self.started = time.time()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = Counter()
+            self.started = time.time()
+
+    def record(self, name, ms):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(ms)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += n
+
+    def timer(self, name):
+        """
+        Context manager that records the time spent in its block under name.
+        """
+        return Timer(self, name)
+
+    def timed(self, name):
+        """
+        Decorator that records the duration of every call under name.
+        """
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, (time.perf_counter() - start) * 1000.0)
+            return wrapper
+        return decorate
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': {name: h.summary() for name, h in sorted(self.histograms.items())},
+                'counters': dict(sorted(self.counters.items())),
+                'seconds': round(time.time() - self.started, 1),
+            }
+
+    def format(self):
+        """
+        Render the current stats as fixed-width text for the stats panel.
+        """
+        snap = self.snapshot()
+        lines = [f"{'operation':<18}{'n':>7}{'p50':>9}{'p99':>9}"]
+        for name, h in snap['histograms'].items():
+            lines.append(f"{name:<18}{h['count']:>7}{h['p50_ms']:>9.2f}{h['p99_ms']:>9.2f}")
+        for name, value in snap['counters'].items():
+            lines.append(f"{name:<25}{value:>18}")
+        lines.append(f"over {snap['seconds']:.0f} s (ms)")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """
+        Write the stats, with enough context to compare machines, to a JSON file.
+        """
+        data = self.snapshot()
+        data.update({
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        })
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
+
+
+class Timer:
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if self.stats.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            self.stats.record(self.name, (time.perf_counter() - self.start) * 1000.0)
+            self.start = None
+
+
+# Process-wide stats shared by the GUI, logger, log view and journal writer.
+STATS = Stats(enabled=bool(os.environ.get(ENV_VAR)))
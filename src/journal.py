@@ -0,0 +1,352 @@
+import bisect
+import glob
+import os
+import queue
+import threading
+import time
+from array import array
+
+from instrumentation import STATS
+from timecodes import format_line, key_id, key_ms, parse_line
+
+
+# Writes that fail (a full disk, a network share gone away) stay queued and are retried this often...
+RETRY_S = 1.0
+# ...and on close, this many more times before the writer gives up and exits.
+CLOSE_RETRIES = 3
+
+
+def journal_path(csv_path):
+    return csv_path + '.journal'
+
+
+def compact_path(csv_path, generation):
+    return f"{csv_path}.{generation}.compact"
+
+
+def read_journal(csv_path):
+    """
+    Return (generation, records) from the journal next to csv_path. The first line of a journal
+    written after a compaction is "@<generation>"; journals without one are generation 0.
+    """
+    generation = 0
+    records = []
+    try:
+        with open(journal_path(csv_path), 'r') as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if not line:
+                    continue
+                if line.startswith('@') and not records:
+                    generation = int(line[1:])
+                else:
+                    records.append(line)
+    except Exception:
+        pass
+    return generation, records
+
+
+def parse_record(record):
+    """
+    Split a journal record into (op, entry_id, (ms, code)): op is '+' (insert) or '-' (delete), or
+    '!clear' with no id or entry. Returns None for records that cannot be applied.
+    """
+    if record == '!clear':
+        return record, None, None
+    op = record[:1]
+    try:
+        entry_id, line = record[1:].split(' ', 1)
+        entry_id = int(entry_id)
+    except ValueError:
+        return None
+    entry = parse_line(line)
+    if op not in '+-' or entry is None:
+        return None
+    return op, entry_id, entry
+
+
+def recover(csv_path):
+    """
+    Work out what survived the last session. Returns (base_path, records, generation): the file
+    holding the last complete compaction and the journal records that still need replaying on top of it.
+
+    A compaction writes <csv>.<gen>.compact, then restarts the journal with an "@<gen>" header, then
+    renames the compact file over the CSV. If a crash leaves a compact file behind, the journal only
+    belongs on top of it if its header says it was started by that compaction.
+    """
+    generation, records = read_journal(csv_path)
+    compacts = sorted(glob.glob(glob.escape(csv_path) + '.*.compact'))
+    for path in compacts:
+        try:
+            compact_gen = int(path[len(csv_path) + 1:-len('.compact')])
+        except ValueError:
+            continue
+        if compact_gen == generation:
+            return path, records, generation
+        if compact_gen == generation + 1:
+            return path, [], compact_gen
+    return csv_path, records, generation
+
+
+def replay_entries(base_path, records):
+    """
+    Return the (ms, code) entries of a log file with journal records applied, without touching any files.
+    """
+    with open(base_path, 'r') as f:
+        entries = sorted((entry for entry in map(parse_line, f) if entry is not None), key=lambda entry: entry[0])
+    # Ids follow sorted file order, as in CSVLogger.load.
+    live = dict(enumerate(entries))
+    for record in records:
+        parsed = parse_record(record)
+        if parsed is None:
+            continue
+        op, entry_id, entry = parsed
+        if op == '!clear':
+            live.clear()
+        elif op == '+':
+            live[entry_id] = entry
+        else:
+            live.pop(entry_id, None)
+    # In id order, so sorting by time leaves equal times in the order the logger keeps them.
+    return [live[entry_id] for entry_id in sorted(live)]
+
+
+def pending_entries(csv_path):
+    """
+    Return the entries of a log whose last session did not close cleanly, replayed read-only the way
+    CSVLogger would load them (in id order, not yet sorted by time), or None if the CSV itself is up to date.
+    """
+    base_path, records, _ = recover(csv_path)
+    if base_path == csv_path and not records:
+        return None
+    return replay_entries(base_path, records)
+
+
+def fsync_dir(path):
+    """
+    Best-effort fsync of a directory so renames are durable (not supported on Windows).
+    """
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except Exception:
+        return
+    try:
+        os.fsync(fd)
+    except Exception:
+        pass
+    finally:
+        os.close(fd)
+
+
+class JournalWriter(threading.Thread):
+    """
+    Background writer for a CSVLogger. Records are appended to <csv>.journal in batches and fsynced
+    at most every sync_interval seconds. Compaction replaces the CSV atomically (temp file + rename)
+    and restarts the journal. Nothing here ever runs on the Tk thread, so slow disks or network shares
+    cannot stall key handling.
+    """
+    def __init__(self, csv_path, generation=0, sync_interval=1.0):
+        # Not a daemon: pending writes are finished before the interpreter exits.
+        super().__init__(name=f"journal:{os.path.basename(csv_path)}", daemon=False)
+        self.csv_path = csv_path
+        self.generation = generation
+        self.sync_interval = sync_interval
+        self.queue = queue.SimpleQueue()
+        # The failure that started the current run of failed writes; cleared once the GUI has been told
+        # (see CSVLogger.write_error). failing stays set until a write succeeds again.
+        self.error = None
+        self.failing = False
+        # Appends and compactions not yet written, in order. Kept and retried after a failure.
+        self.backlog = []
+        # Records appended since the last compaction; a clean close with none removes the journal.
+        self.pending_records = 0
+        # Entry ids in the logger never change, but a CSV reloaded after a compaction numbers its entries
+        # by line (see CSVLogger.load). Records written after a compaction are translated to that
+        # numbering: id_map holds the compacted entries' ids, sorted, with their lines, and id_floor the
+        # logger's next id at the time; later ids follow the compacted lines in the same order. None
+        # before any compaction, when the logger's ids are still the file's.
+        self.id_map = None
+        self.id_floor = 0
+        self.start()
+
+    def append(self, record):
+        self.queue.put(('append', record))
+
+    def compact(self, keys, codes, extras, next_id):
+        """
+        Queue an atomic rewrite of the CSV with a snapshot of a logger's sorted keys and codes (arrays the
+        caller no longer changes) followed by its extra lines. Formatting happens on this thread. next_id
+        is the logger's next entry id: every entry not in the snapshot that a later record can refer
+        to must have an id at or above it.
+        """
+        self.queue.put(('compact', (keys, codes, extras, next_id)))
+
+    def flush(self, timeout=None):
+        """
+        Block until everything queued so far (appends and compactions) has been written, or has failed
+        and is queued for a retry (see error). Returns False on timeout.
+        """
+        done = threading.Event()
+        self.queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self, wait=False):
+        self.queue.put(('close', None))
+        if wait:
+            self.join()
+
+    def run(self):
+        journal = None
+        last_sync = time.monotonic()
+        unsynced = False
+        # A failed write may have left part of a record behind; the next one starts on a fresh line.
+        torn = False
+        closing = False
+        close_attempts = 0
+        while True:
+            if self.backlog:
+                timeout = RETRY_S
+            elif unsynced:
+                timeout = max(0.0, self.sync_interval - (time.monotonic() - last_sync))
+            else:
+                timeout = None
+            try:
+                batch = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            # Group commit: everything queued so far goes out in one write.
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            flushed = []
+            for op, payload in batch:
+                if op == 'flush':
+                    flushed.append(payload)
+                elif op == 'close':
+                    closing = True
+                else:
+                    self.backlog.append((op, payload))
+            start = time.perf_counter()
+            written = 0
+            # Ops known to be on disk: appends once the journal has been flushed, compactions once done.
+            done = 0
+            try:
+                for i, (op, payload) in enumerate(self.backlog):
+                    if op == 'append':
+                        if journal is None:
+                            journal = open(journal_path(self.csv_path), 'a')
+                            STATS.count('file_opens')
+                        if torn:
+                            journal.write('\n')
+                            torn = False
+                        payload = self.file_record(payload)
+                        journal.write(payload + '\n')
+                        written += len(payload) + 1
+                        self.pending_records += 1
+                        unsynced = True
+                    else:
+                        if journal is not None:
+                            journal.close()
+                            journal = None
+                        done = i
+                        with STATS.timer('compaction_write'):
+                            self.write_compaction(payload)
+                        self.pending_records = 0
+                        unsynced = False
+                        done = i + 1
+                if journal is not None:
+                    journal.flush()
+                    if unsynced and (closing or time.monotonic() - last_sync >= self.sync_interval):
+                        os.fsync(journal.fileno())
+                        unsynced = False
+                        last_sync = time.monotonic()
+                done = len(self.backlog)
+                self.failing = False
+            except Exception as e:
+                if not self.failing:
+                    self.error = e
+                self.failing = True
+                torn = True
+                if journal is not None:
+                    try:
+                        journal.close()
+                    except Exception:
+                        pass
+                    journal = None
+            # Appends retried after a failure may reach the journal twice; replaying one is idempotent.
+            del self.backlog[:done]
+            if written:
+                STATS.record('disk_write', (time.perf_counter() - start) * 1000.0)
+                STATS.count('bytes_written', written)
+            # Flushes and closes are honoured even when writes failed, so nobody waits on a dead disk forever.
+            for event in flushed:
+                event.set()
+            if closing:
+                close_attempts += 1
+                if self.backlog and close_attempts <= CLOSE_RETRIES:
+                    continue
+                if journal is not None:
+                    try:
+                        journal.close()
+                    except Exception as e:
+                        self.error = e
+                if not self.backlog and self.pending_records == 0:
+                    try:
+                        os.remove(journal_path(self.csv_path))
+                    except Exception:
+                        pass
+                return
+
+    def file_record(self, record):
+        """
+        Translate a record's entry id to the numbering of the CSV as last compacted.
+        """
+        if self.id_map is None or record[:1] not in ('+', '-'):
+            return record
+        entry_id, sep, line = record[1:].partition(' ')
+        try:
+            entry_id = int(entry_id)
+        except ValueError:
+            return record
+        ids, lines = self.id_map
+        i = bisect.bisect_left(ids, entry_id)
+        if i < len(ids) and ids[i] == entry_id:
+            file_id = lines[i]
+        else:
+            file_id = len(ids) + entry_id - self.id_floor
+        return f"{record[0]}{file_id}{sep}{line}"
+
+    def write_compaction(self, snapshot):
+        keys, codes, extras, next_id = snapshot
+        generation = self.generation + 1
+        target = compact_path(self.csv_path, generation)
+        tmp = target + '.tmp'
+        with open(tmp, 'w') as f:
+            f.writelines(format_line(key_ms(k), c) + '\n' for k, c in zip(keys, codes))
+            f.writelines(line + '\n' for line in extras)
+            f.flush()
+            written = f.tell()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        fsync_dir(target)
+        with open(journal_path(self.csv_path), 'w') as f:
+            written += f.write(f"@{generation}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        STATS.count('file_opens', 2)
+        STATS.count('bytes_written', written)
+        self.generation = generation
+        ids = [key_id(k) for k in keys]
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        self.id_map = (array('q', (ids[i] for i in order)), array('q', order))
+        self.id_floor = next_id
+        os.replace(target, self.csv_path)
+        fsync_dir(self.csv_path)
+        # Anything left over from an interrupted compaction is now stale.
+        for path in glob.glob(glob.escape(self.csv_path) + '.*.compact*'):
+            try:
+                os.remove(path)
+            except Exception:
+                pass
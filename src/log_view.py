@@ -0,0 +1,204 @@
+from instrumentation import STATS
+
+
+class LogView:
+    """
+    Virtualized log display. Only the rows that fit in the Text widget are ever inserted into it,
+    so refreshing, inserting and deleting cost the same for a 100-line log as for a 100k-line one.
+    The source is any object with len(), a `lines` list and its rows' sort `keys` (e.g. CSVLogger).
+    """
+    def __init__(self, text, scrollbar):
+        self.text = text
+        self.scrollbar = scrollbar
+        self.height = int(text.cget('height'))
+        self.source = None
+        self.top = 0
+        self.highlighted = set()
+        # Search results (search_index.Matches), looked up by sort key for the visible rows only.
+        self.matches = None
+        self.text.tag_configure('highlight', background='yellow')
+        self.scrollbar.config(command=self.yview)
+        self.text.bind('<MouseWheel>', self.on_wheel)
+        self.text.bind('<Button-4>', lambda e: self.scroll(-3))
+        self.text.bind('<Button-5>', lambda e: self.scroll(3))
+
+    def set_source(self, source):
+        """
+        Display a new log (or None) from the top, with nothing highlighted.
+        """
+        self.source = source
+        self.top = 0
+        self.highlighted = set()
+        self.matches = None
+        self.render()
+
+    def row_count(self):
+        return len(self.source) if self.source is not None else 0
+
+    def window_rows(self):
+        """
+        Return the range of rows currently rendered in the Text widget.
+        """
+        return range(self.top, min(self.top + self.height, self.row_count()))
+
+    @STATS.timed('display_refresh')
+    def render(self, message="No log file found."):
+        """
+        Re-render the visible window of rows. Cost is bounded by the widget height.
+        """
+        self.text.config(state='normal')
+        self.text.delete('1.0', 'end')
+        if self.source is None:
+            self.text.insert('end', message)
+        else:
+            lines = self.source.lines[self.top:self.top + self.height]
+            self.text.insert('end', ''.join(line + '\n' for line in lines))
+        self.tag_window()
+        self.text.config(state='disabled')
+        self.update_scrollbar()
+
+    @STATS.timed('display_refresh')
+    def insert_row(self, row):
+        """
+        Reflect a row inserted into the source at the given position.
+        """
+        self.highlighted = {r + 1 if r >= row else r for r in self.highlighted}
+        if row < self.top:
+            # Rows above the window shifted everything down by one; keep the same lines in view.
+            self.top += 1
+        elif row < self.top + self.height:
+            line = row - self.top + 1
+            self.text.config(state='normal')
+            self.text.insert(f'{line}.0', self.source.lines[row] + '\n')
+            self.text.delete(f'{self.height + 1}.0', 'end')
+            self.tag_window()
+            self.text.config(state='disabled')
+        self.update_scrollbar()
+
+    def insert_rows(self, rows):
+        """
+        Reflect several rows inserted into the source (given as their final positions) with a single
+        re-render, for a burst of entries applied at once.
+        """
+        for row in sorted(rows):
+            self.highlighted = {r + 1 if r >= row else r for r in self.highlighted}
+            if row < self.top:
+                self.top += 1
+        self.render()
+
+    @STATS.timed('display_refresh')
+    def delete_row(self, row):
+        """
+        Reflect a row removed from the source at the given position.
+        """
+        self.highlighted = {r - 1 if r > row else r for r in self.highlighted if r != row}
+        n = self.row_count()
+        if row < self.top:
+            self.top -= 1
+        elif row < self.top + self.height:
+            self.text.config(state='normal')
+            line = row - self.top + 1
+            self.text.delete(f'{line}.0', f'{line + 1}.0')
+            bottom = self.top + self.height - 1
+            if bottom < n:
+                self.text.insert(f'{self.height}.0', self.source.lines[bottom] + '\n')
+            elif self.top > 0:
+                # At the end of the log: pull the row above the window in instead.
+                self.top -= 1
+                self.text.insert('1.0', self.source.lines[self.top] + '\n')
+            self.tag_window()
+            self.text.config(state='disabled')
+        self.update_scrollbar()
+
+    def highlight(self, rows, see=True):
+        """
+        Highlight the given rows (0-based) and, optionally, scroll the first one into view.
+        """
+        self.highlighted = set(rows)
+        if see and rows and self.see(min(rows)):
+            return
+        self.tag_window()
+
+    def highlight_matches(self, matches, row=None):
+        """
+        Highlight search results (or clear them with None), optionally scrolling the given row into view.
+        Rows are never resolved up front: the visible ones are checked as they are rendered.
+        """
+        self.matches = matches
+        if row is not None and self.see(row):
+            return
+        self.tag_window()
+
+    def is_highlighted(self, row):
+        if row in self.highlighted:
+            return True
+        return self.matches is not None and self.source.keys[row] in self.matches
+
+    def see(self, row):
+        """
+        Scroll so that the given row is visible. Returns True if the window had to be re-rendered.
+        """
+        if row in self.window_rows():
+            return False
+        self.top = max(0, min(row - self.height // 2, self.row_count() - self.height))
+        self.render()
+        return True
+
+    def tag_window(self):
+        """
+        Apply the highlight tag to the visible rows, batching contiguous rows into single ranges.
+        """
+        self.text.tag_remove('highlight', '1.0', 'end')
+        if not self.highlighted and self.matches is None:
+            return
+        ranges = []
+        run_start = None
+        rows = self.window_rows()
+        for row in rows:
+            if self.is_highlighted(row):
+                if run_start is None:
+                    run_start = row
+            elif run_start is not None:
+                ranges += [f'{run_start - self.top + 1}.0', f'{row - self.top}.end']
+                run_start = None
+        if run_start is not None:
+            ranges += [f'{run_start - self.top + 1}.0', f'{rows.stop - self.top}.end']
+        if ranges:
+            self.text.tag_add('highlight', *ranges)
+
+    def row_at(self, x, y):
+        """
+        Return the source row under the given widget coordinates, or None.
+        """
+        index = self.text.index(f'@{x},{y}')
+        row = self.top + int(index.split('.')[0]) - 1
+        return row if row < self.row_count() else None
+
+    def scroll(self, rows):
+        top = max(0, min(self.top + rows, self.row_count() - self.height))
+        if top != self.top:
+            self.top = top
+            self.render()
+        return 'break'
+
+    def on_wheel(self, event):
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def yview(self, *args):
+        """
+        Scrollbar command: maps 'moveto'/'scroll' requests onto the row window.
+        """
+        if args[0] == 'moveto':
+            self.scroll(int(float(args[1]) * self.row_count()) - self.top)
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self.height
+            self.scroll(amount)
+
+    def update_scrollbar(self):
+        n = self.row_count()
+        if n <= self.height:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.top / n, min(1.0, (self.top + self.height) / n))
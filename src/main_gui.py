@@ -1,10 +1,58 @@
+import io
 import os
 import threading
-from tkinter import Tk, Button, Label, Entry, filedialog, StringVar, Frame, Text, Scrollbar, RIGHT, Y, LEFT, BOTH, simpledialog, messagebox, Toplevel
-import vlc
+import time
+import bisect
+from tkinter import Tk, Button, Label, Entry, filedialog, StringVar, Frame, Text, Scrollbar, Canvas, RIGHT, Y, LEFT, BOTH, simpledialog, messagebox, Toplevel
+# vlc, PIL and sqlite3 are imported where first needed, so the window can paint before they load.
 from csv_logger import CSVLogger
+from frame_index import load_in_background
+from input_pipeline import KeyQueue
+from instrumentation import STATS
+from log_view import LogView
+from motion import load_proposals, prepass
+from playback_clock import PlaybackClock
+from project import ClipCache, Project
+from rebase import Timebase
+from review import ActivityIndex, SkipIdleScheduler
+from thumbnails import ThumbnailCache, thumb_dir
+from tallies import Tallies
+from timecodes import key_id, key_ms, sort_key
+from timeline import Timeline
 from datetime import timedelta
-from PIL import Image, ImageTk
+
+# How often the in-memory log is compacted back to a sorted CSV on disk.
+COMPACT_INTERVAL_MS = 30000
+# How often the playback clock polls VLC's reported time (about once per frame).
+CLOCK_SAMPLE_MS = 15
+# Delay after the last keystroke in the search box before the search runs.
+SEARCH_DEBOUNCE_MS = 150
+# Text searches are counted in slices of this many entries between events, so typing never stalls.
+SEARCH_COUNT_SLICE = 5000
+# How often a hovered row's preview is re-checked while its frame is still being grabbed.
+PREVIEW_POLL_MS = 50
+# Keep grabbed preview frames on disk next to the CSV, so reopening a session shows them at once.
+THUMBNAIL_DISK_CACHE = True
+# Session storage: "csv" (CSV plus journal) or "sqlite" (<video>.db, with the CSV as an export).
+# Videos that already have a .db are always opened with the SQLite backend.
+LOG_BACKEND = "csv"
+# How often the stats panel redraws while it is open.
+STATS_REFRESH_MS = 500
+# How often a running motion prepass is checked for completion.
+PREPASS_POLL_MS = 500
+# Region of the frame the GUI's motion prepass watches (x, y, w, h as fractions of the frame).
+MOTION_ROI = (0.0, 0.0, 1.0, 1.0)
+# How often skip-idle review adjusts the playback rate and position.
+REVIEW_TICK_MS = 50
+# Skip-idle review drops to normal speed this long before each active region (Ctrl+Shift+R changes it).
+REVIEW_LEAD_MS = 3000
+# Port of this station's live-count feed on localhost (see feed.py), or None for no feed. The
+# CARCOUNTER_FEED_PORT environment variable overrides it, so several stations on one machine can differ.
+FEED_PORT = None
+# How often the log's background writer is checked for failed writes, which are reported to the user.
+WRITE_CHECK_MS = 1000
+# How often the timeline's playhead moves (and the clip length is picked up once the player knows it).
+TIMELINE_REFRESH_MS = 200
 
 class CarCounterGUI:
     def __init__(self, root):
@@ -13,12 +61,59 @@ class CarCounterGUI:
         self.paused = True
         self.speed = 1.0
         self.start_offset = timedelta()
+        # Corrections applied to the open log by rebase.py (identity if it was never rebased)
+        self.timebase = Timebase()
         self.logger = None
         self.video_path = ""
-        self.undo_stack = []
-        self.redo_stack = []
-        self.vlc_instance = vlc.Instance()
+        # libVLC starts on a background thread while the window is built; see get_vlc_instance.
+        self.vlc_instance = None
+        self.vlc_error = None
+        self.vlc_ready = threading.Event()
+        threading.Thread(target=self.init_vlc, name="vlc-init", daemon=True).start()
         self.player = None
+        # Interpolated playback position used to timestamp entries
+        self.clock = None
+        # Frame timing table for the open video (built in the background; None until ready)
+        self.frame_index = None
+        # The index whose fps is shown in the fps field
+        self.fps_index = None
+        # Pending after() that pauses a newly shown clip (see startup_pause)
+        self.startup_pause_id = None
+        # Preview frames of logged entries, shown when hovering over the log
+        self.thumbnails = None
+        self.preview_row = None
+        self.preview_image = None
+        # Keystrokes are stamped in the key handler and logged in batches from one idle callback
+        self.key_queue = KeyQueue(self.root.after_idle, self.apply_key_batch)
+        # Live latency/I/O stats window (F12); opening it turns recording on
+        self.stats_window = None
+        self.stats_label = None
+        self.stats_after_id = None
+        # Project mode: a sequence of clips with the neighbours of the current one preloaded
+        self.project = None
+        self.clip_cache = None
+        # Loggers closed but possibly still compacting, by video path: a wait for each, done before that log
+        # is opened again
+        self.closing_logs = {}
+        # Sort key of the entry last jumped to or clicked (entry navigation steps on from it), and the
+        # key last logged (what Shift+Up/Down filters by when no entry is selected)
+        self.nav_key = None
+        self.last_key = None
+        # Candidate event times (video ms, sorted) from the motion prepass, and the background prepass
+        self.proposals = []
+        self.prepass_thread = None
+        # Why the last prepass failed (set on its thread), or None
+        self.prepass_error = None
+        # Skip-idle review: a scheduler driving the player while review mode is on (Ctrl+R)
+        self.review = None
+        self.review_after_id = None
+        self.review_lead_ms = REVIEW_LEAD_MS
+        # Live-count feed for a supervisor's aggregator (optional; asyncio is only loaded when enabled)
+        self.feed = None
+        feed_port = os.environ.get('CARCOUNTER_FEED_PORT') or FEED_PORT
+        if feed_port:
+            from feed import FeedServer
+            self.feed = FeedServer(int(feed_port))
 
         # --- GUI Layout ---
         main_frame = Frame(root)
@@ -27,18 +122,46 @@ class CarCounterGUI:
         # Log display (right side)
         log_frame = Frame(main_frame)
         log_frame.pack(side=RIGHT, fill=Y, padx=10, pady=10)
+        # Search-as-you-type box with previous/next match buttons
+        search_frame = Frame(log_frame)
+        search_frame.pack(side='top', fill='x', pady=(0, 4))
+        self.search_var = StringVar()
+        self.search_entry = Entry(search_frame, textvariable=self.search_var, width=14)
+        self.search_entry.pack(side=LEFT, fill='x', expand=True)
+        # Keep the window-level shortcuts (letters log events, space plays) out of the search box.
+        self.search_entry.bindtags((str(self.search_entry), 'Entry', 'all'))
+        Button(search_frame, text="<", command=lambda: self.step_search(-1)).pack(side=LEFT)
+        Button(search_frame, text=">", command=lambda: self.step_search(1)).pack(side=LEFT)
+        self.search_status = Label(log_frame, text="", anchor='w')
+        self.search_status.pack(side='top', fill='x')
+        self.search_matches = None
+        self.search_cursor = None
+        self.search_after_id = None
+        self.search_var.trace_add('write', lambda *args: self.schedule_search())
+        self.search_entry.bind('<Return>', lambda e: self.step_search(1))
+        self.search_entry.bind('<Shift-Return>', lambda e: self.step_search(-1))
+        self.search_entry.bind('<Escape>', lambda e: self.end_search())
+        # Preview of the frame at the entry under the mouse
+        self.preview_label = Label(log_frame, text="", anchor='center')
+        self.preview_label.pack(side='bottom', fill='x', pady=(4, 0))
         self.log_text = Text(log_frame, width=20, height=25, state='disabled')
         self.log_text.pack(side=LEFT, fill=Y)
-        scrollbar = Scrollbar(log_frame, command=self.log_text.yview)
+        scrollbar = Scrollbar(log_frame)
         scrollbar.pack(side=RIGHT, fill=Y)
-        self.log_text['yscrollcommand'] = scrollbar.set
+        # Only the visible window of rows is ever rendered into log_text.
+        self.log_view = LogView(self.log_text, scrollbar)
 
-        # Video display (left side)
+        # Video display (left side), with the event timeline under it
         self.frame_width = 640
         self.frame_height = 480
-        self.video_frame = Frame(main_frame, bg='black', width=self.frame_width, height=self.frame_height)
+        video_column = Frame(main_frame)
+        video_column.pack(side=LEFT, padx=10, pady=10)
+        self.video_frame = Frame(video_column, bg='black', width=self.frame_width, height=self.frame_height)
         self.video_frame.pack_propagate(False)
-        self.video_frame.pack(side=LEFT, padx=10, pady=10)
+        self.video_frame.pack(side='top')
+        timeline_canvas = Canvas(video_column)
+        timeline_canvas.pack(side='top', pady=(4, 0))
+        self.timeline = Timeline(timeline_canvas, self.frame_width, on_seek=self.seek_to_ms)
 
         # Controls container (vertical stack of buttons and controls)
         controls_container = Frame(main_frame)
@@ -47,7 +170,9 @@ class CarCounterGUI:
 
         # --- Control Buttons ---
         self.open_btn = Button(controls_container, text="Open Video", command=self.open_video)
-        self.open_btn.pack(side='top', pady=(0, 16), fill='x')
+        self.open_btn.pack(side='top', pady=(0, 2), fill='x')
+        self.project_btn = Button(controls_container, text="Open Project", command=self.open_project)
+        self.project_btn.pack(side='top', pady=(0, 16), fill='x')
         # Frame rate entry. Used to calculate frame-by-frame stepping.
         fr_label = Label(controls_container, text="Frame Rate (fps):")
         fr_label.pack(side='top', pady=(0, 2), fill='x')
@@ -64,21 +189,39 @@ class CarCounterGUI:
             "  ; / '  : Skip -5s / +5s\n"
             "  [ / ]  : Skip -5min / +5min\n"
             "  { / }  : Skip -1hr / +1hr\n"
+            "  Timeline : Click to Seek\n"
             "\nLog Controls:\n"
             "  Backspace       : Delete Last Entry\n"
             "  Ctrl+Z / Ctrl+Y : Undo / Redo\n"
             "  Ctrl+f          : Search Log\n"
+            "  Enter / Shift+Enter : Next / Prev Match\n"
             "  a-z             : Log Key Event\n"
+            "  F12             : Stats Panel\n"
+            "  PgUp / PgDn     : Prev / Next Clip\n"
+            "  Up / Down       : Prev / Next Entry\n"
+            "  Shift+Up / Down : Same Key Only\n"
+            "  Tab / Shift+Tab : Next / Prev Proposal\n"
+            "  Ctrl+m          : Find Motion\n"
+            "  Ctrl+r          : Skip-Idle Review\n"
+            "  Ctrl+t          : Set Start Time\n"
         )
 
         self.status_label = Label(controls_container, text=keybinds_text, anchor='w', justify='left', font=("Courier", 10))
         self.status_label.pack(side='top', pady=(8, 8), fill='x')
+        # Live per-class entry counts of the open log
+        tally_label = Label(controls_container, text="", anchor='w', justify='left', font=("Courier", 10))
+        tally_label.pack(side='top', pady=(0, 8), fill='x')
+        self.tallies = Tallies(tally_label)
+        self.proposal_label = Label(controls_container, text="", anchor='w', font=("Courier", 10))
+        self.proposal_label.pack(side='top', pady=(0, 8), fill='x')
 
         # Notes label and editable text field
         notes_label = Label(controls_container, text="Notes:")
         notes_label.pack(side='top', anchor='w', padx=2)
         self.notes_text = Text(controls_container, height=1, width=24, wrap='word')
         self.notes_text.pack(side='top', fill='x', padx=2, pady=(0, 8))
+        # Typing notes must not log entries or trigger the window's editing and navigation shortcuts.
+        self.notes_text.bindtags((str(self.notes_text), 'Text', 'all'))
         # Pre-fill with a legend for classification and flags
         legend_text = (
             "- classification -\n"
@@ -98,6 +241,7 @@ class CarCounterGUI:
             self.notes_text.config(height=lines)
 
         self.notes_text.bind('<KeyRelease>', _auto_resize_notes)
+        self.notes_text.bind('<Escape>', lambda e: self.root.focus_set())
         # Initial resize to fit pre-filled text
         _auto_resize_notes()
 
@@ -114,7 +258,7 @@ class CarCounterGUI:
         # Button(log_btn_frame, text="Search Log", command=self.prompt_search_log).pack(side='top', pady=2, fill='x')
         # Button(log_btn_frame, text="Delete Entry", command=lambda: self.logger.undo(self) if self.logger else None).pack(side='bottom', pady=2, fill='x')
 
-        Button(controls_container, text="Save and Quit", command=self.root.quit).pack(side='bottom', pady=16, fill='x')
+        Button(controls_container, text="Save and Quit", command=self.save_and_quit).pack(side='bottom', pady=16, fill='x')
 
         self.root.update_idletasks()
         self.root.minsize(self.root.winfo_width(), self.root.winfo_height())
@@ -123,6 +267,20 @@ class CarCounterGUI:
 
         # --- Keyboard Shortcuts ---
         self.root.bind('<Control-f>', lambda e: self.prompt_search_log())
+        self.root.bind('<F12>', lambda e: self.toggle_stats_panel())
+        self.root.bind('<Prior>', lambda e: self.switch_clip(-1))
+        self.root.bind('<Next>', lambda e: self.switch_clip(1))
+        self.root.bind('<Control-t>', lambda e: self.prompt_start_time())
+        self.root.bind('<Up>', lambda e: self.step_entry(-1))
+        self.root.bind('<Down>', lambda e: self.step_entry(1))
+        self.root.bind('<Shift-Up>', lambda e: self.step_entry(-1, same_key=True))
+        self.root.bind('<Shift-Down>', lambda e: self.step_entry(1, same_key=True))
+        # Tab and Shift+Tab (whatever key sym the platform sends for it) step through proposals, not focus.
+        self.root.bind('<<NextWindow>>', lambda e: self.step_proposal(1) or "break")
+        self.root.bind('<<PrevWindow>>', lambda e: self.step_proposal(-1) or "break")
+        self.root.bind('<Control-m>', lambda e: self.run_prepass())
+        self.root.bind('<Control-r>', lambda e: self.toggle_review())
+        self.root.bind('<Control-R>', lambda e: self.prompt_review_lead())
         self.root.bind('<space>', lambda e: self.toggle_play())
         self.root.bind('<KeyPress-equal>', lambda e: self.speed_up())
         self.root.bind('<KeyPress-minus>', lambda e: self.slow_down())
@@ -134,22 +292,56 @@ class CarCounterGUI:
         self.root.bind(']', lambda e: self.skip_seconds(300))
         self.root.bind('{', lambda e: self.skip_seconds(-3600))
         self.root.bind('}', lambda e: self.skip_seconds(3600))
-        self.root.bind('<Escape>', lambda e: self.root.quit())
-        
+        # Edits act on the log as the user sees it, so keys still in the queue are logged first.
+        self.root.bind('<BackSpace>', lambda e: self.key_queue.drain() or (self.logger.undo(self) if self.logger else None))
+        self.root.bind('<Control-z>', lambda e: self.key_queue.drain() or (self.logger.restore_last_undo(self) if self.logger else None))
+        self.root.bind('<Control-y>', lambda e: self.key_queue.drain() or (self.logger.redo(self) if self.logger else None))
+        self.log_text.bind('<Button-1>', self.on_log_click)
+        self.log_text.bind('<Motion>', self.on_log_hover)
+        self.log_text.bind('<Leave>', lambda e: self.show_preview(None))
+        # Every event calibrates the mapping from Tk event times to the playback clock, so even the first
+        # key pressed is stamped at the moment it went down.
+        for sequence in ('<Motion>', '<ButtonPress>', '<KeyRelease>'):
+            self.root.bind_all(sequence, lambda e: self.clock.event_instant(e.time) if self.clock else None, add='+')
+        for char in 'abcdefghijklmnopqrstuvwxyz':
+            self.root.bind(f'<KeyPress-{char}>', self.log_key_event)
+            self.root.bind(f'<KeyPress-{char.upper()}>', self.log_key_event)
+        self.root.bind('<Escape>', lambda e: self.save_and_quit())
+        self.root.protocol("WM_DELETE_WINDOW", self.save_and_quit)
+        self.root.after(COMPACT_INTERVAL_MS, self.compact_log)
+        self.root.after(CLOCK_SAMPLE_MS, self.sample_clock)
+        self.root.after(TIMELINE_REFRESH_MS, self.update_timeline)
+        self.root.after(WRITE_CHECK_MS, self.check_write_errors)
+
+    @STATS.timed('frame_step')
     def next_frame(self):
         """
         Advances the video by one frame using VLC's next_frame().
         """
         if self.player:
+            index = self.frame_index
+            target = index.frame_time(index.frame_at(self.clock.position()) + 1) if index else None
             self.player.next_frame()
             self.paused = True
+            self.clock.resync(ms=target, playing=False)
 
+    @STATS.timed('frame_step')
     def prev_frame(self):
         """
-        Seeks back by one frame's worth of ms, then steps forward to the next frame for best accuracy.
+        Steps back one frame. With a frame index this seeks straight to the previous frame's exact
+        presentation time; until the index is ready it falls back to the typed-in frame rate, seeking
+        back 1.5 frames and stepping forward to the next frame.
         """
         if not self.player:
             return
+        index = self.frame_index
+        if index:
+            target = index.frame_time(index.frame_at(self.clock.position()) - 1)
+            self.player.set_pause(1)
+            self.player.set_time(target)
+            self.paused = True
+            self.clock.resync(ms=target, playing=False)
+            return
         try:
             fps = float(self.fps_var.get())
             if fps <= 0:
@@ -163,13 +355,7 @@ class CarCounterGUI:
         self.player.set_time(seek_ms)
         self.player.next_frame()
         self.paused = True
-        self.root.bind('<BackSpace>', lambda e: self.logger.undo(self) if self.logger else None)
-        self.root.bind('<Control-z>', lambda e: self.logger.restore_last_undo(self) if self.logger else None)
-        self.root.bind('<Control-y>', lambda e: self.logger.redo(self) if self.logger else None)
-        self.log_text.bind('<Button-1>', self.on_log_click)
-        for char in 'abcdefghijklmnopqrstuvwxyz':
-            self.root.bind(f'<KeyPress-{char}>', self.log_key_event)
-            self.root.bind(f'<KeyPress-{char.upper()}>', self.log_key_event)
+        self.clock.resync(ms=seek_ms, playing=False)
 
 ## GUI Functions ##########################################################
 
@@ -180,121 +366,471 @@ class CarCounterGUI:
         """
         path = filedialog.askopenfilename(filetypes=[("Video files", "*.mp4 *.avi *.mov")])
         if path:
-            self.video_path = path
-            if self.player:
-                self.player.stop()
-            self.player = self.vlc_instance.media_player_new()
-            media = self.vlc_instance.media_new(path)
-            self.player.set_media(media)
-            # Set the video output to the Tkinter Frame's window handle (platform-specific)
+            instance = self.get_vlc_instance()
+            if instance is None:
+                return
+            self.close_project()
+            self.key_queue.drain()
+            # Closed before the new log loads, in case it is the same file.
+            if self.logger:
+                self.close_logger(self.logger)
+                self.logger = None
+            player = instance.media_player_new()
+            player.set_media(instance.media_new(path))
+            self.show_clip(path, player, self.make_logger(path))
+            self.prompt_start_time()
+
+    def init_vlc(self):
+        """
+        Loads libVLC and creates its instance. Runs on a background thread at startup, since this takes
+        seconds on a cold start (and in one-file builds, which unpack the libraries on every launch).
+        """
+        try:
+            import vlc
+            self.vlc_instance = vlc.Instance()
+        except Exception as e:
+            self.vlc_error = e
+        self.vlc_ready.set()
+
+    def get_vlc_instance(self):
+        """
+        Returns the libVLC instance, waiting (with a busy cursor) if it is still starting up. Shows an
+        error and returns None if libVLC could not be loaded.
+        """
+        if not self.vlc_ready.is_set():
+            self.root.config(cursor='watch')
             self.root.update_idletasks()
-            handle = self.video_frame.winfo_id()
-            if os.name == "nt":
-                self.player.set_hwnd(handle)
-            else:
-                self.player.set_xwindow(handle)
-            csv_path = os.path.splitext(path)[0] + ".csv"
-            self.logger = CSVLogger(csv_path)
-            self.paused = True
-            self.update_log_display()
-            # Prompt for start time
-            video_basename = os.path.splitext(os.path.basename(path))[0]
-            prompt = "Enter the video start time (HH:MM:SS):"
-            start_time_str = simpledialog.askstring("Start Time", prompt, initialvalue="00:00:00", parent=self.root)
-            offset = self.parse_start_time(start_time_str) if start_time_str else None
-            self.start_offset = offset if offset is not None else timedelta()
-            self.status_label.config(text=f"x{self.speed:.1f}")
-            # Start playback to force video output, then pause if needed
-            self.player.play()
-            self.root.after(200, self.player.pause)
+            self.vlc_ready.wait()
+            self.root.config(cursor='')
+        if self.vlc_instance is None:
+            messagebox.showerror("VLC", f"Could not start VLC: {self.vlc_error}")
+        return self.vlc_instance
 
-    def update_log_display(self, highlight_line=None, highlight_lines=None):
+    def open_project(self, event=None):
         """
-        Updates the log display area with the contents of the log file. Optionally highlights a specific line or lines.
+        Opens a sequence of clips (e.g. consecutive camera files from one site) as a project. Clips play
+        in name order; PageUp/PageDown switch between them with the neighbouring clips preloaded, and the
+        start time entered for a clip carries forward to the ones after it.
         """
+        paths = filedialog.askopenfilenames(filetypes=[("Video files", "*.mp4 *.avi *.mov")])
+        if not paths:
+            return
+        instance = self.get_vlc_instance()
+        if instance is None:
+            return
+        self.close_project()
+        self.key_queue.drain()
+        if self.player:
+            self.player.stop()
+            self.player = None
+        if self.logger:
+            self.close_logger(self.logger)
+            self.logger = None
+        self.project = Project.for_videos(paths)
+        self.clip_cache = ClipCache(instance, self.make_logger)
+        self.switch_clip(0)
+
+    def close_project(self):
+        if self.clip_cache:
+            self.key_queue.drain()
+            for path, closed in self.clip_cache.close().items():
+                self.closing_logs[path] = closed.result
+            # The cache owned the current player and logger.
+            self.player = None
+            self.logger = None
+        self.project = None
+        self.clip_cache = None
+
+    def switch_clip(self, step):
+        """
+        Moves to the clip step places from the current one in the project, then starts preparing its
+        neighbours so the next switch is instant too.
+        """
+        if not self.project:
+            return
+        index = self.project.neighbour(step)
+        if index is None:
+            return
+        if self.player and step:
+            self.project.set_duration(self.video_path, self.player.get_length())
+        self.project.current = index
+        clip = self.clip_cache.prepare(self.project.current_path)
+        self.show_clip(clip.path, clip.player, clip.logger)
+        start = self.project.start_ms(index)
+        if start is None:
+            self.prompt_start_time()
+        else:
+            self.start_offset = timedelta(milliseconds=start)
+            self.refresh_timeline()
+        for neighbour in (index - 1, index + 1):
+            if 0 <= neighbour < len(self.project):
+                self.clip_cache.prepare(self.project.paths[neighbour])
+        # Keep the current clip most recently used so it is never the one evicted.
+        self.clip_cache.prepare(clip.path)
+        self.root.title(f"Car Counter - {os.path.basename(clip.path)} ({index + 1}/{len(self.project)})")
+        self.save_project()
+
+    def save_project(self):
+        try:
+            self.project.save()
+        except Exception:
+            pass
+
+    def make_logger(self, video_path):
+        """
+        Creates the logger for a video with the configured backend (see LOG_BACKEND), once any earlier
+        logger of the same video has finished closing. May run on the project loader thread.
+        """
+        closed = self.closing_logs.pop(video_path, None)
+        if closed is not None:
+            closed()
+        csv_path = os.path.splitext(video_path)[0] + ".csv"
+        from sqlite_logger import SQLiteLogger, db_path
+        if LOG_BACKEND == "sqlite" or os.path.exists(db_path(csv_path)):
+            return SQLiteLogger(csv_path)
+        return CSVLogger(csv_path)
+
+    def close_logger(self, logger):
+        """
+        Closes a logger outside project mode. Its writer compacts the log in the background; make_logger
+        waits for that before loading the same log again.
+        """
+        logger.close()
+        self.closing_logs[self.video_path] = logger.writer.join
+
+    def show_clip(self, path, player, logger):
+        """
+        Makes the given player and logger current: attaches the player to the video frame and shows the
+        log. Outside project mode the previous player and logger are closed; in project mode the clip
+        cache owns them and they stay ready in case the user comes back.
+        """
+        self.key_queue.drain()
+        self.stop_review()
+        if self.startup_pause_id is not None:
+            self.root.after_cancel(self.startup_pause_id)
+            self.startup_pause_id = None
+        if self.player and self.player is not player:
+            if self.clip_cache:
+                self.player.set_pause(1)
+            else:
+                self.player.stop()
         if self.logger:
-            try:
-                with open(self.logger.filename, 'r') as f:
-                    log_content = f.read()
-            except Exception:
-                log_content = "No log file found."
+            for observer in (self.timeline, self.tallies, self.feed):
+                if observer in self.logger.observers:
+                    self.logger.observers.remove(observer)
+        if self.logger and self.logger is not logger:
+            if self.clip_cache:
+                self.logger.sort_log_file()
+            else:
+                self.close_logger(self.logger)
+        self.video_path = path
+        self.player = player
+        # Set the video output to the Tkinter Frame's window handle (platform-specific)
+        self.root.update_idletasks()
+        handle = self.video_frame.winfo_id()
+        if os.name == "nt":
+            self.player.set_hwnd(handle)
         else:
-            log_content = "No log file found."
-        self.log_text.config(state='normal')
-        self.log_text.delete(1.0, 'end')
-        self.log_text.insert('end', log_content)
-        lines = log_content.splitlines()
-        self.log_text.tag_remove('highlight', '1.0', 'end')
-        # If highlight_lines is provided, highlight all those lines
+            self.player.set_xwindow(handle)
+        self.clock = PlaybackClock(self.player, event_offset=self.clock.event_offset if self.clock else None)
+        self.frame_index = None
+        load_in_background(path, lambda index: self.set_frame_index(path, index))
+        csv_path = os.path.splitext(path)[0] + ".csv"
+        if self.thumbnails:
+            self.thumbnails.close()
+        self.thumbnails = ThumbnailCache(path, thumb_dir(csv_path) if THUMBNAIL_DISK_CACHE else None)
+        self.show_preview(None)
+        self.logger = logger
+        self.timebase = Timebase.for_log(csv_path)
+        self.paused = True
+        self.log_view.set_source(self.logger)
+        self.logger.observers.extend((self.timeline, self.tallies))
+        self.refresh_timeline()
+        self.tallies.set_source(self.logger)
+        if self.feed:
+            self.logger.observers.append(self.feed)
+            self.feed.set_source(self.logger, os.path.basename(path))
+        self.nav_key = None
+        self.load_proposals()
+        self.end_search()
+        self.status_label.config(text=f"x{self.speed:.1f}")
+        # Start playback to force video output, then pause (explicitly, in case the user switched away)
+        self.player.play()
+        self.startup_pause_id = self.root.after(200, lambda: self.startup_pause(player))
+
+    def startup_pause(self, player):
+        """
+        Pauses a newly shown clip once its video output is up. Only the current player is touched: one the
+        user has switched away from may since have been evicted from the clip cache and released.
+        """
+        self.startup_pause_id = None
+        if player is self.player:
+            player.set_pause(1)
+
+    def prompt_start_time(self):
+        """
+        Asks for the wall-clock time at which the current video starts. In project mode the answer also
+        sets the start of the clips that follow.
+        """
+        if not self.player:
+            return
+        prompt = "Enter the video start time (HH:MM:SS):"
+        initial = str(self.start_offset).split('.')[0] if self.start_offset else "00:00:00"
+        start_time_str = simpledialog.askstring("Start Time", prompt, initialvalue=initial, parent=self.root)
+        offset = self.parse_start_time(start_time_str) if start_time_str else None
+        self.start_offset = offset if offset is not None else timedelta()
+        if self.project:
+            self.project.set_start(self.project.current, self.offset_ms())
+            self.save_project()
+        self.refresh_timeline()
+
+    def clip_length_ms(self):
+        """
+        The current video's length in ms, from the frame index or the player; 0 while unknown.
+        """
+        if self.frame_index is not None and self.frame_index.duration_ms:
+            return self.frame_index.duration_ms
+        try:
+            return max(0, self.player.get_length()) if self.player else 0
+        except Exception:
+            return 0
+
+    def refresh_timeline(self):
+        """
+        Recounts the timeline's bins for the current log, start time and clip length. A drift correction
+        is taken as constant over the clip; at a few ppm it moves nothing by a bin.
+        """
+        self.timeline.set_source(self.logger, self.video_to_log_ms(0), self.clip_length_ms())
+
+    def update_timeline(self):
+        """
+        Moves the timeline's playhead, and fills the timeline in once the clip length becomes known (and
+        the fps field once the frame index is ready).
+        """
+        if self.frame_index is not None and self.frame_index is not self.fps_index:
+            # The index arrives on a worker thread; show its true frame rate from here, on the Tk thread.
+            self.fps_index = self.frame_index
+            self.fps_var.set(f"{self.frame_index.fps:.3f}".rstrip('0').rstrip('.'))
+        if self.player and self.clock:
+            if self.timeline.length_ms <= 0 and self.clip_length_ms() > 0:
+                self.refresh_timeline()
+            self.timeline.set_position(self.clock.now_ms())
+        self.root.after(TIMELINE_REFRESH_MS, self.update_timeline)
+
+    def set_frame_index(self, path, index):
+        """
+        Called from the frame index worker thread once a video's index is ready.
+        """
+        if path == self.video_path:
+            self.frame_index = index
+
+    def update_log_display(self, highlight_line=None, highlight_lines=None):
+        """
+        Refreshes the visible window of the log display. Optionally highlights a specific line or lines
+        (1-based) and scrolls the first of them into view.
+        """
         if highlight_lines:
-            for line_num in highlight_lines:
-                self.log_text.tag_add('highlight', f'{line_num}.0', f'{line_num}.end')
-            self.log_text.tag_configure('highlight', background='yellow')
-            self.log_text.see(f'{highlight_lines[0]}.0')
-        # Otherwise, if highlight_line is provided, highlight that single line
+            self.log_view.highlight([line - 1 for line in highlight_lines])
         elif highlight_line is not None:
-            self.log_text.tag_add('highlight', f'{highlight_line}.0', f'{highlight_line}.end')
-            self.log_text.tag_configure('highlight', background='yellow')
-            self.log_text.see(f'{highlight_line}.0')
-        self.log_text.config(state='disabled')
+            self.log_view.highlight([highlight_line - 1])
+        else:
+            self.log_view.highlighted = set()
+            self.log_view.render()
 
     def on_log_click(self, event):
         """
         Handles clicks on the log display. Highlights the clicked line and seeks the video to the corresponding timestamp.
         """
-        self.log_text.tag_remove('highlight', '1.0', 'end')
-        index = self.log_text.index(f'@{event.x},{event.y}')
-        line_number = int(index.split('.')[0])
-        self.log_text.tag_add('highlight', f'{line_number}.0', f'{line_number}.end')
-        self.log_text.tag_configure('highlight', background='yellow')
-        line_content = self.log_text.get(f'{line_number}.0', f'{line_number}.end').strip()
-        if ',' in line_content:
-            timestamp_str = line_content.split(',')[0].strip()
-        elif ':' in line_content:
-            timestamp_str = line_content.split(':', 1)[1].strip()
+        row = self.log_view.row_at(event.x, event.y)
+        if row is None:
+            return
+        self.log_view.highlight([row], see=False)
+        self.seek_to_row(row)
+
+    def on_log_hover(self, event):
+        """
+        Shows a preview of the frame at the entry under the mouse, and queues frames for the rest of
+        the visible rows so scrolling through them is instant too.
+        """
+        row = self.log_view.row_at(event.x, event.y)
+        if row != self.preview_row:
+            self.show_preview(row)
+
+    def row_video_ms(self, row):
+        return max(0, self.log_to_video_ms(self.logger.ms_at(row)))
+
+    def show_preview(self, row):
+        """
+        Displays the preview frame for a log row (None clears it). If the frame is still being
+        grabbed, shows a placeholder and checks back until it is ready or the mouse moves on.
+        """
+        self.preview_row = row
+        if row is None or not self.thumbnails or not self.logger or row >= len(self.logger):
+            self.preview_image = None
+            self.preview_label.config(image='', text="")
+            return
+        ms = self.row_video_ms(row)
+        data = self.thumbnails.get(ms)
+        if data is None:
+            self.thumbnails.request(ms, urgent=True)
+            self.thumbnails.prefetch(self.row_video_ms(r) for r in self.log_view.window_rows())
+            self.preview_image = None
+            waiting = self.thumbnails.waiting(ms)
+            self.preview_label.config(image='', text="loading preview..." if waiting else "")
+            if waiting:
+                self.root.after(PREVIEW_POLL_MS, lambda: self.preview_row == row and self.show_preview(row))
+            return
+        try:
+            from PIL import Image, ImageTk
+            self.preview_image = ImageTk.PhotoImage(Image.open(io.BytesIO(data)))
+            self.preview_label.config(image=self.preview_image, text="")
+        except Exception:
+            self.preview_image = None
+            self.preview_label.config(image='', text="")
+
+    def seek_to_row(self, row):
+        """
+        Seeks the video to the timestamp of the given log row.
+        """
+        if self.player:
+            self.nav_key = self.logger.keys[row]
+            self.seek_to_ms(self.log_to_video_ms(self.logger.ms_at(row)))
+
+    @STATS.timed('seek')
+    def seek_to_ms(self, ms):
+        """
+        Seeks the video to a video time (ms), e.g. from a click on the timeline.
+        """
+        if self.player:
+            target = max(0, ms)
+            self.player.set_time(target)
+            self.paused = True
+            self.clock.resync(ms=target)
+            self.timeline.set_position(target)
+
+    def step_entry(self, direction, same_key=False):
+        """
+        Jumps to the next (direction 1) or previous (-1) log entry from the current playback position,
+        optionally only entries with the same key as the selected entry (or the last one logged).
+        """
+        if not self.player or not self.logger:
+            return
+        self.key_queue.drain()
+        now = self.video_to_log_ms(max(0, self.clock.now_ms()))
+        selected = None
+        if self.nav_key is not None:
+            selected = self.logger.find_row(key_id(self.nav_key), key_ms(self.nav_key))
+        if selected is not None and key_ms(self.nav_key) == now:
+            # Still on the selected entry: step past it, so entries sharing its timestamp are visited too.
+            pivot = self.nav_key
         else:
+            pivot = sort_key(now, 0) if direction < 0 else sort_key(now + 1, 0) - 1
+        key = None
+        if same_key:
+            key = self.logger.key_at(selected) if selected is not None else self.last_key
+        row = self.logger.step_row(pivot, direction, key)
+        if row is None:
             return
+        self.log_view.highlight([row])
+        self.seek_to_row(row)
+
+    def load_proposals(self):
+        """
+        Loads the motion prepass's proposals for the current video, if it has been run.
+        """
         try:
-            parts = timestamp_str.split(':')
-            if len(parts) >= 3:
-                hours = int(parts[0])
-                minutes = int(parts[1])
-                seconds = int(parts[2])
-                ms = int(parts[3]) if len(parts) > 3 else 0
-                total_seconds = hours * 3600 + minutes * 60 + seconds + ms / 1000.0
-                offset_seconds = self.start_offset.total_seconds() if self.start_offset else 0
-                video_seconds = max(0, total_seconds - offset_seconds)
-                if self.player:
-                    self.player.set_time(int(video_seconds * 1000))
-                    self.paused = True
+            self.proposals = load_proposals(self.video_path)
         except Exception:
-            pass
+            self.proposals = []
+        self.proposal_label.config(text=f"Proposals: {len(self.proposals)}" if self.proposals else "")
+
+    def step_proposal(self, direction):
+        """
+        Jumps to the next (direction 1) or previous (-1) proposed event from the current playback position.
+        Confirm or reclassify it by logging it with the usual letter keys.
+        """
+        if not self.player or not self.proposals:
+            return
+        now = max(0, self.clock.now_ms())
+        i = bisect.bisect_right(self.proposals, now) if direction > 0 else bisect.bisect_left(self.proposals, now) - 1
+        if not 0 <= i < len(self.proposals):
+            return
+        self.seek_to_ms(self.proposals[i])
+        self.proposal_label.config(text=f"Proposal {i + 1}/{len(self.proposals)}")
+
+    def run_prepass(self):
+        """
+        Runs the motion prepass over the current video in the background, with the GUI's libVLC instance.
+        For many clips, run motion.py from the command line instead (it uses a process pool).
+        """
+        if not self.video_path or (self.prepass_thread and self.prepass_thread.is_alive()):
+            return
+        instance = self.get_vlc_instance()
+        if instance is None:
+            return
+        path = self.video_path
+        self.proposal_label.config(text="Finding motion...")
+        self.prepass_error = None
+        self.prepass_thread = threading.Thread(target=lambda: self.prepass_worker(path, instance),
+                                               name="motion-prepass", daemon=True)
+        self.prepass_thread.start()
+        self.root.after(PREPASS_POLL_MS, lambda: self.poll_prepass(path))
+
+    def prepass_worker(self, path, instance):
+        """
+        The prepass thread: runs the prepass and keeps any error for poll_prepass to show.
+        """
+        try:
+            prepass(path, MOTION_ROI, instance)
+        except Exception as e:
+            self.prepass_error = e
+
+    def poll_prepass(self, path):
+        if self.prepass_thread.is_alive():
+            self.root.after(PREPASS_POLL_MS, lambda: self.poll_prepass(path))
+        elif path == self.video_path:
+            self.load_proposals()
+            if self.prepass_error is not None:
+                self.proposal_label.config(text=f"Motion prepass failed: {self.prepass_error}")
 
     def log_key_event(self, event):
         """
-        Handles key press events for logging. Logs the key and current timestamp to the CSV, updates the log display,
-        and highlights the new entry.
+        Handles key press events for logging. Stamps the key with the playback position at the moment it
+        went down and queues it; queued keys are logged and shown together by apply_key_batch.
         """
         key = event.char
-        if not key.isalpha():
+        if not key.isalpha() or not self.logger:
             return
-        ms = self.player.get_time() if self.player else 0
-        timestamp_str = self.format_timestamp(ms, self.start_offset)
-        if self.logger:
-            self.logger.log_entry(key, timestamp_str)
-            self.logger.sort_log_file()
-            highlight_line = None
-            try:
-                with open(self.logger.filename, 'r') as f:
-                    lines = [line for line in f if line.strip()]
-                for idx, line in enumerate(lines, 1):
-                    parts = line.strip().split(',')
-                    if len(parts) >= 2 and parts[0].strip() == timestamp_str and parts[1].strip() == key:
-                        highlight_line = idx
-                        break
-            except Exception:
-                highlight_line = None
-            self.update_log_display(highlight_line=highlight_line)
+        if self.player:
+            # Stamp with the interpolated position at the moment the key went down (event.time).
+            t = self.clock.event_instant(event.time)
+            ms = self.clock.now_ms(event.time)
+        else:
+            t = time.monotonic()
+            ms = 0
+        self.key_queue.put(key, self.video_to_log_ms(max(0, ms)), t)
+
+    @STATS.timed('key_log')
+    def apply_key_batch(self, batch):
+        """
+        Logs a batch of queued (key, ms, t) keystrokes and refreshes the log display once for all of
+        them, highlighting the new entries.
+        """
+        if not self.logger:
+            return
+        rows = []
+        for key, ms, _ in batch:
+            row = self.logger.log_entry(key, ms)
+            if row is not None:
+                self.last_key = self.logger.key_at(row)
+                rows = [r + 1 if r >= row else r for r in rows] + [row]
+        if len(rows) == 1:
+            self.log_view.insert_row(rows[0])
+        elif rows:
+            self.log_view.insert_rows(rows)
+        if rows:
+            self.log_view.highlight(rows)
+
     def toggle_play(self):
         if not self.player:
             return
@@ -304,27 +840,198 @@ class CarCounterGUI:
         else:
             self.player.play()
             self.paused = False
+        self.clock.freeze(playing=not self.paused)
 
     def speed_up(self):
         if not self.player:
             return
         self.speed = min(self.speed + 0.25, 4.0)
         self.player.set_rate(self.speed)
+        self.clock.freeze(playing=self.clock.playing, rate=self.speed)
         self.status_label.config(text=f"x{self.speed:.1f}")
+        if self.review:
+            self.review.set_normal_rate(self.speed)
 
     def slow_down(self):
         if not self.player:
             return
         self.speed = max(self.speed - 0.25, 0.25)
         self.player.set_rate(self.speed)
+        self.clock.freeze(playing=self.clock.playing, rate=self.speed)
+        self.status_label.config(text=f"x{self.speed:.1f}")
+        if self.review:
+            self.review.set_normal_rate(self.speed)
+
+    def toggle_review(self):
+        """
+        Turns skip-idle review on or off. While on, playback runs at the normal speed through the regions
+        with logged entries or motion proposals (from a little before each) and skips the idle stretches
+        between them by fast-forwarding or jumping.
+        """
+        if self.review:
+            self.stop_review()
+            return
+        if not self.player or not self.logger:
+            return
+        self.key_queue.drain()
+        try:
+            index = ActivityIndex.for_log(self.logger.filename, self.video_path, self.offset_ms(), self.logger,
+                                          self.timebase)
+        except Exception:
+            return
+        spans = index.spans(lead_ms=self.review_lead_ms)
+        if not spans:
+            # Nothing to review: the scheduler would skip straight to the end of the clip.
+            self.status_label.config(text=f"x{self.speed:.1f} (nothing to review: no entries or proposals)")
+            return
+        self.review = SkipIdleScheduler(self.player, spans, self.clock, normal_rate=self.speed)
+        if not self.player.is_playing():
+            self.toggle_play()
+        self.review_after_id = self.root.after(REVIEW_TICK_MS, self.review_tick)
+
+    def prompt_review_lead(self):
+        """
+        Asks how long before each active region review drops to normal speed, and restarts a running review
+        with the new lead time.
+        """
+        seconds = simpledialog.askfloat("Review Lead Time", "Seconds of normal-speed playback before each active region:",
+                                        initialvalue=self.review_lead_ms / 1000, minvalue=0, parent=self.root)
+        if seconds is None:
+            return
+        self.review_lead_ms = int(seconds * 1000)
+        if self.review:
+            self.stop_review()
+            self.toggle_review()
+
+    def stop_review(self):
+        if not self.review:
+            return
+        self.review = None
+        self.root.after_cancel(self.review_after_id)
+        if self.player:
+            self.player.set_rate(self.speed)
+            self.clock.freeze(playing=self.clock.playing, rate=self.speed)
         self.status_label.config(text=f"x{self.speed:.1f}")
 
+    def review_tick(self):
+        if not self.review:
+            return
+        if self.clock.playing:
+            rate = self.review.rate
+            if self.review.tick() == 'end':
+                self.stop_review()
+                return
+            if self.review.rate != rate:
+                self.status_label.config(text=f"x{self.review.rate:.1f} (review)")
+        self.review_after_id = self.root.after(REVIEW_TICK_MS, self.review_tick)
+
+    @STATS.timed('seek')
     def skip_seconds(self, seconds):
         if not self.player:
             return
         cur_ms = self.player.get_time()
         new_ms = max(0, cur_ms + int(seconds * 1000))
         self.player.set_time(new_ms)
+        self.clock.resync(ms=new_ms)
+
+    def sample_clock(self):
+        """
+        Polls VLC's reported time for the playback clock, and re-anchors it if VLC's play state
+        changed on its own (e.g. the delayed pause after opening, or the end of the video).
+        """
+        if self.player and self.clock:
+            if bool(self.player.is_playing()) != self.clock.playing:
+                self.clock.resync()
+            else:
+                self.clock.sample()
+        self.root.after(CLOCK_SAMPLE_MS, self.sample_clock)
+
+    def compact_log(self):
+        """
+        Periodically compacts the log file. Keystrokes only append to the journal, so this is the
+        only place (besides saving) where the whole CSV is rewritten, on the journal writer thread.
+        """
+        if self.logger:
+            self.logger.sort_log_file()
+        self.root.after(COMPACT_INTERVAL_MS, self.compact_log)
+
+    def check_write_errors(self):
+        """
+        Tells the user when the log could not be written (once per run of failures; the writer keeps
+        retrying in the background).
+        """
+        error = self.logger.write_error() if self.logger else None
+        if error is not None:
+            messagebox.showerror("Log", f"Could not save the log {os.path.basename(self.logger.filename)}: {error}\n"
+                                        "Your entries are kept and saving will be retried.")
+        self.root.after(WRITE_CHECK_MS, self.check_write_errors)
+
+    def save_and_quit(self):
+        """
+        Compacts the log file and closes the application.
+        """
+        self.key_queue.drain()
+        logger = self.logger
+        if self.project and self.player:
+            self.project.set_duration(self.video_path, self.player.get_length())
+            self.save_project()
+        if self.clip_cache:
+            self.close_project()
+        elif self.logger:
+            self.logger.close()
+        if self.thumbnails:
+            self.thumbnails.close()
+        if self.feed:
+            self.feed.close()
+        if logger:
+            # The writer gives up after a few retries, so this cannot hang on a dead disk.
+            logger.writer.join()
+            if logger.writer.backlog:
+                messagebox.showerror("Log", f"Some changes could not be saved to {logger.filename}: "
+                                            f"{logger.writer.error or 'write failed'}")
+        if STATS.enabled:
+            self.dump_stats()
+        self.root.quit()
+
+    def toggle_stats_panel(self):
+        """
+        Opens or closes the stats panel: live p50/p99 latencies of logging, sorting, disk writes,
+        display refreshes, seeks and frame steps, plus file open and byte counts. Opening it starts
+        recording (recording is on from startup with CARCOUNTER_STATS=1).
+        """
+        if self.stats_window is not None:
+            if self.stats_after_id is not None:
+                self.root.after_cancel(self.stats_after_id)
+                self.stats_after_id = None
+            self.stats_window.destroy()
+            self.stats_window = None
+            return
+        STATS.enabled = True
+        self.stats_window = Toplevel(self.root)
+        self.stats_window.title("Performance")
+        self.stats_window.protocol("WM_DELETE_WINDOW", self.toggle_stats_panel)
+        self.stats_label = Label(self.stats_window, anchor='w', justify='left', font=("Courier", 10))
+        self.stats_label.pack(fill=BOTH, expand=True, padx=8, pady=8)
+        Button(self.stats_window, text="Save Stats", command=self.dump_stats).pack(side='left', padx=8, pady=(0, 8))
+        Button(self.stats_window, text="Reset", command=STATS.reset).pack(side='left', pady=(0, 8))
+        self.refresh_stats_panel()
+
+    def refresh_stats_panel(self):
+        self.stats_after_id = None
+        if self.stats_window is None:
+            return
+        self.stats_label.config(text=STATS.format())
+        self.stats_after_id = self.root.after(STATS_REFRESH_MS, self.refresh_stats_panel)
+
+    def dump_stats(self):
+        """
+        Writes the recorded stats to <video>.stats.json (or carcounter_stats.json with no video open).
+        """
+        path = os.path.splitext(self.video_path)[0] + ".stats.json" if self.video_path else "carcounter_stats.json"
+        try:
+            STATS.dump(path)
+        except Exception:
+            pass
 
     @staticmethod
     def parse_start_time(time_str):
@@ -340,25 +1047,105 @@ class CarCounterGUI:
             return timedelta()
         return timedelta()
 
-    @staticmethod
-    def format_timestamp(ms, offset):
-        total_ms = int(ms)
-        if offset:
-            total_ms += int(offset.total_seconds() * 1000)
-        hours = total_ms // 3600000
-        minutes = (total_ms % 3600000) // 60000
-        seconds = (total_ms % 60000) // 1000
-        ms_part = total_ms % 1000
-        return f"{hours:02}:{minutes:02}:{seconds:02}:{ms_part:03}"
+    def offset_ms(self):
+        """
+        Returns the video start time entered in open_video, in ms. Log timestamps are video time plus this
+        (see video_to_log_ms for rebased logs).
+        """
+        return int(self.start_offset.total_seconds() * 1000) if self.start_offset else 0
+
+    def video_to_log_ms(self, ms):
+        """
+        The log time of a video time: plus the start offset, then any correction made by rebase.py.
+        """
+        return self.timebase.apply(ms + self.offset_ms())
+
+    def log_to_video_ms(self, ms):
+        return self.timebase.invert(ms) - self.offset_ms()
 
     def prompt_search_log(self):
         """
-        Prompts the user for a search term and highlights all matching entries in the log display.
-        This, and the .search_entries method in CSVLogger, are very basic. Use excel or similar for more advanced searching.
+        Focuses the search box. Searching runs as you type; see search_index.Query.parse for the syntax
+        (keys like "k" or "j,k", key regexes like "/[jk]/", time ranges like "14:00-14:15", or plain text).
+        """
+        self.search_entry.focus_set()
+        self.search_entry.select_range(0, 'end')
+
+    def schedule_search(self):
+        """
+        Debounces the search box: runs the search once typing pauses for SEARCH_DEBOUNCE_MS.
+        """
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DEBOUNCE_MS, self.run_search)
+
+    def run_search(self, keep_cursor=False):
+        """
+        Runs the current search and highlights every match. Only the visible rows are resolved; a text
+        search is counted a slice at a time in the background.
+        """
+        self.search_after_id = None
+        if not keep_cursor:
+            self.search_cursor = None
+        term = self.search_var.get().strip()
+        if not self.logger or not term:
+            self.search_matches = None
+            self.search_status.config(text="")
+            self.log_view.highlight_matches(None)
+            return
+        matches = self.search_matches = self.logger.search(term)
+        first = matches.step(-1, 1)
+        self.log_view.highlight_matches(matches, None if first is None else bisect.bisect_left(self.logger.keys, first))
+        if first is None:
+            self.search_status.config(text="No matches")
+        elif matches.exact:
+            self.search_status.config(text=f"{len(matches)} matches")
+        else:
+            self.count_search(matches)
+
+    def count_search(self, matches):
+        """
+        Counts the next slice of a text search's matches, until it is done or replaced by another search.
+        """
+        if matches is not self.search_matches:
+            return
+        total = matches.count(SEARCH_COUNT_SLICE)
+        if total is None:
+            self.search_status.config(text=f"{matches.counted}+ matches")
+            self.root.after(1, lambda: self.count_search(matches))
+        else:
+            self.search_status.config(text=f"{total} matches")
+
+    def step_search(self, direction):
+        """
+        Moves to the next (direction=1) or previous (-1) match, scrolling to it and seeking the video.
+        The search is re-run first so entries added or removed since are taken into account.
+        """
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.run_search(keep_cursor=True)
+        matches = self.search_matches
+        if not matches:
+            return
+        # The cursor is the sort key of the current match, so it survives rows shifting underneath it.
+        k = None
+        if self.search_cursor is not None:
+            k = matches.step(self.search_cursor, direction)
+        if k is None:
+            k = matches.step(-1, 1) if direction > 0 else matches.step(float('inf'), -1)
+        self.search_cursor = k
+        row = bisect.bisect_left(self.logger.keys, k)
+        self.log_view.see(row)
+        if matches.exact:
+            self.search_status.config(text=f"{matches.rank(k) + 1} / {len(matches)} matches")
+        self.seek_to_row(row)
+
+    def end_search(self):
+        """
+        Clears the search box and returns keyboard focus to the logging shortcuts.
         """
-        search_term = simpledialog.askstring("Search Log", "Enter search term:", parent=self.root)
-        if search_term and self.logger:
-            self.logger.search_entries(search_term, self)
+        self.search_var.set("")
+        self.root.focus_set()
 
     def show_instructions(self):
         """
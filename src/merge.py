@@ -0,0 +1,284 @@
+import argparse
+import csv
+import heapq
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import journal
+from csv_logger import iter_entries
+from motion import is_proposals
+from timecodes import format_line, format_ms, key_char, key_code
+
+# Events are only matched within a group, so a flag never pairs with a vehicle: classifications and TPRS
+# movements, and the brake/behaviour flags (see the notes legend in main_gui.py). Other keys match among
+# themselves.
+DEFAULT_GROUPS = ("jky", "dfb")
+DEFAULT_TOLERANCE_MS = 1000
+
+
+def iter_sorted_entries(path):
+    """
+    Stream (ms, code) pairs from a log in time order. A compacted log is already sorted and is streamed in
+    constant memory. A log with a pending journal (the session did not close cleanly) is replayed in memory,
+    read-only, the way CSVLogger would load it. Raises ValueError if a log without a journal is out of order.
+    """
+    pending = journal.pending_entries(path)
+    if pending is not None:
+        yield from sorted(pending)
+        return
+    last = None
+    for ms, code in iter_entries(path):
+        if last is not None and ms < last:
+            raise ValueError(f"{path} is not in time order; open it in the logger once to compact it")
+        last = ms
+        yield ms, code
+
+
+def source_labels(paths):
+    """
+    Name each log for the source column: by file name, or by folder when the file names are the same
+    (each annotator's copy of the same video's log).
+    """
+    names = [os.path.splitext(os.path.basename(p))[0] for p in paths]
+    if len(set(names)) == len(names):
+        return names
+    folders = [os.path.basename(os.path.dirname(os.path.abspath(p))) for p in paths]
+    if len(set(folders)) == len(folders):
+        return folders
+    return [str(i + 1) for i in range(len(paths))]
+
+
+def merge(paths):
+    """
+    K-way merge of several logs by timestamp. Yields (ms, code, source) with source the index into paths;
+    events at the same ms come in path order. Memory is one pending entry per log.
+    """
+    streams = [((ms, i, code) for ms, code in iter_sorted_entries(path)) for i, path in enumerate(paths)]
+    for ms, i, code in heapq.merge(*streams):
+        yield ms, code, i
+
+
+def write_merged(paths, out_path, labels=None):
+    """
+    Write the merged log as lines of "<timestamp>, <key>, <source>". Returns the number of entries.
+    """
+    labels = labels or source_labels(paths)
+    count = 0
+    tmp = out_path + '.tmp'
+    with open(tmp, 'w') as f:
+        for ms, code, i in merge(paths):
+            f.write(f"{format_line(ms, code)}, {labels[i]}\n")
+            count += 1
+    os.replace(tmp, out_path)
+    return count
+
+
+def group_of(groups):
+    """
+    Map each key code to its group index; codes outside every group share one extra group.
+    """
+    table = {}
+    for g, keys in enumerate(groups):
+        for key in keys:
+            table[key_code(key)] = g
+    return lambda code: table.get(code, len(groups))
+
+
+def match_events(a, b, tolerance_ms=DEFAULT_TOLERANCE_MS):
+    """
+    Match two time-ordered (ms, code) streams in one linear two-pointer pass. Events less than or exactly
+    tolerance_ms apart pair up (the earliest unmatched event first). Yields (event_a, event_b) with None on
+    the side that has no counterpart.
+    """
+    a = iter(a)
+    b = iter(b)
+    ea = next(a, None)
+    eb = next(b, None)
+    while ea is not None and eb is not None:
+        if abs(ea[0] - eb[0]) <= tolerance_ms:
+            yield ea, eb
+            ea = next(a, None)
+            eb = next(b, None)
+        elif ea[0] < eb[0]:
+            yield ea, None
+            ea = next(a, None)
+        else:
+            yield None, eb
+            eb = next(b, None)
+    while ea is not None:
+        yield ea, None
+        ea = next(a, None)
+    while eb is not None:
+        yield None, eb
+        eb = next(b, None)
+
+
+def agreement(path_a, path_b, tolerance_ms=DEFAULT_TOLERANCE_MS, groups=DEFAULT_GROUPS, events_writer=None):
+    """
+    Compare two annotators' logs of the same video. Events are matched within each key group (see
+    DEFAULT_GROUPS); a matched pair with different keys is a misclassification, an unmatched event is a miss
+    by the other annotator. Streams both files once per group. If events_writer (a csv.writer) is given, every
+    event is written to it as (group, time_a, key_a, time_b, key_b, status).
+
+    Returns a dict of counts: matched, agreed, misclassified, only_a, only_b, agreement (agreed over all
+    events counted once per pair), and confusion {"<key_a><key_b>": count} of misclassifications.
+    """
+    group = group_of(groups)
+    result = Counter()
+    confusion = Counter()
+    for g in range(len(groups) + 1):
+        stream_a = (e for e in iter_sorted_entries(path_a) if group(e[1]) == g)
+        stream_b = (e for e in iter_sorted_entries(path_b) if group(e[1]) == g)
+        for ea, eb in match_events(stream_a, stream_b, tolerance_ms):
+            if ea is None:
+                status = 'only_b'
+            elif eb is None:
+                status = 'only_a'
+            elif ea[1] == eb[1]:
+                status = 'agreed'
+            else:
+                status = 'misclassified'
+                confusion[key_char(ea[1]) + key_char(eb[1])] += 1
+            result[status] += 1
+            if events_writer is not None:
+                events_writer.writerow([
+                    g,
+                    format_ms(ea[0]) if ea else '', key_char(ea[1]) if ea else '',
+                    format_ms(eb[0]) if eb else '', key_char(eb[1]) if eb else '',
+                    status,
+                ])
+    matched = result['agreed'] + result['misclassified']
+    total = matched + result['only_a'] + result['only_b']
+    return {
+        'a': path_a,
+        'b': path_b,
+        'matched': matched,
+        'agreed': result['agreed'],
+        'misclassified': result['misclassified'],
+        'only_a': result['only_a'],
+        'only_b': result['only_b'],
+        'agreement': round(result['agreed'] / total, 4) if total else None,
+        'confusion': dict(confusion.most_common()),
+    }
+
+
+def agreement_report(paths, tolerance_ms=DEFAULT_TOLERANCE_MS, groups=DEFAULT_GROUPS, events_path=None,
+                     labels=None):
+    """
+    Pairwise agreement between every two of the given logs. Optionally writes all matched/unmatched events
+    to events_path as CSV.
+    """
+    labels = labels or source_labels(paths)
+    pairs = [(i, j) for i in range(len(paths)) for j in range(i + 1, len(paths))]
+    if events_path is None:
+        return [agreement(paths[i], paths[j], tolerance_ms, groups) for i, j in pairs]
+    reports = []
+    with open(events_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['a', 'b', 'group', 'time_a', 'key_a', 'time_b', 'key_b', 'status'])
+        for i, j in pairs:
+            prefix = [labels[i], labels[j]]
+            pair_writer = PrefixWriter(writer, prefix)
+            reports.append(agreement(paths[i], paths[j], tolerance_ms, groups, pair_writer))
+    return reports
+
+
+class PrefixWriter:
+    def __init__(self, writer, prefix):
+        self.writer = writer
+        self.prefix = prefix
+
+    def writerow(self, row):
+        self.writer.writerow(self.prefix + row)
+
+
+def find_groups(dirs):
+    """
+    Pair up logs across annotator folders: each folder holds one annotator's copy of the same set of
+    videos, so logs with the same relative path belong to the same video. Yields (relative path, [paths],
+    [folder names]) for every log present in at least two folders.
+    """
+    found = {}
+    for d in dirs:
+        label = os.path.basename(os.path.normpath(d))
+        for dirpath, dirnames, filenames in os.walk(d):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.lower().endswith('.csv') and not is_proposals(name):
+                    path = os.path.join(dirpath, name)
+                    found.setdefault(os.path.relpath(path, d), []).append((path, label))
+    for rel in sorted(found):
+        if len(found[rel]) >= 2:
+            paths, labels = zip(*found[rel])
+            yield rel, list(paths), list(labels)
+
+
+def process_group(rel, paths, out_dir, tolerance_ms, groups, labels):
+    """
+    Merge and compare one video's logs (runs in a worker process for --batch).
+    """
+    base = os.path.join(out_dir, os.path.splitext(rel)[0])
+    os.makedirs(os.path.dirname(base) or '.', exist_ok=True)
+    try:
+        entries = write_merged(paths, base + '.merged.csv', labels)
+        reports = agreement_report(paths, tolerance_ms, groups, base + '.events.csv', labels)
+        error = None
+    except Exception as e:
+        entries, reports, error = 0, [], str(e)
+    return {'video': rel, 'logs': paths, 'entries': entries, 'pairs': reports, 'error': error}
+
+
+def _process_group(args):
+    return process_group(*args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Merge several annotators' logs of the same video and measure how well they agree.")
+    parser.add_argument('logs', nargs='*', help="logs of one video (merge/compare these)")
+    parser.add_argument('--batch', nargs='+', metavar='DIR',
+                        help="one folder per annotator; logs with the same relative path are merged and compared")
+    parser.add_argument('--out', help="merged log (single video), or output folder with --batch")
+    parser.add_argument('--events', help="write every matched/missed event to this CSV (single video)")
+    parser.add_argument('--report', help="write the agreement report to this JSON file")
+    parser.add_argument('--tolerance-ms', type=int, default=DEFAULT_TOLERANCE_MS,
+                        help=f"events this close count as the same event (default {DEFAULT_TOLERANCE_MS})")
+    parser.add_argument('--groups', default=",".join(DEFAULT_GROUPS),
+                        help="comma-separated key groups matched separately (default jky,dfb)")
+    parser.add_argument('--workers', type=int, help="worker processes for --batch (default: CPU count)")
+    args = parser.parse_args(argv)
+    groups = tuple(g for g in args.groups.split(',') if g)
+
+    if args.batch:
+        out_dir = args.out or 'merged'
+        jobs = [(rel, paths, out_dir, args.tolerance_ms, groups, labels)
+                for rel, paths, labels in find_groups(args.batch)]
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(_process_group, jobs, chunksize=4))
+        for r in results:
+            rates = " ".join(f"{p['agreement']}" for p in r['pairs'])
+            print(f"{r['video']}: {r['entries']} entries, agreement {rates or '-'}"
+                  + (f" ERROR {r['error']}" if r['error'] else ""))
+    else:
+        if len(args.logs) < 2:
+            parser.error("give at least two logs, or --batch with annotator folders")
+        if args.out:
+            print(f"{write_merged(args.logs, args.out)} entries merged into {args.out}")
+        results = agreement_report(args.logs, args.tolerance_ms, groups, args.events)
+        writer = csv.writer(sys.stdout)
+        writer.writerow(['a', 'b', 'matched', 'agreed', 'misclassified', 'only_a', 'only_b', 'agreement', 'confusion'])
+        labels = dict(zip(args.logs, source_labels(args.logs)))
+        for r in results:
+            writer.writerow([labels[r['a']], labels[r['b']], r['matched'], r['agreed'],
+                             r['misclassified'], r['only_a'], r['only_b'], r['agreement'],
+                             " ".join(f"{k}:{v}" for k, v in r['confusion'].items())])
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import argparse
+import ctypes
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from csv_logger import iter_entries
+from playback_clock import PlaybackClock
+from timecodes import format_line, format_ms, key_code
+
+# Key of proposal lines. Proposals are written in the log's line format, but to their own file next to the
+# video, so they are never mistaken for (or merged into) an annotator's entries.
+PROPOSAL_KEY = "?"
+# Proposals files share the log extension, so every tool that scans folders for logs must skip them.
+PROPOSALS_SUFFIX = ".proposals.csv"
+# Size of the frames libVLC renders for analysis; differencing needs very little detail.
+FRAME_WIDTH = 160
+FRAME_HEIGHT = 90
+# Playback rate of the prepass. libVLC drops frames it cannot deliver in time, which only thins the sampling.
+PREPASS_RATE = 8.0
+# A pixel has changed when its grey level moved by more than this (0-255) since the previous frame.
+PIXEL_THRESHOLD = 25
+# Fraction of the region's pixels that must change for a frame to count as motion.
+MIN_FRACTION = 0.02
+# Frames with motion less than this apart belong to the same event; each event is proposed once, at the
+# frame where most of the region changed.
+MERGE_GAP_MS = 1500
+# Frames queued between libVLC's decoder thread and the analysis.
+FRAME_QUEUE = 64
+
+
+def proposals_path(video_path):
+    return os.path.splitext(video_path)[0] + PROPOSALS_SUFFIX
+
+
+def is_proposals(path):
+    return path.lower().endswith(PROPOSALS_SUFFIX)
+
+
+def parse_roi(text):
+    """
+    Parse a region of interest "x,y,w,h" given as fractions of the frame (e.g. "0,0.5,1,0.5" for the
+    lower half).
+    """
+    x, y, w, h = (float(v) for v in text.split(','))
+    if not (0 <= x < 1 and 0 <= y < 1 and 0 < w <= 1 - x + 1e-9 and 0 < h <= 1 - y + 1e-9):
+        raise ValueError(f"region {text!r} is not inside the frame")
+    return x, y, w, h
+
+
+class MotionDetector:
+    """
+    Frame differencing over a region of interest of small grey frames. Runs of frames with enough changed
+    pixels, closer together than merge_gap_ms, form one event, proposed at its busiest frame.
+    """
+    def __init__(self, roi=(0.0, 0.0, 1.0, 1.0), pixel_threshold=PIXEL_THRESHOLD, min_fraction=MIN_FRACTION,
+                 merge_gap_ms=MERGE_GAP_MS, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+        x, y, w, h = roi
+        self.rows = slice(int(y * height), max(int(y * height) + 1, round((y + h) * height)))
+        self.cols = slice(int(x * width), max(int(x * width) + 1, round((x + w) * width)))
+        self.pixel_threshold = pixel_threshold
+        self.min_fraction = min_fraction
+        self.merge_gap_ms = merge_gap_ms
+        self.previous = None
+        self.previous_ms = None
+        self.events = []
+        # Current run of motion: time of its last moving frame, and (fraction, ms) of its busiest frame.
+        self.run_last = None
+        self.run_peak = None
+
+    def feed(self, ms, grey):
+        """
+        Analyse one frame (2-D uint8 array, FRAME_HEIGHT x FRAME_WIDTH) shown at video time ms.
+        """
+        import numpy as np
+        region = grey[self.rows, self.cols].astype(np.int16)
+        previous, previous_ms = self.previous, self.previous_ms
+        self.previous, self.previous_ms = region, ms
+        if previous is None or ms <= previous_ms:
+            return
+        changed = np.count_nonzero(np.abs(region - previous) > self.pixel_threshold) / region.size
+        if changed < self.min_fraction:
+            return
+        if self.run_last is not None and ms - self.run_last > self.merge_gap_ms:
+            self.end_run()
+        if self.run_peak is None or changed > self.run_peak[0]:
+            self.run_peak = (changed, ms)
+        self.run_last = ms
+
+    def end_run(self):
+        if self.run_peak is not None:
+            self.events.append(self.run_peak[1])
+        self.run_last = None
+        self.run_peak = None
+
+    def finish(self):
+        """
+        Close the last run and return the proposed event times (ms), in order.
+        """
+        self.end_run()
+        return self.events
+
+
+def iter_frames(video_path, instance=None, width=FRAME_WIDTH, height=FRAME_HEIGHT, rate=PREPASS_RATE):
+    """
+    Play a video through libVLC's video callbacks (no window, no audio) at the given rate and yield
+    (ms, grey frame) for every frame it renders; raises RuntimeError if libVLC reports a playback error. Frames come downscaled by libVLC; their times come from a
+    PlaybackClock on the player, since libVLC's own time only moves every few hundred ms.
+    instance is the vlc.Instance to use (the GUI's, or one per worker process); one is created if None.
+    """
+    import numpy as np
+    import vlc
+    own_instance = instance is None
+    if own_instance:
+        instance = vlc.Instance('--no-audio', '--quiet')
+    player = instance.media_player_new()
+    media = instance.media_new(video_path)
+    media.add_option(':no-audio')
+    player.set_media(media)
+    pixels = np.zeros((height, width, 4), np.uint8)
+    pointer = ctypes.c_void_p(pixels.ctypes.data)
+    frames = queue.Queue(maxsize=FRAME_QUEUE)
+    state = {'clock': None, 'error': False}
+    done = threading.Event()
+
+    @vlc.CallbackDecorators.VideoLockCb
+    def lock(opaque, planes):
+        planes[0] = pointer.value
+        return None
+
+    @vlc.CallbackDecorators.VideoUnlockCb
+    def unlock(opaque, picture, planes):
+        pass
+
+    @vlc.CallbackDecorators.VideoDisplayCb
+    def display(opaque, picture):
+        # Runs on libVLC's video thread: stamp the frame and keep a grey copy before the buffer is reused.
+        if state['clock'] is None:
+            state['clock'] = PlaybackClock(player)
+            state['clock'].resync(playing=True, rate=rate)
+        ms = state['clock'].now_ms()
+        grey = ((pixels[..., 2].astype(np.uint16) * 77 + pixels[..., 1].astype(np.uint16) * 150
+                 + pixels[..., 0].astype(np.uint16) * 29) >> 8).astype(np.uint8)
+        while not done.is_set():
+            try:
+                frames.put((ms, grey), timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def finished(event):
+        if event.type == vlc.EventType.MediaPlayerEncounteredError:
+            state['error'] = True
+        done.set()
+        try:
+            frames.put_nowait(None)
+        except queue.Full:
+            pass
+
+    player.video_set_callbacks(lock, unlock, display, None)
+    player.video_set_format("RV32", width, height, width * 4)
+    events = player.event_manager()
+    events.event_attach(vlc.EventType.MediaPlayerEndReached, finished)
+    events.event_attach(vlc.EventType.MediaPlayerEncounteredError, finished)
+    player.play()
+    player.set_rate(rate)
+    try:
+        while True:
+            try:
+                item = frames.get(timeout=0.5)
+            except queue.Empty:
+                if done.is_set():
+                    break
+                continue
+            if item is None:
+                break
+            yield item
+        if state['error']:
+            raise RuntimeError(f"VLC could not play {video_path}")
+    finally:
+        # The video thread stops waiting on a full queue once done is set.
+        done.set()
+        player.stop()
+        player.release()
+        if own_instance:
+            instance.release()
+
+
+def write_proposals(path, events):
+    tmp = path + '.tmp'
+    code = key_code(PROPOSAL_KEY)
+    with open(tmp, 'w') as f:
+        f.writelines(format_line(ms, code) + '\n' for ms in events)
+    os.replace(tmp, path)
+
+
+def load_proposals(video_path):
+    """
+    Return the proposed event times (video ms, sorted) saved for a video, or an empty list.
+    """
+    path = proposals_path(video_path)
+    if not os.path.exists(path):
+        return []
+    return sorted(ms for ms, _ in iter_entries(path))
+
+
+def prepass(video_path, roi=(0.0, 0.0, 1.0, 1.0), instance=None, rate=PREPASS_RATE,
+            pixel_threshold=PIXEL_THRESHOLD, min_fraction=MIN_FRACTION, merge_gap_ms=MERGE_GAP_MS):
+    """
+    Run motion detection over one video and write <video>.proposals.csv. Returns a summary dict. Raises
+    (leaving any earlier proposals file as it was) if the video cannot be played to the end.
+    """
+    detector = MotionDetector(roi, pixel_threshold, min_fraction, merge_gap_ms)
+    start = time.perf_counter()
+    frames = 0
+    last_ms = 0
+    for ms, grey in iter_frames(video_path, instance, rate=rate):
+        detector.feed(ms, grey)
+        frames += 1
+        last_ms = max(last_ms, ms)
+    events = detector.finish()
+    write_proposals(proposals_path(video_path), events)
+    elapsed = time.perf_counter() - start
+    return {
+        'video': video_path,
+        'proposals': len(events),
+        'frames': frames,
+        'video_ms': last_ms,
+        'seconds': round(elapsed, 2),
+        'speed': round(last_ms / 1000.0 / elapsed, 1) if elapsed else None,
+    }
+
+
+# One libVLC instance per worker process, created by init_worker.
+_instance = None
+
+
+def init_worker():
+    global _instance
+    import vlc
+    _instance = vlc.Instance('--no-audio', '--quiet')
+
+
+def _prepass(args):
+    video_path, kwargs = args
+    try:
+        return prepass(video_path, instance=_instance, **kwargs)
+    except Exception as e:
+        return {'video': video_path, 'error': str(e)}
+
+
+def find_videos(paths, extensions=('.mp4', '.avi', '.mov', '.mkv')):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.lower().endswith(extensions):
+                    yield os.path.join(dirpath, name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Propose candidate vehicle events by frame differencing, writing <video>.proposals.csv.")
+    parser.add_argument('videos', nargs='+', help="video files or folders")
+    parser.add_argument('--roi', type=parse_roi, default=(0.0, 0.0, 1.0, 1.0),
+                        help="region of interest x,y,w,h as fractions of the frame (default: whole frame)")
+    parser.add_argument('--rate', type=float, default=PREPASS_RATE, help=f"playback rate (default {PREPASS_RATE})")
+    parser.add_argument('--pixel-threshold', type=int, default=PIXEL_THRESHOLD,
+                        help=f"grey-level change that counts as a changed pixel (default {PIXEL_THRESHOLD})")
+    parser.add_argument('--min-fraction', type=float, default=MIN_FRACTION,
+                        help=f"fraction of changed pixels that counts as motion (default {MIN_FRACTION})")
+    parser.add_argument('--merge-gap-ms', type=int, default=MERGE_GAP_MS,
+                        help=f"motion this close together is one event (default {MERGE_GAP_MS})")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    videos = list(find_videos(args.videos))
+    if not videos:
+        parser.error("no videos given")
+    kwargs = {'roi': args.roi, 'rate': args.rate, 'pixel_threshold': args.pixel_threshold,
+              'min_fraction': args.min_fraction, 'merge_gap_ms': args.merge_gap_ms}
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        for result in pool.map(_prepass, [(video, kwargs) for video in videos]):
+            if result.get('error'):
+                print(f"{result['video']}: ERROR {result['error']}")
+            else:
+                print(f"{result['video']}: {result['proposals']} proposals from {result['frames']} frames, "
+                      f"{format_ms(result['video_ms'])} in {result['seconds']} s (x{result['speed']})")
+
+
+if __name__ == "__main__":
+    main()
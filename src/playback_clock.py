@@ -0,0 +1,127 @@
+import time
+
+# Tk event times are 32-bit millisecond counters and wrap around.
+EVENT_TIME_WRAP = 1 << 32
+# A key event apparently older than this is treated as a clock mismatch, not real handler latency.
+MAX_EVENT_LATENCY_MS = 1000
+
+
+class PlaybackClock:
+    """
+    High-resolution playback position for timestamping key presses.
+
+    libVLC's get_time() only moves every few hundred ms, so stamping with it quantizes (and at high
+    rates can even reorder) entries. This clock interpolates with time.monotonic() and the playback rate,
+    and corrects itself whenever the reported time changes. Seeks, pauses and rate changes re-anchor it
+    explicitly. Tk event times are mapped onto the monotonic clock so an entry is stamped when its key
+    was pressed, not when the handler got to run.
+    """
+    def __init__(self, player, clock=time.monotonic, event_offset=None):
+        self.player = player
+        self.clock = clock
+        self.rate = 1.0
+        self.playing = False
+        self.anchor_ms = 0.0
+        self.anchor_t = clock()
+        self.last_raw = None
+        # When the player was last polled; a change in its reported time happened since then.
+        self.last_poll = self.anchor_t
+        self.last_output = 0.0
+        # Time of the last explicit re-anchor; stamps never reach back past it (e.g. across a seek).
+        self.resync_t = self.anchor_t
+        # Smallest (monotonic ms - event.time) seen; the offset between the two clocks. It does not depend
+        # on the player, so a clock for the next video can start from the previous one's.
+        self.event_offset = event_offset
+        self.resync()
+
+    def resync(self, ms=None, playing=None, rate=None):
+        """
+        Re-anchor on the player. Call after seeks (with the target ms), play/pause and rate changes,
+        since libVLC may report the old position for a while after any of them.
+        """
+        raw = self.player.get_time()
+        self.last_raw = raw
+        if rate is not None:
+            self.rate = rate
+        else:
+            try:
+                self.rate = self.player.get_rate() or 1.0
+            except Exception:
+                self.rate = 1.0
+        self.playing = bool(self.player.is_playing()) if playing is None else playing
+        self.anchor_ms = float(max(0, raw if ms is None else ms))
+        self.anchor_t = self.resync_t = self.last_poll = self.clock()
+        self.last_output = self.anchor_ms
+
+    def freeze(self, playing=False, rate=None):
+        """
+        Re-anchor at the current interpolated position (for pause/resume and rate changes, where the
+        position itself does not jump).
+        """
+        current = self.position()
+        self.anchor_ms = current
+        self.anchor_t = self.resync_t = self.clock()
+        self.playing = playing
+        if rate is not None:
+            self.rate = rate
+
+    def sample(self):
+        """
+        Poll the player. A change in its reported time happened at some instant since the previous poll,
+        so the position now lies between the new value and that value plus the time elapsed since then.
+        The interpolated position is kept if it falls in that window and moved to its nearest edge if not,
+        so it converges on the true position instead of lagging behind each update by up to one poll
+        interval. Call this often (every frame or so) while playing.
+        """
+        raw = self.player.get_time()
+        now = self.clock()
+        if raw != self.last_raw:
+            self.last_raw = raw
+            if raw >= 0:
+                if self.playing:
+                    window = (now - self.last_poll) * 1000.0 * self.rate
+                    self.anchor_ms = min(max(self.position(now), float(raw)), raw + window)
+                else:
+                    self.anchor_ms = float(raw)
+                self.anchor_t = now
+        self.last_poll = now
+
+    def position(self, t=None):
+        """
+        Interpolated playback position (ms) at monotonic time t (now by default). t may be slightly
+        before the anchor, e.g. a key pressed just before the player's time last moved.
+        """
+        t = self.clock() if t is None else t
+        if not self.playing:
+            return self.anchor_ms
+        return max(0.0, self.anchor_ms + (t - self.anchor_t) * 1000.0 * self.rate)
+
+    def event_instant(self, event_time):
+        """
+        Map a Tk event time (ms, arbitrary epoch) to a monotonic timestamp. The offset between the
+        clocks is taken as the smallest difference seen so far, i.e. the event handled with the least delay.
+        """
+        now = self.clock()
+        offset = (now * 1000.0 - event_time) % EVENT_TIME_WRAP
+        if self.event_offset is None or offset < self.event_offset:
+            self.event_offset = offset
+        latency = offset - self.event_offset
+        if latency > MAX_EVENT_LATENCY_MS:
+            # Wrap-around or a different clock domain: recalibrate rather than trust it.
+            self.event_offset = offset
+            latency = 0.0
+        return now - latency / 1000.0
+
+    def now_ms(self, event_time=None):
+        """
+        Playback position (integer ms) to stamp an entry with. If event_time (Tk's event.time) is given,
+        the position is taken at the moment the key was pressed. Successive stamps never go backwards
+        unless the clock was re-anchored in between.
+        """
+        self.sample()
+        t = self.event_instant(event_time) if event_time is not None else self.clock()
+        ms = self.position(max(t, self.resync_t))
+        if self.playing:
+            ms = max(ms, self.last_output)
+        self.last_output = ms
+        return int(ms)
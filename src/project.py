@@ -0,0 +1,222 @@
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Clips kept ready to show (parsed media, player and loaded logger): the current one and its neighbours.
+CACHE_CLIPS = 3
+
+
+def project_path(first_video):
+    return os.path.splitext(first_video)[0] + ".project.json"
+
+
+class Project:
+    """
+    An ordered sequence of clips from one site (e.g. consecutive 15-minute camera files), with the
+    start time of each clip. A start time entered for one clip carries forward to the following ones by
+    adding up clip durations, so only the first clip of a continuous run needs one.
+    """
+    def __init__(self, paths, path=None):
+        self.paths = list(paths)
+        self.path = path or project_path(self.paths[0])
+        self.current = 0
+        # Start times (ms) entered by the user, and clip durations (ms) once known, by video path.
+        self.starts = {}
+        self.durations = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    @property
+    def current_path(self):
+        return self.paths[self.current]
+
+    def neighbour(self, step):
+        """
+        Return the index step clips away from the current one, or None past either end.
+        """
+        index = self.current + step
+        return index if 0 <= index < len(self.paths) else None
+
+    def start_ms(self, index):
+        """
+        Return the start time (ms) of a clip: the one entered for it, or the nearest earlier entered start
+        plus the durations of the clips in between. None if a duration in between is still unknown.
+        """
+        carried = 0
+        for i in range(index, -1, -1):
+            path = self.paths[i]
+            if path in self.starts:
+                return self.starts[path] + carried
+            if i == 0:
+                return None
+            duration = self.durations.get(self.paths[i - 1])
+            if duration is None:
+                return None
+            carried += duration
+
+    def set_start(self, index, ms):
+        self.starts[self.paths[index]] = ms
+
+    def set_duration(self, path, ms):
+        if ms and ms > 0:
+            self.durations[path] = ms
+
+    def save(self):
+        """
+        Write the clip list, entered start times and known durations next to the first clip.
+        """
+        data = {
+            'clips': [{'path': p, 'start_ms': self.starts.get(p), 'duration_ms': self.durations.get(p)}
+                      for p in self.paths],
+            'current': self.current,
+        }
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self.path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        project = cls([clip['path'] for clip in data['clips']], path)
+        for clip in data['clips']:
+            if clip.get('start_ms') is not None:
+                project.starts[clip['path']] = clip['start_ms']
+            if clip.get('duration_ms') is not None:
+                project.durations[clip['path']] = clip['duration_ms']
+        project.current = min(max(data.get('current', 0), 0), len(project.paths) - 1)
+        return project
+
+    @classmethod
+    def for_videos(cls, paths):
+        """
+        Build a project from video files in name order, picking up the saved start times if the same
+        clips were opened as a project before.
+        """
+        paths = sorted(paths)
+        saved = project_path(paths[0])
+        if os.path.exists(saved):
+            try:
+                project = cls.load(saved)
+                if project.paths == paths:
+                    return project
+            except Exception:
+                pass
+        return cls(paths)
+
+
+def saved_start_ms(video_path):
+    """
+    Return a video's start time (ms) from a saved project in its folder that includes it, or None.
+    """
+    video = os.path.normcase(os.path.abspath(video_path))
+    folder = os.path.dirname(video)
+    try:
+        names = sorted(os.listdir(folder))
+    except OSError:
+        return None
+    for name in names:
+        if not name.endswith(".project.json"):
+            continue
+        try:
+            project = Project.load(os.path.join(folder, name))
+        except Exception:
+            continue
+        for i, path in enumerate(project.paths):
+            if os.path.normcase(os.path.abspath(path)) == video:
+                return project.start_ms(i)
+    return None
+
+
+class Clip:
+    """
+    A clip prepared for display: its media (parsed in the background by libVLC), a media player with the
+    media set, and its logger, loaded on a worker thread.
+    """
+    def __init__(self, path, media, player, logger_future):
+        self.path = path
+        self.media = media
+        self.player = player
+        self.logger_future = logger_future
+
+    @property
+    def logger(self):
+        return self.logger_future.result()
+
+
+def close_logger(logger_future):
+    """
+    Close a clip's logger once it has loaded, waiting for its writer to finish compacting the log.
+    """
+    try:
+        logger_future.result().close(wait=True)
+    except Exception:
+        pass
+
+
+class ClipCache:
+    """
+    Least-recently-used set of prepared clips. Preparing a clip starts parsing its media and loading its
+    log in the background, so switching to it later only has to attach the player to the video window.
+    Evicted clips have their player released and their logger closed (which compacts it).
+
+    Closing runs on the loader thread and finishes only once the logger's writer has exited; closing[path]
+    is its future. A clip prepared again before then loads its log after the close, never alongside it.
+    """
+    def __init__(self, vlc_instance, make_logger, capacity=CACHE_CLIPS):
+        self.vlc_instance = vlc_instance
+        self.make_logger = make_logger
+        self.capacity = capacity
+        self.clips = OrderedDict()
+        self.loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clip-loader')
+        self.closing = {}
+
+    def prepare(self, path):
+        """
+        Return the prepared clip for path, preparing it now if it is not cached. Marks it most recently used.
+        """
+        clip = self.clips.get(path)
+        if clip is not None:
+            self.clips.move_to_end(path)
+            return clip
+        import vlc
+        media = self.vlc_instance.media_new(path)
+        try:
+            media.parse_with_options(vlc.MediaParseFlag.local, 0)
+        except Exception:
+            pass
+        player = self.vlc_instance.media_player_new()
+        player.set_media(media)
+        clip = self.clips[path] = Clip(path, media, player, self.loader.submit(self.load_logger, path))
+        while len(self.clips) > self.capacity:
+            _, evicted = self.clips.popitem(last=False)
+            self.release(evicted)
+        return clip
+
+    def load_logger(self, path):
+        closing = self.closing.pop(path, None)
+        if closing is not None:
+            closing.result()
+        return self.make_logger(path)
+
+    def release(self, clip):
+        try:
+            clip.player.stop()
+            clip.player.release()
+        except Exception:
+            pass
+        self.closing[clip.path] = self.loader.submit(close_logger, clip.logger_future)
+
+    def close(self):
+        """
+        Release every clip. Returns {path: future} for the loggers still closing, which the caller must
+        wait for before opening any of those logs again.
+        """
+        while self.clips:
+            _, clip = self.clips.popitem(last=False)
+            self.release(clip)
+        self.loader.shutdown(wait=False)
+        return self.closing
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import journal
+from motion import is_proposals
+from timecodes import format_line, format_ms, parse_line, parse_timestamp
+
+# Sidecar recording the corrections applied to a log, so its times can still be mapped back to the video.
+SIDECAR_SUFFIX = ".timebase.json"
+SIDECAR_VERSION = 1
+
+
+def timebase_path(csv_path):
+    return csv_path + SIDECAR_SUFFIX
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    journal.fsync_dir(path)
+
+
+class Timebase:
+    """
+    A linear correction of log times: corrected = scale * original + shift_ms. The timebase of a log maps
+    the times it was recorded with (video time plus the start offset) to the times now in its CSV, so
+    the GUI logs new entries with apply() and seeks the video with invert().
+    """
+    def __init__(self, scale=1.0, shift_ms=0.0, history=()):
+        self.scale = scale
+        self.shift_ms = shift_ms
+        self.history = list(history)
+
+    @classmethod
+    def correction(cls, shift_ms=0, drift_ppm=0.0, anchor_ms=0):
+        """
+        A correction that shifts times by shift_ms and undoes a clock that ran drift_ppm parts per million
+        fast (negative: slow) from anchor_ms: a time t becomes t + shift_ms - drift_ppm * 1e-6 * (t - anchor_ms).
+        """
+        rate = 1.0 - drift_ppm * 1e-6
+        if rate <= 0:
+            raise ValueError(f"drift of {drift_ppm} ppm is not a clock error")
+        step = {'shift_ms': shift_ms, 'drift_ppm': drift_ppm, 'anchor_ms': anchor_ms}
+        return cls(rate, shift_ms + (1.0 - rate) * anchor_ms, [step])
+
+    @property
+    def identity(self):
+        return self.scale == 1.0 and self.shift_ms == 0.0
+
+    def apply(self, ms):
+        return int(round(self.scale * ms + self.shift_ms))
+
+    def invert(self, ms):
+        return int(round((ms - self.shift_ms) / self.scale))
+
+    def then(self, other):
+        """
+        The timebase of applying this correction and then other.
+        """
+        return Timebase(other.scale * self.scale, other.scale * self.shift_ms + other.shift_ms,
+                        self.history + other.history)
+
+    def to_dict(self):
+        return {'scale': self.scale, 'shift_ms': self.shift_ms, 'history': self.history}
+
+    def save(self, csv_path, pending=None):
+        data = dict(self.to_dict(), version=SIDECAR_VERSION)
+        if pending is not None:
+            data['pending'] = pending
+        write_json(timebase_path(csv_path), data)
+
+    @classmethod
+    def for_log(cls, csv_path):
+        """
+        Return the timebase of a log: the identity if it was never rebased. A rebase interrupted between
+        replacing the CSV and recording it is settled here (by whether the CSV on disk is the rewritten
+        one) and the sidecar rewritten, before anything else can change the CSV.
+        """
+        try:
+            with open(timebase_path(csv_path), 'r') as f:
+                data = json.load(f)
+        except Exception:
+            return cls()
+        timebase = cls(data.get('scale', 1.0), data.get('shift_ms', 0.0), data.get('history', []))
+        pending = data.get('pending')
+        if pending:
+            if pending.get('log') == file_stamp(csv_path):
+                timebase = cls(pending['scale'], pending['shift_ms'], pending['history'])
+            try:
+                timebase.save(csv_path)
+            except Exception:
+                pass
+        return timebase
+
+
+def pending_reason(csv_path):
+    """
+    Why a log cannot be rebased right now, or None if it can.
+    """
+    from sqlite_logger import db_path
+    base_path, records, _ = journal.recover(csv_path)
+    if records or base_path != csv_path:
+        return "journal pending (open it in the GUI or let it recover first)"
+    if os.path.exists(db_path(csv_path)):
+        return "kept in a SQLite database"
+    return None
+
+
+def rebase_file(csv_path, correction):
+    """
+    Apply a correction to every entry of a log, streaming it to a temporary file that atomically replaces
+    it, and record the correction in the log's timebase sidecar. Lines that are not entries are kept
+    as they are. Memory use does not depend on the log's size. Returns the number of entries rewritten;
+    raises ValueError for logs that cannot be rebased.
+    """
+    reason = pending_reason(csv_path)
+    if reason:
+        raise ValueError(reason)
+    current = Timebase.for_log(csv_path)
+    tmp = csv_path + '.rebase.tmp'
+    entries = 0
+    try:
+        with open(csv_path, 'r') as src, open(tmp, 'w') as dst:
+            for line in src:
+                entry = parse_line(line)
+                if entry is None:
+                    dst.write(line)
+                    continue
+                ms = correction.apply(entry[0])
+                if ms < 0:
+                    raise ValueError(f"{format_ms(entry[0])} would move before 00:00:00")
+                dst.write(format_line(ms, entry[1]) + '\n')
+                entries += 1
+            dst.flush()
+            os.fsync(dst.fileno())
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    # Record the new timebase as pending against the rewritten file before it replaces the log, so a crash
+    # in between leaves a sidecar that Timebase.for_log can settle either way (a rename keeps size and mtime).
+    updated = current.then(correction)
+    current.save(csv_path, pending=dict(updated.to_dict(), log=file_stamp(tmp)))
+    os.replace(tmp, csv_path)
+    journal.fsync_dir(csv_path)
+    updated.save(csv_path)
+    return entries
+
+
+def find_logs(paths):
+    """
+    Yield every log (.csv, except motion proposals) under the given files/directories, in a stable order.
+    """
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.lower().endswith('.csv') and not is_proposals(name):
+                    yield os.path.join(dirpath, name)
+
+
+def rebase(paths, correction, dry_run=False):
+    """
+    Rebase every log under paths, one at a time. Yields (path, entries rewritten or None, error or None).
+    """
+    for path in find_logs(paths):
+        if dry_run:
+            yield path, None, pending_reason(path)
+            continue
+        try:
+            yield path, rebase_file(path, correction), None
+        except (OSError, ValueError) as e:
+            yield path, None, str(e)
+
+
+def parse_offset(text):
+    """
+    Parse an offset like "90000", "+00:01:30" or "-01:00:00:500" into ms.
+    """
+    sign = -1 if text.startswith('-') else 1
+    text = text.lstrip('+-')
+    ms = parse_timestamp(text) if ':' in text else (int(text) if text.isdigit() else None)
+    if ms is None:
+        raise argparse.ArgumentTypeError(f"bad offset: {text}")
+    return sign * ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Shift and/or drift-correct the times of existing logs, rewriting each one in place.")
+    parser.add_argument('paths', nargs='+', help="log files or directories to scan for .csv logs")
+    parser.add_argument('--offset', type=parse_offset, default=0,
+                        help="add this to every time: ms or HH:MM:SS[:mmm], negative as --offset=-HH:MM:SS")
+    parser.add_argument('--drift-ppm', type=float, default=0.0,
+                        help="the camera clock ran this many parts per million fast (negative: slow)")
+    parser.add_argument('--anchor', type=parse_offset, default=0,
+                        help="log time at which the drifting clock was right (default 00:00:00)")
+    parser.add_argument('--dry-run', action='store_true', help="only list the logs and any that would be skipped")
+    args = parser.parse_args(argv)
+    correction = Timebase.correction(args.offset, args.drift_ppm, args.anchor)
+    if correction.identity:
+        parser.error("nothing to do: give --offset and/or --drift-ppm")
+    start = time.perf_counter()
+    done = failed = total = 0
+    for path, count, error in rebase(args.paths, correction, args.dry_run):
+        if error:
+            failed += 1
+            print(f"{path}: skipped, {error}", file=sys.stderr)
+        elif count is not None:
+            done += 1
+            total += count
+            print(f"{path}: {count} entries")
+        else:
+            print(path)
+    if not args.dry_run:
+        print(f"{done} logs, {total} entries rebased in {time.perf_counter() - start:.1f}s; {failed} skipped",
+              file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
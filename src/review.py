@@ -0,0 +1,203 @@
+import bisect
+import json
+import os
+from array import array
+
+import journal
+from csv_logger import iter_entries
+from motion import load_proposals, proposals_path
+
+# Bump when the cache layout changes so stale caches are rebuilt.
+CACHE_VERSION = 1
+# Width of an activity bin (video ms).
+BIN_MS = 1000
+# Playback drops to normal speed this long before each active region...
+LEAD_MS = 3000
+# ...and stays there this long after its last event.
+TAIL_MS = 2000
+# Idle stretches shorter than this are played at normal speed rather than skipped.
+MIN_IDLE_MS = 4000
+# Idle stretches are fast-forwarded at this rate, or jumped over outright when longer than JUMP_MS.
+IDLE_RATE = 8.0
+JUMP_MS = 15000
+
+
+def activity_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".activity"
+
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class ActivityIndex:
+    """
+    Per-video activity: how many logged entries and motion proposals fall in each BIN_MS of video time.
+    Cached next to the CSV, keyed on the log, its journal, the proposals file and the start offset, so it is
+    rebuilt only when one of them changes.
+    """
+    def __init__(self, counts, bin_ms=BIN_MS):
+        self.counts = counts
+        self.bin_ms = bin_ms
+
+    @classmethod
+    def build(cls, times_ms, bin_ms=BIN_MS):
+        """
+        Count video times (ms) per bin. Negative times (before the clip) are ignored.
+        """
+        times_ms = [ms for ms in times_ms if ms >= 0]
+        counts = array('H', bytes(2 * (max(times_ms) // bin_ms + 1))) if times_ms else array('H')
+        for ms in times_ms:
+            b = ms // bin_ms
+            if counts[b] < 0xFFFF:
+                counts[b] += 1
+        return cls(counts, bin_ms)
+
+    def spans(self, lead_ms=LEAD_MS, tail_ms=TAIL_MS, min_idle_ms=MIN_IDLE_MS):
+        """
+        Return the active regions as sorted (start, end) video ms: every active bin, widened by lead_ms
+        before and tail_ms after, with regions less than min_idle_ms apart joined.
+        """
+        spans = []
+        for b, count in enumerate(self.counts):
+            if not count:
+                continue
+            start = max(0, b * self.bin_ms - lead_ms)
+            end = (b + 1) * self.bin_ms + tail_ms
+            if spans and start - spans[-1][1] < min_idle_ms:
+                spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+            else:
+                spans.append((start, end))
+        return spans
+
+    def save(self, path, stamp):
+        header = dict(stamp, version=CACHE_VERSION, bin_ms=self.bin_ms, count=len(self.counts))
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(json.dumps(header).encode() + b'\n')
+            self.counts.tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, stamp):
+        """
+        Read a cached index, or return None if it is missing or was built from different inputs.
+        """
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                if header.get('version') != CACHE_VERSION or any(header.get(k) != v for k, v in stamp.items()):
+                    return None
+                counts = array('H')
+                counts.fromfile(f, header['count'])
+        except Exception:
+            return None
+        return cls(counts, header['bin_ms'])
+
+    @classmethod
+    def for_log(cls, csv_path, video_path, offset_ms=0, logger=None, timebase=None):
+        """
+        Return the activity index of a video's log (entries at log time minus offset_ms, after undoing
+        timebase, the log's rebase.Timebase, if given) and its motion proposals, from the cache if it is
+        current. The entries come from logger if given (the open session), else from the CSV with any
+        pending journal applied read-only.
+        """
+        stamp = {
+            'log': file_stamp(csv_path),
+            'journal': file_stamp(journal.journal_path(csv_path)),
+            'proposals': file_stamp(proposals_path(video_path)),
+            'offset_ms': offset_ms,
+            'timebase': [timebase.scale, timebase.shift_ms] if timebase else None,
+        }
+        invert = timebase.invert if timebase else (lambda ms: ms)
+        path = activity_path(csv_path)
+        index = cls.load(path, stamp)
+        if index is not None and logger is None:
+            return index
+        if logger is not None:
+            if index is not None and not logger.dirty:
+                return index
+            times = [invert(logger.ms_at(row)) - offset_ms for row in range(len(logger))]
+        else:
+            entries = journal.pending_entries(csv_path)
+            if entries is None:
+                entries = iter_entries(csv_path)
+            times = [invert(ms) - offset_ms for ms, _ in entries]
+        index = cls.build(times + load_proposals(video_path))
+        try:
+            index.save(path, stamp)
+        except Exception:
+            pass
+        return index
+
+
+class SkipIdleScheduler:
+    """
+    Drives a player through a clip for review: normal speed inside active regions, and through the idle
+    stretches between them either fast-forward at idle_rate or, when the stretch is longer than jump_ms,
+    one set_time straight to the next region (which already starts lead_ms before its first event). Past
+    the last region it jumps to the end of the clip.
+
+    Call tick() often (every REVIEW_TICK_MS or so) while playing. Positions come from clock (a
+    PlaybackClock on the player) if given, which is re-anchored after every seek and rate change;
+    otherwise from player.get_time().
+    """
+    def __init__(self, player, spans, clock=None, normal_rate=1.0, idle_rate=IDLE_RATE, jump_ms=JUMP_MS):
+        self.player = player
+        self.starts = [start for start, _ in spans]
+        self.ends = [end for _, end in spans]
+        self.clock = clock
+        self.normal_rate = normal_rate
+        self.idle_rate = idle_rate
+        self.jump_ms = jump_ms
+        self.rate = None
+        self.jumps = 0
+
+    def set_normal_rate(self, rate):
+        """
+        Change the speed of active regions (e.g. the user sped up); applied on the next tick.
+        """
+        self.normal_rate = rate
+        self.rate = None
+
+    def position(self):
+        return self.clock.now_ms() if self.clock else self.player.get_time()
+
+    def set_rate(self, rate):
+        if rate != self.rate:
+            self.player.set_rate(rate)
+            self.rate = rate
+            if self.clock:
+                self.clock.freeze(playing=True, rate=rate)
+
+    def seek(self, ms):
+        self.player.set_time(ms)
+        self.jumps += 1
+        if self.clock:
+            self.clock.resync(ms=ms, playing=True, rate=self.rate)
+
+    def tick(self):
+        """
+        Adjust rate or position for the current playback position. Returns what it did: 'active',
+        'skip' (fast-forwarding an idle stretch), 'jump' or 'end' (jumped past the last region).
+        """
+        ms = self.position()
+        i = bisect.bisect_right(self.ends, ms)
+        if i < len(self.starts) and self.starts[i] <= ms:
+            self.set_rate(self.normal_rate)
+            return 'active'
+        if i == len(self.starts):
+            length = self.player.get_length()
+            if length > 0 and ms < length - 1:
+                self.seek(length - 1)
+            return 'end'
+        if self.starts[i] - ms > self.jump_ms:
+            self.set_rate(self.normal_rate)
+            self.seek(self.starts[i])
+            return 'jump'
+        self.set_rate(self.idle_rate)
+        return 'skip'
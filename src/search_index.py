@@ -0,0 +1,213 @@
+import bisect
+import re
+from array import array
+from collections import defaultdict
+
+from timecodes import format_line, key_char, key_code, key_ms, parse_timestamp, sort_key
+
+
+def parse_query_time(text):
+    """
+    Parse a query time of the form HH:MM[:SS[:mmm]] into milliseconds. Returns None if it is not a time.
+    """
+    if text.count(':') == 1:
+        text += ':00'
+    return parse_timestamp(text)
+
+
+class Query:
+    """
+    A parsed search. Any of the filters may be None (match everything).
+      keys:    set of keys to match, e.g. {"k"}
+      pattern: compiled regex matched against the whole key
+      start/end: inclusive time range in ms
+      text:    plain substring, matched against the whole line (slow path)
+    """
+    def __init__(self, keys=None, pattern=None, start=None, end=None, text=None):
+        self.keys = keys
+        self.pattern = pattern
+        self.start = start
+        self.end = end
+        self.text = text
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Parse a search box string. Whitespace-separated terms:
+          j  or  j,k          match those keys
+          /[jk]/              regex over keys
+          14:00-14:15         time range (inclusive, any of HH:MM[:SS[:mmm]])
+        Anything else is matched as a case-insensitive substring of the line.
+        """
+        query = cls()
+        words = []
+        for term in text.split():
+            if len(term) > 2 and term.startswith('/') and term.endswith('/'):
+                try:
+                    query.pattern = re.compile(term[1:-1])
+                    continue
+                except re.error:
+                    pass
+            if '-' in term:
+                start, _, end = term.partition('-')
+                start_ms, end_ms = parse_query_time(start), parse_query_time(end)
+                if start_ms is not None and end_ms is not None:
+                    query.start, query.end = start_ms, end_ms
+                    continue
+            letters = term.split(',')
+            if all(len(k) == 1 and k.isalpha() for k in letters):
+                query.keys = (query.keys or set()) | set(letters)
+                continue
+            words.append(term)
+        if words:
+            query.text = ' '.join(words).lower()
+        return query
+
+
+class Matches:
+    """
+    The entries matching a search, as the sorted runs of sort keys the index holds for each matching key,
+    plus the plain text (if any) their lines must also contain. Building one costs a few bisects and
+    copies; membership and stepping bisect each run, so only the rows actually shown or stepped to are
+    ever formatted and compared with the text.
+    """
+    def __init__(self, runs=(), text=None):
+        # (key code, sorted array of sort keys) per matching key.
+        self.runs = list(runs)
+        self.text = text
+        self.counted = 0
+        self.run_pos = (0, 0)
+
+    @property
+    def exact(self):
+        """
+        True if every candidate matches, so len() needs no scan.
+        """
+        return self.text is None
+
+    def matches(self, k, code):
+        return self.text is None or self.text in format_line(key_ms(k), code).lower()
+
+    def __len__(self):
+        if self.text is None:
+            return sum(len(entries) for _, entries in self.runs)
+        while self.count() is None:
+            pass
+        return self.counted
+
+    def __bool__(self):
+        if self.text is None:
+            return bool(self.runs)
+        return self.step(-1, 1) is not None
+
+    def __contains__(self, k):
+        for code, entries in self.runs:
+            i = bisect.bisect_left(entries, k)
+            if i < len(entries) and entries[i] == k:
+                return self.matches(k, code)
+        return False
+
+    def count(self, budget=None):
+        """
+        Count the matches, checking at most budget candidate lines per call so a text search can be counted
+        a slice at a time. Returns the count once every candidate has been checked, else None.
+        """
+        if self.text is None:
+            return len(self)
+        run, i = self.run_pos
+        while run < len(self.runs):
+            code, entries = self.runs[run]
+            stop = len(entries) if budget is None else min(len(entries), i + budget)
+            if budget is not None:
+                budget -= stop - i
+            self.counted += sum(1 for k in entries[i:stop] if self.matches(k, code))
+            if stop < len(entries):
+                self.run_pos = (run, stop)
+                return None
+            run, i = run + 1, 0
+        self.run_pos = (run, 0)
+        return self.counted
+
+    def rank(self, k):
+        """
+        Return the number of candidates sorted before the sort key k (the matches before it, for an exact search).
+        """
+        return sum(bisect.bisect_left(entries, k) for _, entries in self.runs)
+
+    def step(self, pivot, direction):
+        """
+        Return the sort key of the first match after pivot (direction 1) or the last one before it (-1),
+        or None past either end.
+        """
+        best = None
+        for code, entries in self.runs:
+            if direction > 0:
+                i = bisect.bisect_right(entries, pivot)
+                while i < len(entries) and not self.matches(entries[i], code):
+                    i += 1
+                if i < len(entries) and (best is None or entries[i] < best):
+                    best = entries[i]
+            else:
+                i = bisect.bisect_left(entries, pivot) - 1
+                while i >= 0 and not self.matches(entries[i], code):
+                    i -= 1
+                if i >= 0 and (best is None or entries[i] > best):
+                    best = entries[i]
+        return best
+
+
+class SearchIndex:
+    """
+    Per-session search index kept in step with a CSVLogger's in-memory log.
+      by_key:  key -> sorted array of entry sort keys (timecodes.sort_key)
+    Key and time-range queries are a handful of bisects instead of a scan over every line.
+    """
+    def __init__(self):
+        self.by_key = defaultdict(lambda: array('q'))
+
+    def clear(self):
+        self.by_key.clear()
+
+    def rebuild(self, keys, codes):
+        """
+        Rebuild from a logger's parallel key/code arrays (already sorted), in one pass.
+        """
+        self.clear()
+        for k, code in zip(keys, codes):
+            self.by_key[key_char(code)].append(k)
+
+    def add(self, k, key):
+        entries = self.by_key[key]
+        entries.insert(bisect.bisect_left(entries, k), k)
+
+    def remove(self, k, key):
+        entries = self.by_key.get(key)
+        if not entries:
+            return
+        i = bisect.bisect_left(entries, k)
+        if i < len(entries) and entries[i] == k:
+            del entries[i]
+            if not entries:
+                del self.by_key[key]
+
+    def matching_keys(self, query):
+        keys = self.by_key.keys() if query.keys is None else [k for k in query.keys if k in self.by_key]
+        if query.pattern is not None:
+            keys = [k for k in keys if query.pattern.fullmatch(k)]
+        return list(keys)
+
+    def find(self, query):
+        """
+        Return the Matches for a query: each matching key's entries within the time range, sliced from the
+        index, and the query's plain text, if any, to be checked lazily.
+        """
+        lo_key = sort_key(query.start, 0) if query.start is not None else None
+        hi_key = sort_key(query.end + 1, 0) if query.end is not None else None
+        runs = []
+        for key in sorted(self.matching_keys(query)):
+            entries = self.by_key[key]
+            lo = bisect.bisect_left(entries, lo_key) if lo_key is not None else 0
+            hi = bisect.bisect_left(entries, hi_key) if hi_key is not None else len(entries)
+            if lo < hi:
+                runs.append((key_code(key), entries[lo:hi]))
+        return Matches(runs, query.text)
@@ -0,0 +1,278 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from array import array
+
+import journal
+from csv_logger import CSVLogger
+from instrumentation import STATS
+from search_index import Query
+from timecodes import format_line, key_char, sort_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (id INTEGER PRIMARY KEY, ms INTEGER NOT NULL, key INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS entries_ms ON entries (ms, id);
+CREATE INDEX IF NOT EXISTS entries_key ON entries (key, ms);
+CREATE TABLE IF NOT EXISTS extras (line TEXT NOT NULL);
+"""
+
+# How long an export or count on the Tk thread waits for the writer to commit pending changes before
+# answering from the in-memory log instead.
+FLUSH_TIMEOUT_S = 0.5
+
+
+def db_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".db"
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def iter_db_lines(conn):
+    """
+    Stream the log's lines out of the database in sorted order, followed by any unparsed lines.
+    """
+    for ms, code in conn.execute("SELECT ms, key FROM entries ORDER BY ms, id"):
+        yield format_line(ms, code)
+    for (line,) in conn.execute("SELECT line FROM extras ORDER BY rowid"):
+        yield line
+
+
+def write_csv(conn, csv_path):
+    """
+    Atomically replace csv_path with the database's contents, streamed row by row.
+    """
+    tmp = csv_path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.writelines(line + '\n' for line in iter_db_lines(conn))
+        f.flush()
+        written = f.tell()
+        os.fsync(f.fileno())
+    os.replace(tmp, csv_path)
+    journal.fsync_dir(csv_path)
+    STATS.count('file_opens')
+    STATS.count('bytes_written', written)
+
+
+class SQLiteWriter(threading.Thread):
+    """
+    Background writer for a SQLiteLogger. Takes the same journal records as JournalWriter and applies
+    them to <video>.db, committing everything queued so far in one transaction; records that fail are kept
+    and retried, as in JournalWriter. export() rewrites the CSV from the database, so the CSV stays readable
+    by the batch tools.
+    """
+    def __init__(self, csv_path):
+        super().__init__(name=f"sqlite:{os.path.basename(csv_path)}", daemon=False)
+        self.csv_path = csv_path
+        self.queue = queue.SimpleQueue()
+        # As in JournalWriter: the failure that started the current run of failed writes, until reported.
+        self.error = None
+        self.failing = False
+        # Records and exports not yet committed, in order. Kept and retried after a failure.
+        self.backlog = []
+        self.start()
+
+    def append(self, record):
+        self.queue.put(('append', record))
+
+    def export(self):
+        self.queue.put(('export', None))
+
+    def flush(self, timeout=None):
+        done = threading.Event()
+        self.queue.put(('flush', done))
+        return done.wait(timeout)
+
+    def close(self, wait=False):
+        self.queue.put(('close', None))
+        if wait:
+            self.join()
+
+    def apply(self, conn, record):
+        parsed = journal.parse_record(record)
+        if parsed is None:
+            return
+        op, entry_id, entry = parsed
+        if op == '!clear':
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM extras")
+        elif op == '+':
+            conn.execute("INSERT OR REPLACE INTO entries (id, ms, key) VALUES (?, ?, ?)", (entry_id, *entry))
+        else:
+            conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+
+    def run(self):
+        conn = None
+        closing = False
+        close_attempts = 0
+        while True:
+            # Group commit: everything queued so far goes in one transaction.
+            try:
+                batch = [self.queue.get(timeout=journal.RETRY_S if self.backlog else None)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            flushed = []
+            for op, payload in batch:
+                if op == 'flush':
+                    flushed.append(payload)
+                elif op == 'close':
+                    closing = True
+                else:
+                    self.backlog.append((op, payload))
+            start = time.perf_counter()
+            # Ops committed so far. On a failure the valid ones before the failing op are still committed,
+            # and the rest stay in the backlog.
+            done = 0
+            i = 0
+            try:
+                if conn is None:
+                    conn = connect(db_path(self.csv_path))
+                for i, (op, payload) in enumerate(self.backlog):
+                    if op == 'append':
+                        self.apply(conn, payload)
+                    else:
+                        conn.commit()
+                        done = i
+                        with STATS.timer('compaction_write'):
+                            write_csv(conn, self.csv_path)
+                        # The database is the source of truth now; a CSV journal would replay stale records.
+                        if os.path.exists(journal.journal_path(self.csv_path)):
+                            os.remove(journal.journal_path(self.csv_path))
+                        done = i + 1
+                i = len(self.backlog)
+                conn.commit()
+                done = i
+                STATS.record('disk_write', (time.perf_counter() - start) * 1000.0)
+                self.failing = False
+            except Exception as e:
+                if not self.failing:
+                    self.error = e
+                self.failing = True
+                if conn is not None:
+                    try:
+                        conn.commit()
+                        done = max(done, i)
+                    except Exception:
+                        try:
+                            conn.rollback()
+                        except Exception:
+                            pass
+            del self.backlog[:done]
+            # Flushes and closes are honoured even when writes failed, so nobody waits on a locked database forever.
+            for event in flushed:
+                event.set()
+            if closing:
+                close_attempts += 1
+                if self.backlog and close_attempts <= journal.CLOSE_RETRIES:
+                    continue
+                if conn is not None:
+                    conn.close()
+                return
+
+
+class SQLiteLogger(CSVLogger):
+    """
+    CSVLogger that persists to a per-video SQLite database (<video>.db, WAL mode) instead of the CSV
+    journal. The sorted in-memory log, search index and undo/redo work exactly as in CSVLogger; every
+    change goes to the database as an indexed insert or delete on the writer thread, and entry ids are
+    the database's primary keys, so nothing is ever renumbered or rewritten wholesale. The CSV is only
+    an export, rewritten from the database on close.
+
+    On first use for a video with an existing CSV log (and journal), the CSV is imported.
+    """
+    def load(self):
+        path = db_path(self.filename)
+        conn = connect(path)
+        try:
+            (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            (extras,) = conn.execute("SELECT COUNT(*) FROM extras").fetchone()
+            if not count and not extras and os.path.exists(self.filename):
+                CSVLogger.load(self)
+                with conn:
+                    conn.executemany("INSERT INTO entries (id, ms, key) VALUES (?, ?, ?)",
+                                     ((self.id_at(row), self.ms_at(row), self.codes[row]) for row in range(len(self))))
+                    conn.executemany("INSERT INTO extras (line) VALUES (?)", ((line,) for line in self.extras))
+                return 0
+            keys = array('q')
+            codes = array('B')
+            for entry_id, ms, code in conn.execute("SELECT id, ms, key FROM entries ORDER BY ms, id"):
+                keys.append(sort_key(ms, entry_id))
+                codes.append(code)
+            self.keys, self.codes = keys, codes
+            self.extras = [line for (line,) in conn.execute("SELECT line FROM extras ORDER BY rowid")]
+            (max_id,) = conn.execute("SELECT MAX(id) FROM entries").fetchone()
+            self.next_id = (max_id or 0) + 1
+            self.rebuild_index()
+            self.dirty = False
+        finally:
+            conn.close()
+        return 0
+
+    def open_writer(self, generation):
+        return SQLiteWriter(self.filename)
+
+    def sort_log_file(self):
+        """
+        Nothing to compact: the database is updated entry by entry.
+        """
+
+    def write_log_file(self):
+        """
+        Queue a rewrite of the CSV export from the database.
+        """
+        self.writer.export()
+        self.dirty = False
+
+    def close(self, wait=False):
+        if self.dirty:
+            self.write_log_file()
+        self.writer.close(wait)
+
+    def db_current(self):
+        """
+        Wait up to FLUSH_TIMEOUT_S for pending changes to be committed. Returns False if the database is
+        still behind the in-memory log (a slow disk, or writes failing and queued for a retry).
+        """
+        return self.writer.flush(FLUSH_TIMEOUT_S) and not self.writer.failing
+
+    def write_export(self, export_path):
+        """
+        Stream the export out of the database, or write it from the in-memory log if the database is behind.
+        """
+        if not self.db_current():
+            CSVLogger.write_export(self, export_path)
+            return
+        conn = sqlite3.connect(db_path(self.filename))
+        try:
+            with open(export_path, 'w') as dst:
+                dst.writelines(line + "\n" for line in iter_db_lines(conn))
+        finally:
+            conn.close()
+
+    def counts(self, start=None, end=None):
+        """
+        Return {key: count} of entries between start and end ms (inclusive; None for open ends), answered
+        from the database's indexes, or from the search index if the database is behind.
+        """
+        if not self.db_current():
+            matches = self.index.find(Query(start=start, end=end))
+            return {key_char(code): len(entries) for code, entries in matches.runs}
+        conn = sqlite3.connect(db_path(self.filename))
+        try:
+            rows = conn.execute("SELECT key, COUNT(*) FROM entries WHERE ms BETWEEN ? AND ? GROUP BY key",
+                                (0 if start is None else start, (1 << 62) if end is None else end))
+            return {key_char(code): n for code, n in rows}
+        finally:
+            conn.close()
@@ -0,0 +1,66 @@
+from collections import Counter
+
+from timecodes import key_char
+
+# Classes counted in the tally line (name, keys); see the notes legend in main_gui.py.
+TALLY_CLASSES = (("j", "j"), ("k", "k"), ("y", "y"), ("flags", "dfb"))
+
+
+class Tallies:
+    """
+    Running count of entries per class, shown in a label. Kept in step with a logger as one of its
+    observers, so logging, undo and redo each change one counter; the label is rewritten at most once per
+    idle callback. Never recounts the log or the file.
+    """
+    def __init__(self, label, classes=TALLY_CLASSES):
+        self.label = label
+        self.classes = classes
+        self.class_of = {}
+        for name, keys in classes:
+            for key in keys:
+                self.class_of[key] = name
+        self.counts = Counter()
+        self.total = 0
+        self.refresh_pending = False
+
+    def set_source(self, logger):
+        """
+        Start counting a (newly shown) logger, from the sizes of its search index's per-key entry lists.
+        """
+        self.counts = Counter()
+        self.total = 0
+        if logger is not None:
+            for key, entries in logger.index.by_key.items():
+                self.total += len(entries)
+                name = self.class_of.get(key)
+                if name:
+                    self.counts[name] += len(entries)
+        self.schedule_refresh()
+
+    def on_insert(self, ms, code):
+        self.update(code, 1)
+
+    def on_delete(self, ms, code):
+        self.update(code, -1)
+
+    def on_clear(self):
+        self.set_source(None)
+
+    def update(self, code, delta):
+        self.total += delta
+        name = self.class_of.get(key_char(code))
+        if name:
+            self.counts[name] += delta
+        self.schedule_refresh()
+
+    def text(self):
+        return "  ".join(f"{name} {self.counts[name]}" for name, _ in self.classes) + f"  all {self.total}"
+
+    def schedule_refresh(self):
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.label.after_idle(self.refresh)
+
+    def refresh(self):
+        self.refresh_pending = False
+        self.label.config(text=self.text())
@@ -0,0 +1,235 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Width (px) of the preview frames; height follows the video's aspect ratio.
+THUMB_WIDTH = 160
+# Memory budget for cached JPEG bytes (a 160px frame is a few KB, so several thousand fit).
+CACHE_BYTES = 32 * 1024 * 1024
+# Disk budget for one log's <csv>.thumbs directory; the least recently used frames are deleted beyond it.
+DISK_CACHE_BYTES = 256 * 1024 * 1024
+# Frame grabs run in ffmpeg subprocesses; a couple in parallel keeps the cache ahead of scrolling.
+WORKERS = 2
+# A timestamp whose grab failed is not tried again for this long (a file still being copied may read
+# fine later).
+RETRY_FAILED_S = 30.0
+
+
+def thumb_dir(csv_path):
+    """
+    On-disk thumbnail cache directory for a log, kept next to the CSV.
+    """
+    return os.path.splitext(csv_path)[0] + ".thumbs"
+
+
+class ThumbnailCache:
+    """
+    Downscaled video frames at logged timestamps, grabbed by background worker threads and held as
+    JPEG bytes in an LRU bounded by total size. Optionally also kept on disk (one file per timestamp,
+    least recently used deleted beyond max_disk_bytes) so reopening a session does not grab them again.
+    The workers read the disk cache too, so nothing here touches the disk on the caller's thread.
+
+    Timestamps are video time in ms. Only bytes live here; turning them into Tk images is left to the
+    GUI thread, since Tk objects must not be created from workers.
+    """
+    def __init__(self, video_path, disk_dir=None, max_bytes=CACHE_BYTES, width=THUMB_WIDTH,
+                 workers=WORKERS, ffmpeg='ffmpeg', max_disk_bytes=DISK_CACHE_BYTES):
+        self.video_path = video_path
+        self.disk_dir = disk_dir
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.width = width
+        self.ffmpeg = ffmpeg
+        self.images = OrderedDict()
+        self.size = 0
+        self.pending = deque()
+        self.queued = set()
+        # Timestamp -> time.monotonic() of its last failed grab (see RETRY_FAILED_S)
+        self.failed = {}
+        self.closed = False
+        self.cond = threading.Condition()
+        # Files in disk_dir, least recently used first, with their sizes; listed by the first worker to
+        # write there.
+        self.disk_lock = threading.Lock()
+        self.disk_files = None
+        self.disk_size = 0
+        # Without ffmpeg there is nothing to grab with; the workers then only serve the disk cache.
+        self.available = shutil.which(ffmpeg) is not None
+        self.threads = []
+        if self.available or disk_dir:
+            for _ in range(workers):
+                thread = threading.Thread(target=self.run, daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def get(self, ms):
+        """
+        Return the JPEG bytes for a timestamp if they are in memory, else None (request() them).
+        """
+        with self.cond:
+            data = self.images.get(ms)
+            if data is not None:
+                self.images.move_to_end(ms)
+            return data
+
+    def waiting(self, ms):
+        """
+        True while a requested timestamp is still queued or being read or grabbed.
+        """
+        with self.cond:
+            return ms in self.queued
+
+    def failed_recently(self, ms):
+        failed_at = self.failed.get(ms)
+        return failed_at is not None and time.monotonic() - failed_at < RETRY_FAILED_S
+
+    def request(self, ms, urgent=False):
+        """
+        Queue a timestamp to be grabbed. Urgent requests (the row under the mouse) jump the queue.
+        """
+        with self.cond:
+            if self.closed or not self.threads or ms in self.images or self.failed_recently(ms):
+                return
+            if ms in self.queued:
+                if not urgent or ms not in self.pending:
+                    return
+                self.pending.remove(ms)
+            self.queued.add(ms)
+            if urgent:
+                self.pending.appendleft(ms)
+            else:
+                self.pending.append(ms)
+            self.cond.notify()
+
+    def prefetch(self, timestamps):
+        for ms in timestamps:
+            self.request(ms)
+
+    def store(self, ms, data):
+        """
+        Add a frame to the LRU, evicting the least recently used ones to stay within max_bytes.
+        """
+        with self.cond:
+            old = self.images.pop(ms, None)
+            if old is not None:
+                self.size -= len(old)
+            self.images[ms] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self.images) > 1:
+                _, evicted = self.images.popitem(last=False)
+                self.size -= len(evicted)
+
+    def disk_path(self, ms):
+        return os.path.join(self.disk_dir, f"{ms}.jpg")
+
+    def read_disk(self, ms):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self.disk_path(ms), 'rb') as f:
+                data = f.read() or None
+        except OSError:
+            return None
+        if data is not None:
+            # The modification time records use, so eviction order survives a restart.
+            try:
+                os.utime(self.disk_path(ms))
+            except OSError:
+                pass
+            with self.disk_lock:
+                if self.disk_files is not None and ms in self.disk_files:
+                    self.disk_files.move_to_end(ms)
+        return data
+
+    def list_disk(self):
+        """
+        Index the files already in disk_dir, oldest first. Called with disk_lock held.
+        """
+        files = []
+        try:
+            with os.scandir(self.disk_dir) as it:
+                for entry in it:
+                    name, ext = os.path.splitext(entry.name)
+                    if ext == '.jpg' and name.isdigit():
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, int(name), stat.st_size))
+        except OSError:
+            pass
+        files.sort()
+        self.disk_files = OrderedDict((ms, size) for _, ms, size in files)
+        self.disk_size = sum(self.disk_files.values())
+
+    def write_disk(self, ms, data):
+        if not self.disk_dir:
+            return
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            tmp = self.disk_path(ms) + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self.disk_path(ms))
+        except OSError:
+            return
+        with self.disk_lock:
+            if self.disk_files is None:
+                self.list_disk()
+            self.disk_size += len(data) - self.disk_files.pop(ms, 0)
+            self.disk_files[ms] = len(data)
+            while self.disk_size > self.max_disk_bytes and len(self.disk_files) > 1:
+                evicted, size = self.disk_files.popitem(last=False)
+                self.disk_size -= size
+                try:
+                    os.remove(self.disk_path(evicted))
+                except OSError:
+                    pass
+
+    def grab(self, ms):
+        """
+        Decode one downscaled frame at ms with ffmpeg and return it as JPEG bytes (None on failure).
+        Seeking before -i jumps to the nearest keyframe and decodes forward, so this stays fast
+        anywhere in a long recording.
+        """
+        result = subprocess.run(
+            [self.ffmpeg, '-v', 'error', '-ss', f"{ms / 1000:.3f}", '-i', self.video_path,
+             '-frames:v', '1', '-vf', f"scale={self.width}:-2", '-f', 'image2pipe', '-c:v', 'mjpeg',
+             '-q:v', '5', '-'],
+            capture_output=True)
+        return result.stdout if result.returncode == 0 and result.stdout else None
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return
+                ms = self.pending.popleft()
+            data = self.read_disk(ms)
+            if data is None and self.available:
+                try:
+                    data = self.grab(ms)
+                except Exception:
+                    data = None
+                if data is not None:
+                    self.write_disk(ms, data)
+            with self.cond:
+                self.queued.discard(ms)
+                if data is None:
+                    self.failed[ms] = time.monotonic()
+                else:
+                    self.failed.pop(ms, None)
+            if data is not None:
+                self.store(ms, data)
+
+    def close(self):
+        """
+        Stop the workers. A grab already in progress finishes in the background.
+        """
+        with self.cond:
+            self.closed = True
+            self.pending.clear()
+            self.queued.clear()
+            self.cond.notify_all()
@@ -0,0 +1,74 @@
+# The one place log timestamps and keys are converted between text and their internal form.
+# Internally an entry is an integer millisecond timestamp plus a one-byte key code; the text form
+# is the "HH:MM:SS:mmm, k" line written to the CSV.
+
+# Entry ids are packed into the low bits of a sort key: key = ms << ID_BITS | id.
+ID_BITS = 32
+ID_MASK = (1 << ID_BITS) - 1
+
+
+def format_ms(ms):
+    """
+    Format integer milliseconds as HH:MM:SS:mmm.
+    """
+    ms = int(ms)
+    return f"{ms // 3600000:02}:{ms // 60000 % 60:02}:{ms // 1000 % 60:02}:{ms % 1000:03}"
+
+
+def parse_timestamp(ts):
+    """
+    Parse HH:MM:SS[:mmm] into integer milliseconds. Returns None if ts is not a timestamp.
+    """
+    parts = ts.strip().split(':')
+    if not 3 <= len(parts) <= 4:
+        return None
+    try:
+        h, m, s = int(parts[0]), int(parts[1]), int(parts[2])
+        ms = int(parts[3]) if len(parts) > 3 else 0
+    except ValueError:
+        return None
+    return ((h * 60 + m) * 60 + s) * 1000 + ms
+
+
+def key_code(key):
+    """
+    Return the one-byte code for a key character, or None if it does not fit in a byte.
+    """
+    if len(key) != 1 or ord(key) > 255:
+        return None
+    return ord(key)
+
+
+def key_char(code):
+    return chr(code)
+
+
+def parse_line(line):
+    """
+    Parse a log line ("HH:MM:SS:mmm, k") into (ms, key_code). Returns None for lines that do not hold
+    a timestamp and a single-character key.
+    """
+    ts, sep, key = line.partition(',')
+    if not sep:
+        return None
+    ms = parse_timestamp(ts)
+    code = key_code(key.strip())
+    if ms is None or code is None:
+        return None
+    return ms, code
+
+
+def format_line(ms, code):
+    return f"{format_ms(ms)}, {chr(code)}"
+
+
+def sort_key(ms, entry_id):
+    return ms << ID_BITS | entry_id
+
+
+def key_ms(key):
+    return key >> ID_BITS
+
+
+def key_id(key):
+    return key & ID_MASK
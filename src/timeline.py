@@ -0,0 +1,160 @@
+import bisect
+from array import array
+
+from instrumentation import STATS
+from timecodes import key_char, sort_key
+
+# One row per class (keys, colour): passenger vehicles, large trucks, TPRS movements, and all flags.
+TIMELINE_ROWS = (("j", "#4f9bff"), ("k", "#ff5a4f"), ("y", "#4fd26b"), ("dfb", "#ffb43c"))
+# Number of time bins across the clip; the canvas always holds exactly bins x rows rectangles.
+TIMELINE_BINS = 320
+ROW_HEIGHT = 10
+BACKGROUND = "#202020"
+# Shades per row between the background (empty bin) and the full row colour (busiest bin).
+SHADES = 16
+
+
+def blend(colour, fraction):
+    """
+    Mix a #rrggbb colour with the background by fraction (0 = background, 1 = colour).
+    """
+    a = [int(BACKGROUND[i:i + 2], 16) for i in (1, 3, 5)]
+    b = [int(colour[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{round(x + (y - x) * fraction):02x}" for x, y in zip(a, b))
+
+
+class Timeline:
+    """
+    Event density strip for the whole clip: one row per class, one cell per time bin, shaded by how many
+    entries fall in it relative to the busiest bin of that row. Bin counts are kept in arrays and updated in
+    O(1) per added or removed entry; only changed cells are recoloured, in one idle callback, and the canvas
+    holds a fixed number of items, so cost never depends on how many entries the log has.
+
+    Attach it to a logger with logger.observers.append(timeline). Times are log times (video time plus the
+    start offset); clicking calls on_seek with the video time (ms) under the mouse.
+    """
+    def __init__(self, canvas, width, on_seek=None, rows=TIMELINE_ROWS, bins=TIMELINE_BINS):
+        self.canvas = canvas
+        self.width = width
+        self.on_seek = on_seek
+        self.rows = rows
+        self.bins = bins
+        self.row_of = {}
+        for r, (keys, _) in enumerate(rows):
+            for key in keys:
+                self.row_of[key] = r
+        self.palettes = [[blend(colour, (level / (SHADES - 1)) ** 0.5) for level in range(SHADES)]
+                         for _, colour in rows]
+        self.counts = [array('I', bytes(4 * bins)) for _ in rows]
+        self.maxima = [0] * len(rows)
+        self.shades = [[0] * bins for _ in rows]
+        self.offset_ms = 0
+        self.length_ms = 0
+        self.dirty = set()
+        self.full_redraw = False
+        self.redraw_pending = False
+        height = ROW_HEIGHT * len(rows)
+        canvas.config(width=width, height=height, bg=BACKGROUND, highlightthickness=0)
+        self.cells = []
+        for r in range(len(rows)):
+            self.cells.append([
+                canvas.create_rectangle(b * width / bins, r * ROW_HEIGHT, (b + 1) * width / bins,
+                                        (r + 1) * ROW_HEIGHT, width=0, fill=BACKGROUND)
+                for b in range(bins)])
+        self.playhead = canvas.create_line(0, 0, 0, height, fill="white")
+        canvas.bind('<Button-1>', self.on_click)
+
+    def bin_of(self, ms):
+        """
+        Return the bin holding log time ms, or None outside the clip (or before the length is known).
+        """
+        if self.length_ms <= 0:
+            return None
+        b = (ms - self.offset_ms) * self.bins // self.length_ms
+        return b if 0 <= b < self.bins else None
+
+    def set_source(self, logger, offset_ms, length_ms):
+        """
+        Recount every bin from the logger for a new log, offset or clip length. Each key's entries are
+        already sorted in the search index, so a bin's count is the distance between two bisects at its
+        edges: O(bins log n), no pass over the entries.
+        """
+        self.offset_ms = offset_ms
+        self.length_ms = length_ms or 0
+        for counts in self.counts:
+            counts[:] = array('I', bytes(4 * self.bins))
+        if logger is not None and self.length_ms > 0:
+            # First sort key of each bin; bin b holds log times offset + [ceil(b L / bins), ceil((b+1) L / bins)).
+            edges = [sort_key(offset_ms - (-b * self.length_ms // self.bins), 0) for b in range(self.bins + 1)]
+            for r, (keys, _) in enumerate(self.rows):
+                counts = self.counts[r]
+                for key in keys:
+                    entries = logger.index.by_key.get(key)
+                    if not entries:
+                        continue
+                    positions = [bisect.bisect_left(entries, edge) for edge in edges]
+                    for b in range(self.bins):
+                        counts[b] += positions[b + 1] - positions[b]
+        self.full_redraw = True
+        self.schedule_redraw()
+
+    def on_insert(self, ms, code):
+        self.update(ms, code, 1)
+
+    def on_delete(self, ms, code):
+        self.update(ms, code, -1)
+
+    def on_clear(self):
+        self.set_source(None, self.offset_ms, self.length_ms)
+
+    def update(self, ms, code, delta):
+        r = self.row_of.get(key_char(code))
+        b = self.bin_of(ms)
+        if r is None or b is None:
+            return
+        self.counts[r][b] = max(0, self.counts[r][b] + delta)
+        self.dirty.add((r, b))
+        self.schedule_redraw()
+
+    def schedule_redraw(self):
+        if not self.redraw_pending:
+            self.redraw_pending = True
+            self.canvas.after_idle(self.redraw)
+
+    @STATS.timed('timeline_redraw')
+    def redraw(self):
+        """
+        Recolour the cells whose shade changed. A row is recoloured in full only when its busiest bin
+        changed (which rescales every shade in it): at most bins x rows item updates either way.
+        """
+        self.redraw_pending = False
+        rows = range(len(self.rows)) if self.full_redraw else sorted({r for r, _ in self.dirty})
+        for r in rows:
+            counts = self.counts[r]
+            maximum = max(counts) if len(counts) else 0
+            if self.full_redraw or maximum != self.maxima[r]:
+                self.maxima[r] = maximum
+                cells = range(self.bins)
+            else:
+                cells = [b for row, b in self.dirty if row == r]
+            palette = self.palettes[r]
+            shades = self.shades[r]
+            for b in cells:
+                shade = (counts[b] * (SHADES - 1) + maximum - 1) // maximum if maximum else 0
+                if shade != shades[b] or self.full_redraw:
+                    shades[b] = shade
+                    self.canvas.itemconfig(self.cells[r][b], fill=palette[shade])
+        self.dirty.clear()
+        self.full_redraw = False
+
+    def set_position(self, video_ms):
+        """
+        Move the playhead to a video time (ms).
+        """
+        x = video_ms * self.width / self.length_ms if self.length_ms > 0 else 0
+        self.canvas.coords(self.playhead, x, 0, x, ROW_HEIGHT * len(self.rows))
+
+    def on_click(self, event):
+        if self.on_seek and self.length_ms > 0:
+            x = min(max(event.x, 0), self.width)
+            self.on_seek(int(x * self.length_ms / self.width))
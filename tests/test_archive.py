@@ -0,0 +1,75 @@
+import filecmp
+import json
+import os
+import random
+import tempfile
+
+from archive import Archive, archive_to_csv, csv_to_archive, iter_entries
+from csv_logger import CSVLogger
+from csv_logger import iter_entries as iter_csv_entries
+from timecodes import format_line
+
+
+def test_round_trip_is_byte_exact(entries=20000):
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, 'session.csv')
+        ms = 0
+        with open(csv_path, 'w') as f:
+            f.write("note: camera 2\n")
+            for i in range(entries):
+                ms += rng.randrange(5000)
+                f.write(format_line(ms, ord(rng.choice('jjjkkydfb'))) + '\n')
+                if i == entries // 2:
+                    f.write("lunch break\n")
+            f.write("end\n")
+        path = csv_to_archive(csv_path, video="session.mp4", offset_ms=3600000, fps=25.0)
+        back = archive_to_csv(path, os.path.join(workdir, 'back.csv'))
+        assert filecmp.cmp(csv_path, back, shallow=False)
+        with Archive(path) as archive:
+            assert len(archive) == entries and archive.header['sorted']
+            assert (archive.video, archive.offset_ms, archive.fps) == ("session.mp4", 3600000, 25.0)
+            assert list(archive.iter_entries()) == list(iter_csv_entries(csv_path))
+        assert list(iter_entries(path)) == list(iter_csv_entries(csv_path))
+
+
+def test_lines_written_by_hand_come_back_verbatim():
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, 'session.csv')
+        text = "00:00:05:000, k\n00:00:01, j  \n00:00:02:000,y\nno newline at the end"
+        with open(csv_path, 'w') as f:
+            f.write(text)
+        path = csv_to_archive(csv_path, video="")
+        with Archive(path) as archive:
+            assert list(archive.iter_entries()) == [(5000, ord('k')), (1000, ord('j')), (2000, ord('y'))]
+        with open(archive_to_csv(path, os.path.join(workdir, 'back.csv'))) as f:
+            assert f.read() == text
+
+
+def test_pending_journal_is_replayed():
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, 'session.csv')
+        with open(csv_path, 'w') as f:
+            f.write("header\n00:00:05:000, k\n00:00:01:000, j\n")
+        logger = CSVLogger(csv_path)
+        try:
+            logger.log_entry('y', 3000)
+            logger.writer.flush()
+            with Archive(csv_to_archive(csv_path, video="")) as archive:
+                assert list(archive.iter_lines()) == ["00:00:01:000, j", "00:00:03:000, y", "00:00:05:000, k",
+                                                      "header"]
+        finally:
+            logger.close(wait=True)
+
+
+def test_offset_comes_from_a_saved_project():
+    with tempfile.TemporaryDirectory() as workdir:
+        video = os.path.join(workdir, 'clip.mp4')
+        open(video, 'w').close()
+        csv_path = os.path.join(workdir, 'clip.csv')
+        with open(csv_path, 'w') as f:
+            f.write("00:00:01:000, k\n")
+        with open(os.path.join(workdir, 'clip.project.json'), 'w') as f:
+            json.dump({'clips': [{'path': video, 'start_ms': 3600000, 'duration_ms': None}], 'current': 0}, f)
+        with Archive(csv_to_archive(csv_path)) as archive:
+            assert (archive.video, archive.offset_ms) == (video, 3600000)
@@ -0,0 +1,34 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+import pytest
+
+from frame_index import FrameIndex, cache_path, video_stamp
+
+pytestmark = pytest.mark.skipif(shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None,
+                                reason="needs ffmpeg and ffprobe")
+
+
+@pytest.mark.parametrize('name, extra', [('sample.mp4', []), ('sample.ts', ['-output_ts_offset', '10'])])
+def test_index_counts_frames_from_the_stream_start(name, extra):
+    """
+    A 4 s, 25 fps sample clip with a keyframe every 50 frames and B-frames, as MP4 and as MPEG-TS whose
+    timestamps start 10 s in: every frame is found, timed from zero, and the cache round-trips.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        clip = os.path.join(workdir, name)
+        subprocess.run(['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc=size=160x120:rate=25',
+                        '-t', '4', '-c:v', 'libx264', '-g', '50', '-bf', '2', '-pix_fmt', 'yuv420p', *extra, clip],
+                       check=True)
+        index = FrameIndex.for_video(clip)
+        assert index is not None
+        assert len(index) == 100
+        assert index.fps == pytest.approx(25.0)
+        assert list(index.pts_ms) == [i * 40 for i in range(100)]
+        assert [i for i in range(len(index)) if index.keyframes[i]] == [0, 50]
+        assert index.frame_at(41 * 40 + 39) == 41
+        assert index.frame_time(41) == 41 * 40
+        cached = FrameIndex.load(cache_path(clip), video_stamp(clip))
+        assert cached is not None and list(cached.pts_ms) == list(index.pts_ms)
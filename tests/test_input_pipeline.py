@@ -0,0 +1,97 @@
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+from csv_logger import CSVLogger
+from fake_player import FakeScrollbar, FakeText
+from input_pipeline import LATENCY_BUDGET_MS, KeyQueue
+from log_view import LogView
+from main_gui import CarCounterGUI
+from timecodes import format_line
+
+
+def headless_gui(logger):
+    """
+    The parts of CarCounterGUI that apply_key_batch uses: the logger and a LogView on stand-in widgets.
+    """
+    view = LogView(FakeText(), FakeScrollbar())
+    view.set_source(logger)
+    return SimpleNamespace(logger=logger, log_view=view, last_key=None)
+
+
+def type_keys(gui, rng, keys_per_second, seconds, burst):
+    """
+    Press keys_per_second keys for `seconds` (Poisson arrivals) plus one burst of `burst` keys at once,
+    through a KeyQueue whose batches are applied by the GUI's own apply_key_batch. Time is simulated,
+    but every batch is really applied and timed. Returns the KeyQueue stats.
+    """
+    # Simulated event loop: the virtual clock jumps ahead to each arrival but runs in real time while
+    # a batch is applied, so keys arriving meanwhile wait behind it as they would in Tk.
+    base = [0.0, time.perf_counter()]
+
+    def clock():
+        return base[0] + time.perf_counter() - base[1]
+
+    idle = []
+    queue = KeyQueue(idle.append, lambda batch: CarCounterGUI.apply_key_batch(gui, batch), clock=clock)
+    arrivals = []
+    t = 0.0
+    while t < seconds:
+        t += rng.expovariate(keys_per_second)
+        arrivals.append(t)
+    arrivals += [seconds / 2] * burst
+    arrivals.sort()
+    i = 0
+    while i < len(arrivals):
+        base[:] = [max(clock(), arrivals[i]), time.perf_counter()]
+        while i < len(arrivals) and arrivals[i] <= clock():
+            queue.put(rng.choice('jkydfb'), int(arrivals[i] * 4000), arrivals[i])
+            i += 1
+        while idle:
+            idle.pop(0)()
+    return queue.stats()
+
+
+def test_keys_reach_the_screen_within_a_frame(entries=100000, seconds=30):
+    # Widget painting itself is not included.
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'session.csv')
+        with open(path, 'w') as f:
+            for _ in range(entries):
+                f.write(format_line(rng.randrange(seconds * 4000), ord(rng.choice('jkydfb'))) + '\n')
+        logger = CSVLogger(path)
+        try:
+            stats = type_keys(headless_gui(logger), rng, keys_per_second=20, seconds=seconds, burst=12)
+            assert len(logger) - entries == stats['keys']
+        finally:
+            logger.close(wait=True)
+    assert stats['batches'] < stats['keys']
+    assert stats['p99_ms'] <= LATENCY_BUDGET_MS, stats
+
+
+def test_burst_is_applied_as_one_batch_and_highlighted():
+    with tempfile.TemporaryDirectory() as workdir:
+        logger = CSVLogger(os.path.join(workdir, 'session.csv'))
+        try:
+            gui = headless_gui(logger)
+            batches = []
+
+            def apply_batch(batch):
+                batches.append(len(batch))
+                CarCounterGUI.apply_key_batch(gui, batch)
+
+            idle = []
+            queue = KeyQueue(idle.append, apply_batch)
+            for key, ms in [('k', 3000), ('j', 1000), ('y', 2000)]:
+                queue.put(key, ms)
+            assert len(idle) == 1
+            idle.pop()()
+            assert batches == [3]
+            assert list(logger.lines) == ["00:00:01:000, j", "00:00:02:000, y", "00:00:03:000, k"]
+            assert gui.log_view.highlighted == {0, 1, 2}
+            assert gui.last_key == 'y'
+        finally:
+            logger.close(wait=True)
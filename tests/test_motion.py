@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+import pytest
+
+from motion import FRAME_HEIGHT, FRAME_WIDTH, MotionDetector, load_proposals, proposals_path, write_proposals
+
+np = pytest.importorskip("numpy")
+
+
+def test_detector_proposes_only_crossings_inside_the_region(frames=600, fps=25.0):
+    """
+    Synthetic frames of sensor noise, with a bright block crossing the region of interest at known times
+    and another crossing outside it.
+    """
+    rng = np.random.default_rng(1)
+    crossings = [(2000, 3000), (9000, 10500), (17000, 17600)]
+    outside = (12000, 13000)
+    detector = MotionDetector(roi=(0.0, 0.5, 1.0, 0.5))
+    for i in range(frames):
+        ms = int(i * 1000 / fps)
+        grey = rng.integers(100, 110, (FRAME_HEIGHT, FRAME_WIDTH), dtype=np.uint8)
+        for start, end in crossings:
+            if start <= ms < end:
+                x = int((ms - start) / (end - start) * (FRAME_WIDTH - 20))
+                grey[60:80, x:x + 20] = 250
+        if outside[0] <= ms < outside[1]:
+            x = int((ms - outside[0]) / (outside[1] - outside[0]) * (FRAME_WIDTH - 20))
+            grey[5:25, x:x + 20] = 250
+        detector.feed(ms, grey)
+    events = detector.finish()
+    assert len(events) == len(crossings), events
+    for ms, (start, end) in zip(events, crossings):
+        assert start <= ms <= end
+
+
+def test_proposals_round_trip():
+    with tempfile.TemporaryDirectory() as workdir:
+        video = os.path.join(workdir, 'clip.mp4')
+        write_proposals(proposals_path(video), [3000, 1000, 2000])
+        assert load_proposals(video) == [1000, 2000, 3000]
@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from fake_player import FakeClock, FakePlayer
+from playback_clock import EVENT_TIME_WRAP, PlaybackClock
+
+# libVLC's time is polled this often (main_gui.CLOCK_SAMPLE_MS).
+TICK_S = 0.015
+
+
+def press_keys(rate, presses=2000, seed=1):
+    """
+    Drive a FakePlayer (coarse, lagging get_time with jittery updates) on a fake clock at the given rate,
+    polling it every tick. Keys are pressed at random and handled in order after 0-40 ms of Tk latency,
+    among the other events the window gets (mouse motion, key releases) that calibrate the Tk event clock
+    as they do in the GUI. Returns the stamping errors of the clock and of raw get_time (ms), sorted.
+    """
+    rng = random.Random(seed)
+    clock = FakeClock(1000.0)
+    player = FakePlayer(clock=clock, seed=seed)
+    player.set_rate(rate)
+    player.play()
+    pb = PlaybackClock(player, clock=clock)
+    event_epoch = rng.randrange(EVENT_TIME_WRAP)
+    errors = []
+    raw_errors = []
+    # (handled at, pressed at, Tk event time, is a key press)
+    pending = []
+    start = clock.now
+    while len(errors) < presses:
+        clock.advance(0.001)
+        if clock.now % TICK_S < 0.001:
+            pb.sample()
+        for probability, press in ((0.03, False), (0.01, True)):
+            # Key presses start once the window has been in use for a second.
+            if rng.random() < probability and (not press or clock.now - start > 1.0):
+                event_time = int(clock.now * 1000 + event_epoch) % EVENT_TIME_WRAP
+                pending.append((clock.now + rng.uniform(0.0, 0.04), clock.now, event_time, press))
+        while pending and pending[0][0] <= clock.now:
+            _, press_t, event_time, press = pending.pop(0)
+            if not press:
+                pb.event_instant(event_time)
+                continue
+            truth = player.true_ms(press_t)
+            errors.append(abs(pb.now_ms(event_time) - truth))
+            raw_errors.append(abs(player.get_time() - truth))
+    return sorted(errors), sorted(raw_errors)
+
+
+@pytest.mark.parametrize('rate', [0.25, 0.5, 1.0, 2.0, 3.0, 4.0])
+def test_stamps_track_the_true_position(rate):
+    errors, raw_errors = press_keys(rate)
+    # One poll interval plus a few ms of event-time calibration slack, scaled by the rate.
+    bound = (TICK_S * 1000 + 5) * rate + 2
+    assert errors[int(len(errors) * 0.99)] <= bound
+    assert errors[-1] <= bound, (errors[-5:], bound)
+    assert errors[-1] < raw_errors[-1]
+
+
+def test_stamps_never_go_backwards_while_playing():
+    clock = FakeClock(1000.0)
+    player = FakePlayer(clock=clock)
+    player.set_rate(4.0)
+    player.play()
+    pb = PlaybackClock(player, clock=clock)
+    last = 0
+    for _ in range(5000):
+        clock.advance(0.003)
+        ms = pb.now_ms()
+        assert ms >= last
+        last = ms
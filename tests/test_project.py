@@ -0,0 +1,38 @@
+import os
+import tempfile
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+from csv_logger import CSVLogger
+from project import Clip, ClipCache
+
+
+def test_evicted_log_is_closed_before_it_is_loaded_again(entries=50000):
+    with tempfile.TemporaryDirectory() as workdir:
+        video = os.path.join(workdir, 'clip.mp4')
+        loggers = []
+        writers_alive = []
+
+        def make_logger(path):
+            writers_alive.append([logger.writer.is_alive() for logger in loggers])
+            loggers.append(CSVLogger(os.path.splitext(path)[0] + '.csv'))
+            return loggers[-1]
+
+        cache = ClipCache(None, make_logger)
+        player = SimpleNamespace(stop=lambda: None, release=lambda: None)
+        try:
+            first = cache.loader.submit(cache.load_logger, video)
+            for i in range(entries):
+                first.result().log_entry('k', entries - i)
+            cache.release(Clip(video, None, player, first))
+            again = cache.loader.submit(cache.load_logger, video)
+            assert len(again.result()) == entries
+            cache.release(Clip(video, None, player, again))
+            closing = cache.close()
+            assert list(closing) == [video]
+            closing[video].result()
+        finally:
+            for logger in loggers:
+                logger.close(wait=True)
+    assert writers_alive == [[], [False]]
+    assert not any(logger.writer.is_alive() for logger in loggers)
@@ -0,0 +1,61 @@
+import os
+import random
+import tempfile
+
+import pytest
+
+from csv_logger import CSVLogger, iter_entries
+from rebase import Timebase, find_logs, parse_offset, rebase_file
+from timecodes import format_line
+
+
+def test_rebase_twice_maps_back_to_video_time(entries=20000):
+    rng = random.Random(1)
+    offset = 8 * 3600000
+    video = []
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, 'clip.csv')
+        with open(csv_path, 'w') as f:
+            f.write("note: camera 3\n")
+            ms = 0
+            for _ in range(entries):
+                ms += rng.randrange(1, 500)
+                video.append(ms)
+                f.write(format_line(offset + ms, ord(rng.choice('jky'))) + '\n')
+        first = Timebase.correction(shift_ms=-90000)
+        second = Timebase.correction(drift_ppm=150, anchor_ms=offset)
+        assert rebase_file(csv_path, first) == entries
+        assert rebase_file(csv_path, second) == entries
+        timebase = Timebase.for_log(csv_path)
+        assert len(timebase.history) == 2
+        with open(csv_path) as f:
+            assert f.readline() == "note: camera 3\n"
+        for (ms, _), video_ms in zip(iter_entries(csv_path), video):
+            assert ms == second.apply(first.apply(offset + video_ms))
+            assert abs(timebase.invert(ms) - offset - video_ms) <= 1
+
+
+def test_log_with_pending_journal_is_refused():
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, 'clip.csv')
+        logger = CSVLogger(csv_path)
+        try:
+            logger.log_entry('k', 1000)
+            logger.writer.flush()
+            with pytest.raises(ValueError):
+                rebase_file(csv_path, Timebase.correction(shift_ms=1000))
+        finally:
+            logger.close(wait=True)
+
+
+def test_find_logs_skips_proposals():
+    with tempfile.TemporaryDirectory() as workdir:
+        for name in ('clip.csv', 'clip.proposals.csv', 'clip.mp4'):
+            open(os.path.join(workdir, name), 'w').close()
+        assert list(find_logs([workdir])) == [os.path.join(workdir, 'clip.csv')]
+
+
+def test_parse_offset():
+    assert parse_offset("90000") == 90000
+    assert parse_offset("+00:01:30") == 90000
+    assert parse_offset("-01:00:00:500") == -3600500
@@ -0,0 +1,69 @@
+import bisect
+import os
+import random
+import tempfile
+
+from csv_logger import CSVLogger
+from fake_player import FakeClock, FakePlayer
+from playback_clock import PlaybackClock
+from review import LEAD_MS, ActivityIndex, SkipIdleScheduler
+
+
+def test_every_event_is_played_at_normal_speed(hours=6, clusters=120, tick_ms=50, lead_ms=LEAD_MS):
+    """
+    Review a simulated clip on a FakePlayer, ticking the scheduler every tick_ms of simulated time: every
+    event is played at normal speed from at least half the lead time before it, in a fraction of the clip's length.
+    """
+    rng = random.Random(1)
+    length = hours * 3600 * 1000
+    events = []
+    for _ in range(clusters):
+        start = rng.randrange(60000, length - 60000)
+        events.extend(start + rng.randrange(20000) for _ in range(rng.randint(1, 6)))
+    events.sort()
+    spans = ActivityIndex.build(events).spans(lead_ms=lead_ms)
+
+    fake_clock = FakeClock()
+    player = FakePlayer(length_ms=length, clock=fake_clock)
+    clock = PlaybackClock(player, clock=fake_clock)
+    scheduler = SkipIdleScheduler(player, spans, clock)
+    player.play()
+    clock.resync(playing=True)
+    # Played stretches as (from ms, to ms, rate).
+    played = []
+    while player.true_ms() < length - 1:
+        scheduler.tick()
+        before = player.true_ms()
+        fake_clock.advance(tick_ms / 1000.0)
+        played.append((before, player.true_ms(), player.rate))
+
+    starts = [a for a, _, _ in played]
+    for ms in events:
+        for t in (ms - lead_ms // 2, ms):
+            i = bisect.bisect_right(starts, t) - 1
+            a, b, rate = played[i]
+            assert a <= t <= b and rate == scheduler.normal_rate, (ms, t, played[i])
+    assert fake_clock() < length / 1000 / 5
+    assert scheduler.jumps > 0
+
+
+def test_lead_time_widens_every_span():
+    index = ActivityIndex.build([60000, 300000])
+    assert index.spans(lead_ms=1000)[0][0] == 59000
+    assert index.spans(lead_ms=10000)[0][0] == 50000
+
+
+def test_activity_index_replays_a_pending_journal():
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, 'clip.csv')
+        video = os.path.join(workdir, 'clip.mp4')
+        with open(csv_path, 'w') as f:
+            f.write("00:00:10:000, k\n")
+        logger = CSVLogger(csv_path)
+        try:
+            logger.log_entry('j', 500000)
+            logger.writer.flush()
+            spans = ActivityIndex.for_log(csv_path, video).spans(lead_ms=0, tail_ms=0, min_idle_ms=0)
+        finally:
+            logger.close(wait=True)
+        assert spans == [(10000, 11000), (500000, 501000)]
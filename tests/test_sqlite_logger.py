@@ -0,0 +1,28 @@
+import os
+import tempfile
+
+from sqlite_logger import SQLiteLogger
+
+
+def test_counts_and_export_fall_back_to_memory_when_the_database_is_behind():
+    with tempfile.TemporaryDirectory() as workdir:
+        logger = SQLiteLogger(os.path.join(workdir, 'clip.csv'))
+        try:
+            for ms, key in [(3000, 'k'), (1000, 'j'), (2000, 'k'), (4000, 'y')]:
+                logger.log_entry(key, ms)
+            assert logger.db_current()
+            assert logger.counts() == {'j': 1, 'k': 2, 'y': 1}
+            assert logger.counts(1500, 3000) == {'k': 2}
+            export_path = os.path.join(workdir, 'export.csv')
+            logger.write_export(export_path)
+            with open(export_path) as f:
+                assert f.read().splitlines() == list(logger.lines)
+        finally:
+            logger.close(wait=True)
+        # With the writer gone nothing more reaches the database; the in-memory log still answers.
+        logger.log_entry('j', 5000)
+        assert not logger.db_current()
+        assert logger.counts(4000, None) == {'j': 1, 'y': 1}
+        logger.write_export(export_path)
+        with open(export_path) as f:
+            assert f.read().splitlines()[-1] == logger.lines[-1]
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import time
+
+import thumbnails
+from thumbnails import ThumbnailCache
+
+
+def wait_for(cache, ms, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while cache.waiting(ms) and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return cache.get(ms)
+
+
+def test_disk_cache_is_read_by_the_workers_and_misses_are_retried(monkeypatch):
+    with tempfile.TemporaryDirectory() as workdir:
+        cache = ThumbnailCache(os.path.join(workdir, 'clip.mp4'), disk_dir=workdir, ffmpeg='no-such-ffmpeg')
+        try:
+            with open(cache.disk_path(1000), 'wb') as f:
+                f.write(b'frame')
+            assert cache.get(1000) is None
+            cache.request(1000, urgent=True)
+            assert wait_for(cache, 1000) == b'frame'
+            cache.request(2000)
+            assert wait_for(cache, 2000) is None
+            assert cache.failed_recently(2000)
+            cache.request(2000)
+            assert not cache.waiting(2000)
+            with open(cache.disk_path(2000), 'wb') as f:
+                f.write(b'later')
+            monkeypatch.setattr(thumbnails, 'RETRY_FAILED_S', 0.0)
+            cache.request(2000)
+            assert wait_for(cache, 2000) == b'later'
+            assert not cache.failed_recently(2000)
+        finally:
+            cache.close()
+
+
+def test_disk_cache_evicts_least_recently_used():
+    with tempfile.TemporaryDirectory() as workdir:
+        cache = ThumbnailCache(os.path.join(workdir, 'clip.mp4'), disk_dir=workdir, workers=0,
+                               ffmpeg='no-such-ffmpeg', max_disk_bytes=300)
+        for ms in range(3):
+            cache.write_disk(ms, b'x' * 100)
+        assert cache.read_disk(0) == b'x' * 100
+        cache.write_disk(3, b'x' * 100)
+        assert sorted(os.listdir(workdir)) == ['0.jpg', '2.jpg', '3.jpg']
+        assert cache.disk_size == 300
+        # A new cache over the same directory picks up the files already there.
+        reopened = ThumbnailCache(os.path.join(workdir, 'clip.mp4'), disk_dir=workdir, workers=0,
+                                  ffmpeg='no-such-ffmpeg', max_disk_bytes=300)
+        reopened.write_disk(4, b'x' * 100)
+        assert len(os.listdir(workdir)) == 3
+        assert reopened.disk_size == 300